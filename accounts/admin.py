@@ -1,5 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+
+from core.changelist import FastChangelistMixin
 from .models import User, StaffMember, UserAssignment, LoginSession
 
 class CustomUserAdmin(UserAdmin):
@@ -25,14 +27,17 @@ class StaffMemberAdmin(admin.ModelAdmin):
 @admin.register(UserAssignment)
 class UserAssignmentAdmin(admin.ModelAdmin):
     list_display = ('user', 'staff_member', 'from_date', 'to_date', 'is_active')
+    list_select_related = ('user', 'staff_member')
     list_filter = ('from_date', 'to_date')
     search_fields = ('user__username', 'staff_member__name')
 
 @admin.register(LoginSession)
-class LoginSessionAdmin(admin.ModelAdmin):
+class LoginSessionAdmin(FastChangelistMixin, admin.ModelAdmin):
     list_display = ('user', 'staff_member', 'login_time', 'logout_time', 'ip_address')
+    list_select_related = ('user', 'staff_member')
     list_filter = ('login_time', 'logout_time')
-    search_fields = ('user__username', 'staff_member__name', 'ip_address')
+    prefix_search_fields = ('user__username', 'ip_address')
+    search_help_text = "Username or IP address, from the start."
 
 from .models import District, Taluk, Office, Desk
 
@@ -0,0 +1,57 @@
+"""
+Stateless login CAPTCHA: the challenge travels with the form instead of the session.
+
+new_challenge() returns a question ("What is 3 + 5?") and a signed token
+holding a random nonce and an HMAC of nonce + answer (so the answer cannot be
+read back from the page). CaptchaLoginForm sends the token back and verify()
+checks the signature, the age (CAPTCHA_MAX_AGE) and the answer. Each nonce is
+accepted once: it is then remembered in the shared cache until the token would
+have expired anyway, so the set of used nonces stays small.
+"""
+import random
+import secrets
+
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from core.cache import get_cache
+
+SALT = 'vista.captcha'
+USED_KEY = 'vista:captcha:used:{}'
+
+
+def max_age():
+    return getattr(settings, 'CAPTCHA_MAX_AGE', 10 * 60)
+
+
+def _digest(nonce, answer):
+    return salted_hmac(SALT, f'{nonce}:{answer}').hexdigest()[:20]
+
+
+def new_challenge():
+    """(question, token) for a fresh challenge."""
+    a, b = random.randint(1, 9), random.randint(1, 9)
+    nonce = secrets.token_urlsafe(12)
+    token = signing.dumps({'n': nonce, 'd': _digest(nonce, a + b)}, salt=SALT)
+    return f"What is {a} + {b}?", token
+
+
+class CaptchaError(Exception):
+    pass
+
+
+def verify(token, answer):
+    """Raises CaptchaError unless the answer is right for a fresh, unused token."""
+    try:
+        payload = signing.loads(token or '', salt=SALT, max_age=max_age())
+    except signing.SignatureExpired:
+        raise CaptchaError("The challenge has expired. Please try again.")
+    except signing.BadSignature:
+        raise CaptchaError("Invalid challenge. Please refresh the page.")
+
+    # Used up by this attempt, right or wrong: a wrong guess gets a new challenge
+    if not get_cache().add(USED_KEY.format(payload['n']), 1, timeout=max_age()):
+        raise CaptchaError("This challenge was already used. Please try again.")
+    if not constant_time_compare(payload['d'], _digest(payload['n'], answer)):
+        raise CaptchaError("Incorrect answer. Please try again.")
@@ -0,0 +1,106 @@
+"""
+Device credentials for kiosks and displays: signed tokens instead of a
+logged-in `VS<officecode>` session.
+
+A token names an office, a device and what the device may do (CAPABILITIES),
+and is signed (django.core.signing, HMAC-SHA256) with one of the keys in
+DEVICE_TOKEN_KEYS. DeviceTokenMiddleware checks the signature on every request
+and resolves the office from the reference snapshot (core.refdata): no session,
+user or token lookup in the database. The device keeps no session, so nothing
+times out after SESSION_COOKIE_AGE either.
+
+Issue with `manage.py issue_device_token`; the device opens the printed
+enrolment link once, which stores the token in a cookie (API clients can send
+"Authorization: Device <token>" instead).
+
+Rotation: put a new key first in DEVICE_TOKEN_KEYS (new tokens are signed with
+the first key, every listed key is accepted), re-enrol the devices, then drop
+the old key. A single lost device is shut out by listing its id in
+DEVICE_TOKEN_REVOKED.
+"""
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+
+from core.refdata import get_snapshot
+
+SALT = 'vista.device'
+COOKIE_NAME = 'vista_device'
+AUTH_SCHEME = 'Device'
+
+REGISTER = 'register'
+DISPLAY = 'display'
+TRACK = 'track'
+CAPABILITIES = (REGISTER, DISPLAY, TRACK)
+
+
+class Device:
+    """A verified device token: who the request comes from and what it may do."""
+
+    def __init__(self, device_id, name, office, capabilities, key_id, issued_at):
+        self.device_id = device_id
+        self.name = name
+        self.office = office
+        self.capabilities = frozenset(capabilities)
+        self.key_id = key_id
+        self.issued_at = issued_at
+
+    def can(self, capability):
+        return capability in self.capabilities
+
+    def __repr__(self):
+        return f"<Device {self.device_id} {self.name!r} {self.office.code} {sorted(self.capabilities)}>"
+
+
+def signing_keys():
+    """{key id: secret}, the first one signing new tokens."""
+    return getattr(settings, 'DEVICE_TOKEN_KEYS', None) or {'1': settings.SECRET_KEY}
+
+
+def issue(office, capabilities, name=''):
+    """Returns a new token for the office (Office) with the given capabilities."""
+    unknown = set(capabilities) - set(CAPABILITIES)
+    if unknown or not capabilities:
+        raise ValueError(f"Capabilities must be some of {', '.join(CAPABILITIES)}")
+    key_id, key = next(iter(signing_keys().items()))
+    payload = {
+        'd': secrets.token_hex(4),
+        'n': name,
+        'o': office.code,
+        'c': sorted(set(capabilities)),
+        'i': int(time.time()),
+    }
+    return f"{key_id}:{signing.dumps(payload, key=key, salt=SALT, compress=True)}"
+
+
+def verify(token):
+    """The Device for a token, or None if it is malformed, forged, expired, revoked or its office is gone."""
+    key_id, _, signed = (token or '').partition(':')
+    key = signing_keys().get(key_id)
+    if not key or not signed:
+        return None
+    try:
+        payload = signing.loads(signed, key=key, salt=SALT, max_age=getattr(settings, 'DEVICE_TOKEN_MAX_AGE', None))
+    except signing.BadSignature:
+        return None
+    if payload.get('d') in getattr(settings, 'DEVICE_TOKEN_REVOKED', ()):
+        return None
+    office = get_snapshot().office_by_code(payload.get('o'))
+    if office is None:
+        return None
+    return Device(payload['d'], payload.get('n', ''), office, payload.get('c', ()), key_id, payload.get('i'))
+
+
+def token_from_request(request):
+    authorization = request.headers.get('Authorization', '')
+    scheme, _, credentials = authorization.partition(' ')
+    if scheme == AUTH_SCHEME and credentials:
+        return credentials.strip()
+    return request.COOKIES.get(COOKIE_NAME)
+
+
+def get_device(request):
+    """The request's Device (set by DeviceTokenMiddleware), or None."""
+    return getattr(request, 'device', None)
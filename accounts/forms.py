@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm, AuthenticationForm
 from django.core.exceptions import ValidationError
 from .models import User, StaffMember, UserAssignment, Office, Desk
+from .captcha import CaptchaError, verify as verify_captcha
 
 class UserAssignmentForm(forms.ModelForm):
     class Meta:
@@ -108,18 +109,14 @@ class CaptchaLoginForm(AuthenticationForm):
         widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Answer', 'autocomplete': 'off'}),
         label="Math Captcha"
     )
+    # Signed challenge from accounts.captcha (no session state)
+    captcha_token = forms.CharField(widget=forms.HiddenInput, required=False)
 
     def clean_captcha(self):
         captcha = self.cleaned_data.get('captcha')
-        expected = self.request.session.get('captcha_expected')
-        
-        if expected is None:
-             # Session might have expired or direct post without page load
-             # In a strict sense, we could error, but let's just error to be safe.
-             raise ValidationError("Session expired. Please refresh the page.")
-        
-        if int(captcha) != int(expected):
-            raise ValidationError("Incorrect answer. Please try again.")
-        
+        try:
+            verify_captcha(self.data.get('captcha_token'), captcha)
+        except CaptchaError as e:
+            raise ValidationError(str(e))
         return captcha
 
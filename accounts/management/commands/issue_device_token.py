@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from accounts import devices
+from accounts.models import Office
+
+
+class Command(BaseCommand):
+    help = (
+        "Issues a signed kiosk/display device token bound to an office (accounts/devices.py) "
+        "and prints the enrolment link to open once on the device."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('office', help="Office code.")
+        parser.add_argument(
+            '--capabilities', default=f'{devices.REGISTER},{devices.TRACK}',
+            help=f"Comma-separated, from: {', '.join(devices.CAPABILITIES)}. Default: a kiosk "
+                 f"({devices.REGISTER},{devices.TRACK}); a display needs {devices.DISPLAY}.",
+        )
+        parser.add_argument('--name', default='', help="Label for the device, e.g. 'Kiosk 1'.")
+
+    def handle(self, *args, **options):
+        office = Office.objects.filter(code=options['office']).first()
+        if not office:
+            raise CommandError(f"Office '{options['office']}' not found")
+        capabilities = [c.strip() for c in options['capabilities'].split(',') if c.strip()]
+        try:
+            token = devices.issue(office, capabilities, name=options['name'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        device = devices.verify(token)
+        self.stdout.write(token)
+        self.stdout.write(self.style.SUCCESS(
+            f"Device {device.device_id} ({', '.join(sorted(device.capabilities))}) for {office.code}. "
+            f"Enrol it by opening: {reverse('device_enrol')}?{urlencode({'token': token})}"
+        ))
@@ -0,0 +1,16 @@
+from . import devices
+
+
+class DeviceTokenMiddleware:
+    """
+    Sets request.device to the verified Device of a kiosk/display token (cookie
+    or "Authorization: Device ..." header), or None. See accounts/devices.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = devices.token_from_request(request)
+        request.device = devices.verify(token) if token else None
+        return self.get_response(request)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_district_office_is_headquarters_alter_office_code_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loginsession',
+            index=models.Index(fields=['login_time'], name='accounts_lo_login_t_6e6dc0_idx'),
+        ),
+    ]
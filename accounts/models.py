@@ -150,5 +150,9 @@ class LoginSession(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
 
+    class Meta:
+        # LoginSessionListView pages by (-login_time, -id)
+        indexes = [models.Index(fields=['login_time'])]
+
     def __str__(self):
         return f"{self.user} at {self.login_time}"
@@ -1,6 +1,17 @@
-from django.test import TestCase, Client
+import time
+from unittest import mock
+
+from django.core import signing
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from core.testing import LOCMEM_CACHE
+from routing.models import DeskQueue, RoutingRule
+from visit_regn.models import Purpose, Visit
+from . import captcha, devices
 from .models import Office, Desk
 
 User = get_user_model()
@@ -69,3 +80,141 @@ class SecurityTests(TestCase):
             self.client.force_login(self.admin_user)
             response = self.client.get(url)
             self.assertEqual(response.status_code, 200)
+
+
+class SessionWriteTests(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name="Test Office", code="TO")
+        self.user = User.objects.create_user(username="staff_user", password="password", role="CLERK", office=self.office)
+
+    def count_session_writes(self, requests):
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(requests):
+                self.client.get(reverse('who_am_i'))
+        return sum(1 for q in ctx.captured_queries if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT'))
+
+    def test_polling_does_not_write_session(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.count_session_writes(50), 0)
+
+    def test_session_refreshed_after_interval(self):
+        self.client.force_login(self.user)
+        later = time.time() + 1800 * 0.1 + 1
+        with mock.patch('accounts.sessions.time.time', return_value=later):
+            self.assertEqual(self.count_session_writes(5), 1)
+
+
+class DeviceTokenTests(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name="Kiosk Office", code="KO1")
+        self.other = Office.objects.create(name="Other Office", code="KO2")
+        self.desk = Desk.objects.create(name="Desk 1", office=self.office)
+        self.other_desk = Desk.objects.create(name="Desk 9", office=self.other)
+        self.purpose = Purpose.objects.create(name="General Enquiry")
+        RoutingRule.objects.create(office=self.office, purpose=self.purpose, default_desk=self.desk)
+
+    def test_verify(self):
+        token = devices.issue(self.office, [devices.REGISTER], name="Kiosk 1")
+        device = devices.verify(token)
+        self.assertEqual(device.office, self.office)
+        self.assertTrue(device.can(devices.REGISTER))
+        self.assertFalse(device.can(devices.DISPLAY))
+
+        key_id, signed = token.split(':', 1)
+        self.assertIsNone(devices.verify(f"{key_id}:{signed[:-1]}x"))
+        self.assertIsNone(devices.verify(f"nokey:{signed}"))
+        with self.assertRaises(ValueError):
+            devices.issue(self.office, ['admin'])
+
+        # Rotation: the old key keeps working while listed; new tokens use the first key
+        with override_settings(DEVICE_TOKEN_KEYS={'2': 'new-secret', '1': 'old-secret'}):
+            with override_settings(DEVICE_TOKEN_KEYS={'1': 'old-secret'}):
+                old = devices.issue(self.office, [devices.DISPLAY])
+            self.assertEqual(devices.verify(old).key_id, '1')
+            self.assertEqual(devices.verify(devices.issue(self.office, [devices.DISPLAY])).key_id, '2')
+        with override_settings(DEVICE_TOKEN_KEYS={'2': 'new-secret'}):
+            self.assertIsNone(devices.verify(old))
+        with override_settings(DEVICE_TOKEN_REVOKED=(device.device_id,)):
+            self.assertIsNone(devices.verify(token))
+
+    def test_kiosk_registers_for_its_office_without_a_session(self):
+        token = devices.issue(self.other, [devices.REGISTER, devices.TRACK])
+        response = self.client.get(reverse('device_enrol') + f'?token={token}')
+        self.assertRedirects(response, reverse('visit_regn:kiosk_home'), fetch_redirect_response=False)
+        self.assertEqual(self.client.cookies[devices.COOKIE_NAME].value, token)
+
+        # The token's office wins over ?office=
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('visit_regn:manual_register') + '?office=KO1',
+                                        {'name': 'Visitor', 'mobile': '9400000000', 'purpose': self.purpose.pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Visit.objects.get().office, self.other)
+        self.assertFalse([q for q in queries.captured_queries if 'django_session' in q['sql']])
+        self.assertNotIn('sessionid', response.cookies)
+
+        self.assertEqual(self.client.get(reverse('track_status'), {'q': 'x'}).status_code, 200)
+        self.assertEqual(self.client.get(reverse('transactions:visitor_display')).status_code, 403)
+
+    def test_display_shows_its_office_and_cannot_register(self):
+        for n, desk in enumerate([self.desk, self.other_desk]):
+            visit = Visit.objects.create(office=desk.office, token=f'T-{n}', purpose=self.purpose,
+                                         registration_mode='KIOSK')
+            DeskQueue.objects.create(visit=visit, desk=desk)
+
+        token = devices.issue(self.office, [devices.DISPLAY])
+        headers = {'HTTP_AUTHORIZATION': f'Device {token}'}
+        calls = self.client.get(reverse('transactions:get_latest_calls'), **headers).json()['calls']
+        self.assertEqual([call['token'] for call in calls], ['T-0'])
+        self.assertEqual(len(self.client.get(reverse('transactions:get_latest_calls')).json()['calls']), 2)
+
+        response = self.client.post(reverse('visit_regn:quick_register'), **headers)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(reverse('device_enrol') + '?token=bogus').status_code, 403)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CaptchaLoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="loginuser", password="password", role="CLERK")
+
+    def challenge(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('landing'))
+        self.assertFalse([q for q in queries.captured_queries if 'django_session' in q['sql']])
+        self.assertNotIn('sessionid', response.cookies)
+        a, b = (int(n) for n in response.context['captcha_question'].rstrip('?').split()[-3::2])
+        return response, a + b, response.context['captcha_token']
+
+    def login(self, answer, token):
+        return self.client.post(reverse('landing'), {
+            'username': 'loginuser', 'password': 'password', 'captcha': answer, 'captcha_token': token,
+        })
+
+    def test_anonymous_landing_page_is_stateless_and_cacheable(self):
+        response, answer, token = self.challenge()
+        self.assertEqual(response['Cache-Control'], 'private, max-age=60')
+        self.assertContains(response, f'name="captcha_token" value="{token}"')
+        # The token carries only the nonce and the digest, never the answer
+        self.assertEqual(set(signing.loads(token, salt=captcha.SALT)), {'n', 'd'})
+
+    def test_login_checks_answer_once(self):
+        _, answer, token = self.challenge()
+        response = self.login(answer + 1, token)
+        self.assertFormError(response.context['form'], 'captcha', "Incorrect answer. Please try again.")
+
+        # The failed attempt used the challenge up
+        response = self.login(answer, token)
+        self.assertFormError(response.context['form'], 'captcha', "This challenge was already used. Please try again.")
+
+        _, answer, token = self.challenge()
+        self.assertRedirects(self.login(answer, token), '/dashboard/', fetch_redirect_response=False)
+
+    def test_forged_and_expired_challenges(self):
+        _, answer, token = self.challenge()
+        response = self.login(answer, token[:-2] + 'xx')
+        self.assertFormError(response.context['form'], 'captcha', "Invalid challenge. Please refresh the page.")
+
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 11 * 60):
+            response = self.login(answer, token)
+        self.assertFormError(response.context['form'], 'captcha', "The challenge has expired. Please try again.")
@@ -43,4 +43,5 @@ urlpatterns = [
 
     path('ajax/load-desks/', views.load_desks, name='ajax_load_desks'),
     path('whoami/', views.who_am_i, name='who_am_i'),
+    path('device/enrol/', views.device_enrol, name='device_enrol'),
 ]
@@ -14,12 +14,27 @@ def get_current_staff_for_user(user):
         from_date__lte=today
     ).filter(
         models.Q(to_date__isnull=True) | models.Q(to_date__gte=today)
-    ).order_by('-from_date').first()
+    ).select_related('staff_member').order_by('-from_date').first()
     
     if assignment:
         return assignment.staff_member
     return None
 
+def current_staff_name_subquery(user_ref='username'):
+    """
+    Subquery with the name of the currently assigned StaffMember, for annotating
+    User querysets (a list of users then needs no query per row).
+    """
+    today = timezone.now().date()
+    return models.Subquery(
+        UserAssignment.objects.filter(
+            user=models.OuterRef(user_ref),
+            from_date__lte=today
+        ).filter(
+            models.Q(to_date__isnull=True) | models.Q(to_date__gte=today)
+        ).order_by('-from_date').values('staff_member__name')[:1]
+    )
+
 def generate_username(role, office_code):
     """
     Generates a username based on the pattern: ROLE + OFFICE_CODE + [SERIAL]
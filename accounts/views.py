@@ -1,17 +1,19 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseForbidden
 from django.contrib.auth.decorators import login_required
 from django.views.generic import ListView, CreateView, UpdateView
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.db.models import Q
 from .models import User, StaffMember, UserAssignment, LoginSession, Office, Desk
 from .forms import CustomUserCreationForm, CustomUserChangeForm, StaffMemberForm, UserAssignmentForm, OfficeForm, DeskForm, CaptchaLoginForm
-from .utils import get_current_staff_for_user
+from .utils import get_current_staff_for_user, current_staff_name_subquery
 from django.contrib.auth.views import LoginView
 from django.conf import settings
+from core.pagination import KeysetPaginationMixin
 from .mixins import AdminRequiredMixin
+from . import captcha
 
 
 
@@ -23,19 +25,19 @@ class LandingLoginView(LoginView):
 
     template_name = 'home.html'
     
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        # LoginView is never_cache; the anonymous page keeps no server state now, so let
+        # the browser reuse it briefly (it varies on Cookie through the CSRF token)
+        if request.method == 'GET' and response.status_code == 200:
+            response['Cache-Control'] = f"private, max-age={settings.LANDING_PAGE_MAX_AGE}"
+            del response['Expires']
+        return response
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Generate Simple Math CAPTCHA
-        import random
-        
-        num1 = random.randint(1, 9)
-        num2 = random.randint(1, 9)
-        # Using addition only for simplicity and mobile-friendliness
-        question = f"What is {num1} + {num2}?"
-        answer = num1 + num2
-        
-        self.request.session['captcha_expected'] = answer
-        context['captcha_question'] = question
+        # Simple math CAPTCHA, signed into the form instead of the session (accounts.captcha)
+        context['captcha_question'], context['captcha_token'] = captcha.new_challenge()
 
         # Add basic announcements content required by home.html
         context['announcements'] = [
@@ -64,14 +66,16 @@ def user_management(request):
         return redirect('landing')
     return render(request, 'accounts/management.html')
 
-class StaffMemberListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class StaffMemberListView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = StaffMember
     template_name = 'accounts/staff_list.html'
     context_object_name = 'staff_members'
     paginate_by = 10
+    keyset_ordering = ('name',)
+    keyset_approximate_total = True
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('office')
         query = self.request.GET.get('q')
         if query:
             queryset = queryset.filter(
@@ -103,14 +107,16 @@ class StaffMemberUpdateView(LoginRequiredMixin, AdminRequiredMixin, UpdateView):
         context['title'] = 'Edit Staff Member'
         return context
 
-class UserAssignmentListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class UserAssignmentListView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = UserAssignment
     template_name = 'accounts/userassignment_list.html'
     context_object_name = 'assignments'
     paginate_by = 10
+    keyset_ordering = ('-from_date',)
+    keyset_approximate_total = True
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('user', 'staff_member')
         query = self.request.GET.get('q')
         if query:
             queryset = queryset.filter(
@@ -141,15 +147,16 @@ class UserAssignmentUpdateView(LoginRequiredMixin, AdminRequiredMixin, UpdateVie
         context['title'] = 'Edit Assignment'
         return context
 
-class LoginSessionListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class LoginSessionListView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = LoginSession
     template_name = 'accounts/loginsession_list.html'
     context_object_name = 'sessions'
     paginate_by = 25
-    ordering = ['-login_time']
+    keyset_ordering = ('-login_time',)
+    keyset_approximate_total = True
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('user', 'staff_member')
         query = self.request.GET.get('q')
         if query:
             queryset = queryset.filter(
@@ -166,14 +173,18 @@ def load_desks(request):
     desks = Desk.objects.filter(office_id=office_id).order_by('name')
     return JsonResponse(list(desks.values('id', 'name')), safe=False)
 
-class UserListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class UserListView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = User
     template_name = 'accounts/user_list.html'
     context_object_name = 'users'
     paginate_by = 10
+    keyset_ordering = ('username',)
+    keyset_approximate_total = True
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('office', 'desk').annotate(
+            current_staff_name=current_staff_name_subquery()
+        )
         query = self.request.GET.get('q')
         if query:
             queryset = queryset.filter(
@@ -288,7 +299,7 @@ class DeskListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('office')
         query = self.request.GET.get('q')
         if query:
             queryset = queryset.filter(
@@ -318,3 +329,29 @@ class DeskUpdateView(LoginRequiredMixin, AdminRequiredMixin, UpdateView):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Edit Desk'
         return context
+
+
+def device_enrol(request):
+    """
+    Stores a device token (issue_device_token) in a long-lived cookie and sends
+    the device to its start page.
+    """
+    from . import devices
+    token = request.GET.get('token', '')
+    device = devices.verify(token)
+    if device is None:
+        return HttpResponseForbidden("Invalid or expired device token.")
+
+    if device.can(devices.REGISTER):
+        target = reverse('visit_regn:kiosk_home')
+    elif device.can(devices.DISPLAY):
+        target = reverse('transactions:visitor_display')
+    else:
+        target = reverse('track_status') + '?kiosk=true'
+    response = redirect(target)
+    response.set_cookie(
+        devices.COOKIE_NAME, token,
+        max_age=getattr(settings, 'DEVICE_TOKEN_MAX_AGE', None) or 10 * 365 * 24 * 60 * 60,
+        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+    return response
@@ -0,0 +1,40 @@
+from django.contrib import admin
+from .models import ArchivedVisit, ArchivedVisitLog, ArchivedTransaction
+
+
+class ReadOnlyArchiveAdmin(admin.ModelAdmin):
+    """Archived rows are history: viewable, never edited."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedVisit)
+class ArchivedVisitAdmin(ReadOnlyArchiveAdmin):
+    list_display = ('token', 'office', 'name', 'mobile', 'purpose', 'status', 'token_issue_time', 'current_desk')
+    list_filter = ('office', 'status', 'registration_mode')
+    list_select_related = ('office', 'purpose', 'current_desk')
+    search_fields = ('=token', '=mobile')
+    date_hierarchy = 'token_issue_time'
+    show_full_result_count = False
+
+
+@admin.register(ArchivedVisitLog)
+class ArchivedVisitLogAdmin(ReadOnlyArchiveAdmin):
+    list_display = ('visit', 'action', 'by_user', 'timestamp')
+    list_filter = ('action',)
+    list_select_related = ('visit', 'by_user')
+    search_fields = ('=visit__token',)
+    show_full_result_count = False
+
+
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(ReadOnlyArchiveAdmin):
+    list_display = ('visit', 'tp_number', 'block', 'status', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('visit',)
+    search_fields = ('=visit__token', '=tp_number')
+    show_full_result_count = False
@@ -0,0 +1,57 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.models import Office
+from archive.services import archive_before, archivable_visits, DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves finished visits (with their logs and transactions) older than the hot window "
+        "into the archive tables, in chunks. Schedule nightly after close_out_day."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help="Keep this many days hot. Defaults to settings.ARCHIVE_AFTER_DAYS.",
+        )
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--max-chunks', type=int, help="Stop after this many chunks (spread a large backlog over several nights).")
+        parser.add_argument('--office', help="Office code to limit archiving to.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be archived.")
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else getattr(settings, 'ARCHIVE_AFTER_DAYS', 90)
+        if days < 1:
+            raise CommandError("--days must be at least 1 (today is always hot)")
+
+        office = None
+        if options['office']:
+            office = Office.objects.filter(code=options['office']).first()
+            if not office:
+                raise CommandError(f"Office '{options['office']}' not found")
+
+        cutoff_day = timezone.localdate() - timedelta(days=days)
+        cutoff = timezone.make_aware(datetime.combine(cutoff_day, datetime.min.time()))
+
+        if options['dry_run']:
+            count = archivable_visits(cutoff, office).count()
+            self.stdout.write(f"{count} visit(s) issued before {cutoff_day} would be archived.")
+            return
+
+        started = time.monotonic()
+        totals = archive_before(cutoff, office=office, chunk_size=options['chunk_size'], max_chunks=options['max_chunks'])
+        elapsed = time.monotonic() - started
+
+        rate = totals['visits'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {totals['visits']} visit(s), {totals['logs']} log(s), "
+            f"{totals['transactions']} transaction(s) issued before {cutoff_day} "
+            f"in {totals['chunks']} chunk(s), {elapsed:.1f}s ({rate:.0f} visits/s). "
+            f"Purged {totals['counters']} token counter(s)."
+        ))
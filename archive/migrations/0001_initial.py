@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0002_district_office_is_headquarters_alter_office_code_and_more'),
+        ('filing', '0004_alter_officefile_interim_status'),
+        ('visit_regn', '0003_alter_visit_registration_mode'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedVisit',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('token', models.CharField(max_length=20)),
+                ('mobile', models.CharField(blank=True, max_length=15, null=True)),
+                ('name', models.CharField(blank=True, max_length=150, null=True)),
+                ('reference_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('registration_mode', models.CharField(choices=[('QR', 'QR Code'), ('KIOSK', 'Kiosk'), ('QUICK', 'Quick'), ('MOBILE', 'Mobile')], max_length=10)),
+                ('token_issue_time', models.DateTimeField()),
+                ('token_attend_time', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('WAITING', 'Waiting'), ('ROUTED', 'Routed'), ('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('current_desk', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.desk')),
+                ('office', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.office')),
+                ('purpose', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='visit_regn.purpose')),
+                ('related_office_file', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='filing.officefile')),
+            ],
+            options={
+                'verbose_name': 'Archived Visit',
+                'verbose_name_plural': 'Archived Visits',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tp_number', models.CharField(blank=True, max_length=5, null=True)),
+                ('block', models.CharField(blank=True, max_length=4, null=True)),
+                ('remarks1', models.CharField(blank=True, max_length=255, null=True)),
+                ('remarks2', models.CharField(blank=True, max_length=255, null=True)),
+                ('remarks3', models.CharField(blank=True, max_length=255, null=True)),
+                ('status', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('visit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='transaction', to='archive.archivedvisit')),
+            ],
+            options={
+                'verbose_name': 'Archived Transaction',
+                'verbose_name_plural': 'Archived Transactions',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedVisitLog',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('action', models.CharField(choices=[('CREATED', 'Created'), ('ROUTED', 'Routed'), ('ASSIGNED', 'Assigned'), ('ATTENDED', 'Attended'), ('TRANSFERRED', 'Transferred'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled'), ('COMMENT', 'Comment')], max_length=20)),
+                ('remarks', models.TextField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField()),
+                ('by_staff', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.staffmember')),
+                ('by_user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('from_desk', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.desk')),
+                ('to_desk', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.desk')),
+                ('visit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='logs', to='archive.archivedvisit')),
+            ],
+            options={
+                'verbose_name': 'Archived Visit Log',
+                'verbose_name_plural': 'Archived Visit Logs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedvisit',
+            index=models.Index(fields=['office', 'token_issue_time'], name='archive_arc_office__a29ae5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedvisit',
+            index=models.Index(fields=['token'], name='archive_arc_token_ac8ce0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedvisit',
+            index=models.Index(fields=['mobile'], name='archive_arc_mobile_1eafbd_idx'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+from django.db import models
+from django.conf import settings
+from django.utils import timezone
+from accounts.models import Office, Desk, StaffMember
+from visit_regn.models import Purpose, Visit, VisitLog
+
+# Cold copies of Visit / VisitLog / Transaction for days outside the hot window.
+# Rows keep their original primary keys so links and exports stay stable.
+# Reference-data FKs use db_constraint=False so the archive can live in a
+# separate database (see archive.routers.ArchiveRouter).
+
+class ArchivedVisit(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    office = models.ForeignKey(Office, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    token = models.CharField(max_length=20)
+    mobile = models.CharField(max_length=15, null=True, blank=True)
+    name = models.CharField(max_length=150, null=True, blank=True)
+    purpose = models.ForeignKey(Purpose, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    reference_number = models.CharField(max_length=50, null=True, blank=True)
+    registration_mode = models.CharField(max_length=10, choices=Visit.RegistrationMode.choices)
+
+    token_issue_time = models.DateTimeField()
+    token_attend_time = models.DateTimeField(null=True, blank=True)
+
+    current_desk = models.ForeignKey(Desk, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=Visit.Status.choices)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    related_office_file = models.ForeignKey('filing.OfficeFile', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['office', 'token_issue_time']),
+            models.Index(fields=['token']),
+            models.Index(fields=['mobile']),
+        ]
+        verbose_name = "Archived Visit"
+        verbose_name_plural = "Archived Visits"
+
+    # Same display helpers as Visit so templates can render either
+    formatted_issue_time = Visit.formatted_issue_time
+    is_archived = True
+
+    def __str__(self):
+        return f"{self.token} - {self.name or 'Visitor'} (archived)"
+
+
+class ArchivedVisitLog(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    visit = models.ForeignKey(ArchivedVisit, on_delete=models.CASCADE, related_name='logs')
+    action = models.CharField(max_length=20, choices=VisitLog.Action.choices)
+
+    by_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    by_staff = models.ForeignKey(StaffMember, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+
+    from_desk = models.ForeignKey(Desk, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    to_desk = models.ForeignKey(Desk, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+
+    remarks = models.TextField(null=True, blank=True)
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Archived Visit Log"
+        verbose_name_plural = "Archived Visit Logs"
+
+    def __str__(self):
+        return f"{self.visit.token} - {self.action}"
+
+
+class ArchivedTransaction(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    visit = models.OneToOneField(ArchivedVisit, on_delete=models.CASCADE, related_name='transaction')
+    tp_number = models.CharField(max_length=5, blank=True, null=True)
+    block = models.CharField(max_length=4, blank=True, null=True)
+
+    remarks1 = models.CharField(max_length=255, blank=True, null=True)
+    remarks2 = models.CharField(max_length=255, blank=True, null=True)
+    remarks3 = models.CharField(max_length=255, blank=True, null=True)
+
+    status = models.CharField(max_length=20)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Archived Transaction"
+        verbose_name_plural = "Archived Transactions"
+
+    def __str__(self):
+        return f"Transaction for {self.visit.token} - {self.tp_number or 'No TP'}"
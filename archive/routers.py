@@ -0,0 +1,52 @@
+from django.conf import settings
+
+ARCHIVE_APP = 'archive'
+
+
+def get_archive_db():
+    """
+    Alias the archive tables live in. Defaults to 'default' (same database);
+    set ARCHIVE_DATABASE to a second alias (e.g. a separate SQLite file) to keep
+    the hot database - and its backups - small.
+    """
+    return getattr(settings, 'ARCHIVE_DATABASE', 'default')
+
+
+class ArchiveRouter:
+    """
+    Sends the archive app to ARCHIVE_DATABASE and keeps everything else off it.
+    Only needed when ARCHIVE_DATABASE is not 'default'.
+    """
+
+    def _is_archive(self, obj):
+        # Works for model classes and instances (including lazy request.user)
+        return obj._meta.app_label == ARCHIVE_APP
+
+    def db_for_read(self, model, **hints):
+        if self._is_archive(model):
+            return get_archive_db()
+        # Reference data looked up from an archived row (e.g. visit.office) lives on default
+        instance = hints.get('instance')
+        if instance is not None and self._is_archive(instance):
+            return 'default'
+        return None
+
+    def db_for_write(self, model, **hints):
+        if self._is_archive(model):
+            return get_archive_db()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._is_archive(obj1) or self._is_archive(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        archive_db = get_archive_db()
+        if archive_db == 'default':
+            return None
+        if app_label == ARCHIVE_APP:
+            return db == archive_db
+        if db == archive_db:
+            return False
+        return None
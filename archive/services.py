@@ -0,0 +1,151 @@
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from visit_regn.models import Visit, VisitLog, DailyTokenCounter
+from transactions.models import Transaction
+from routing.models import DeskQueue, VisitLock
+from .models import ArchivedVisit, ArchivedVisitLog, ArchivedTransaction
+from .routers import get_archive_db
+
+# Only finished visits move to the archive. Visits that opened an OfficeFile stay hot:
+# OfficeFile.visit is a OneToOne with CASCADE, and files live for years.
+ARCHIVABLE_STATUSES = [Visit.Status.COMPLETED, Visit.Status.CANCELLED]
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _copy_fields(archive_model):
+    return [f.attname for f in archive_model._meta.concrete_fields if f.attname != 'archived_at']
+
+
+def archivable_visits(cutoff, office=None):
+    qs = Visit.objects.filter(
+        token_issue_time__lt=cutoff,
+        status__in=ARCHIVABLE_STATUSES,
+        office_file__isnull=True
+    )
+    if office is not None:
+        qs = qs.filter(office=office)
+    return qs
+
+
+def archive_chunk(visit_ids):
+    """
+    Copies one chunk of visits (with their logs and transaction) into the archive
+    tables and removes them from the hot tables.
+    The copy uses ignore_conflicts, so a chunk interrupted between the copy and
+    the delete is simply copied again on the next run.
+    """
+    visit_rows = list(Visit.objects.filter(id__in=visit_ids).values(*_copy_fields(ArchivedVisit)))
+    log_rows = list(VisitLog.objects.filter(visit_id__in=visit_ids).values(*_copy_fields(ArchivedVisitLog)))
+    txn_rows = list(Transaction.objects.filter(visit_id__in=visit_ids).values(*_copy_fields(ArchivedTransaction)))
+
+    archive_db = get_archive_db()
+    with transaction.atomic(using=archive_db):
+        ArchivedVisit.objects.bulk_create([ArchivedVisit(**row) for row in visit_rows], ignore_conflicts=True)
+        ArchivedVisitLog.objects.bulk_create([ArchivedVisitLog(**row) for row in log_rows], ignore_conflicts=True)
+        ArchivedTransaction.objects.bulk_create([ArchivedTransaction(**row) for row in txn_rows], ignore_conflicts=True)
+
+    with transaction.atomic():
+        # Delete children explicitly so the Visit delete does not have to collect them row by row
+        VisitLog.objects.filter(visit_id__in=visit_ids).delete()
+        Transaction.objects.filter(visit_id__in=visit_ids).delete()
+        DeskQueue.objects.filter(visit_id__in=visit_ids).delete()
+        VisitLock.objects.filter(visit_id__in=visit_ids).delete()
+        Visit.objects.filter(id__in=visit_ids).delete()
+
+    return {'visits': len(visit_rows), 'logs': len(log_rows), 'transactions': len(txn_rows)}
+
+
+def archive_before(cutoff, office=None, chunk_size=DEFAULT_CHUNK_SIZE, max_chunks=None):
+    """
+    Moves finished visits issued before cutoff into the archive, chunk_size at a time,
+    each chunk in its own short transaction so live traffic is never blocked for long.
+    """
+    totals = {'visits': 0, 'logs': 0, 'transactions': 0, 'chunks': 0}
+
+    while max_chunks is None or totals['chunks'] < max_chunks:
+        ids = list(archivable_visits(cutoff, office).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            break
+        moved = archive_chunk(ids)
+        for key, value in moved.items():
+            totals[key] += value
+        totals['chunks'] += 1
+
+    # Token counters for past days are never read again
+    counters = DailyTokenCounter.objects.filter(date__lt=timezone.localtime(cutoff).date())
+    if office is not None:
+        counters = counters.filter(office=office)
+    totals['counters'], _ = counters.delete()
+
+    return totals
+
+
+# Read-through shim
+# ------------------------------------------------------------------------------
+# Hot tables first, archive second. Returned archived rows expose the same
+# attributes the templates use (token, get_status_display, current_desk, ...).
+
+def _cold(qs, *related):
+    # Joins to reference tables only work while the archive shares the default database
+    if related and get_archive_db() == 'default':
+        return qs.select_related(*related)
+    return qs
+
+def get_visit_by_token(token):
+    """
+    Visit (or ArchivedVisit) with this token, case-insensitive.
+    Raises Visit.DoesNotExist if neither table has it.
+    """
+    try:
+        return Visit.objects.select_related('office', 'current_desk', 'related_office_file').get(token__iexact=token)
+    except Visit.DoesNotExist:
+        archived = _cold(ArchivedVisit.objects.filter(token__iexact=token), 'office', 'current_desk').first()
+        if archived is None:
+            raise
+        return archived
+
+
+def visits_by_mobile(mobile):
+    """
+    All visits (hot and archived) for a mobile number, newest first.
+    """
+    hot = Visit.objects.filter(mobile=mobile).select_related('office', 'purpose', 'office_file', 'related_office_file')
+    cold = _cold(ArchivedVisit.objects.filter(mobile=mobile), 'office', 'purpose', 'related_office_file')
+    return sorted(chain(hot, cold), key=lambda v: v.token_issue_time, reverse=True)
+
+
+def visit_range_querysets(start, end, search=None, status=None, office=None):
+    """
+    (hot, archived) querysets of the visits issued in [start, end], newest first;
+    archived is None when nothing in the range is archived.
+    """
+    filters = Q(token_issue_time__range=(start, end))
+    if search:
+        filters &= Q(name__icontains=search) | Q(token__icontains=search)
+    if status:
+        filters &= Q(status=status)
+    if office is not None:
+        filters &= Q(office=office)
+
+    hot = Visit.objects.filter(filters).select_related('purpose', 'office').order_by('-token_issue_time')
+    cold = ArchivedVisit.objects.filter(filters)
+    if not cold.exists():
+        return hot, None
+    return hot, _cold(cold, 'purpose', 'office').order_by('-token_issue_time')
+
+
+def visits_in_range(start, end, search=None, status=None, office=None):
+    """
+    Visits issued in [start, end] across hot and archive tables.
+    Returns the hot queryset untouched when nothing in the range is archived,
+    otherwise a newest-first list of both.
+    """
+    hot, cold = visit_range_querysets(start, end, search, status, office)
+    if cold is None:
+        return hot
+    return list(chain(hot, cold))
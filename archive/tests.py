@@ -0,0 +1,75 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Office, Desk, User
+from visit_regn.models import Visit, VisitLog, Purpose
+from transactions.models import Transaction
+from filing.models import OfficeFile
+from .models import ArchivedVisit, ArchivedVisitLog, ArchivedTransaction
+from .services import archive_before, get_visit_by_token, visits_by_mobile
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name="Test Office", code="TOFF")
+        self.desk = Desk.objects.create(name="Desk 1", office=self.office)
+        self.purpose = Purpose.objects.create(name="General Enquiry")
+
+    def make_visit(self, token, days_ago, status=Visit.Status.COMPLETED):
+        visit = Visit.objects.create(
+            office=self.office, token=token, purpose=self.purpose, mobile="9876543210",
+            registration_mode="QUICK", status=status, current_desk=self.desk
+        )
+        Visit.objects.filter(pk=visit.pk).update(token_issue_time=timezone.now() - timedelta(days=days_ago))
+        VisitLog.objects.create(visit=visit, action=VisitLog.Action.CREATED)
+        return visit
+
+    def test_archive_moves_finished_old_visits_in_chunks(self):
+        old = [self.make_visit(f"TOFF-OLD-{i:03d}", days_ago=200) for i in range(5)]
+        Transaction.objects.create(visit=old[0], tp_number="123")
+        open_old = self.make_visit("TOFF-OPEN-001", days_ago=200, status=Visit.Status.WAITING)
+        filed = self.make_visit("TOFF-FILE-001", days_ago=200)
+        OfficeFile.objects.create(visit=filed, office=self.office)
+        recent = self.make_visit("TOFF-NEW-001", days_ago=1)
+
+        totals = archive_before(timezone.now() - timedelta(days=90), chunk_size=2)
+
+        self.assertEqual(totals['visits'], 5)
+        self.assertEqual(totals['chunks'], 3)
+        self.assertEqual(ArchivedVisit.objects.count(), 5)
+        self.assertEqual(ArchivedVisitLog.objects.count(), 5)
+        self.assertEqual(ArchivedTransaction.objects.get().visit_id, old[0].id)
+
+        # Open visits, visits that own a file and recent visits stay hot
+        self.assertEqual(
+            set(Visit.objects.values_list('id', flat=True)),
+            {open_old.id, filed.id, recent.id}
+        )
+
+    def test_read_through(self):
+        old = self.make_visit("TOFF-OLD-001", days_ago=200)
+        self.make_visit("TOFF-NEW-001", days_ago=1)
+        archive_before(timezone.now() - timedelta(days=90))
+
+        archived = get_visit_by_token("toff-old-001")
+        self.assertIsInstance(archived, ArchivedVisit)
+        self.assertEqual(archived.id, old.id)
+        self.assertEqual(archived.get_status_display(), "Completed")
+        self.assertEqual([v.token for v in visits_by_mobile("9876543210")], ["TOFF-NEW-001", "TOFF-OLD-001"])
+
+        response = self.client.get(reverse('track_status'), {'q': 'TOFF-OLD-001'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result']['ref'], 'TOFF-OLD-001')
+
+    def test_mis_reports_include_archived_days(self):
+        old = self.make_visit("TOFF-OLD-001", days_ago=200)
+        archive_before(timezone.now() - timedelta(days=90))
+        self.client.force_login(User.objects.create_user(username="vo", password="password", role="VO", office=self.office))
+
+        day = timezone.localtime(ArchivedVisit.objects.get(pk=old.pk).token_issue_time).date().isoformat()
+        response = self.client.get(reverse('mis:daily_report'), {'from_date': day, 'to_date': day})
+        self.assertContains(response, "TOFF-OLD-001")
+
+        response = self.client.get(reverse('mis:service_report'))
+        self.assertEqual(response.context['analysis_data'][0]['total'], 1)
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .db import apply_sqlite_pragmas
+        connection_created.connect(apply_sqlite_pragmas)
+
+        from .cache import connect_invalidation_bus
+        connect_invalidation_bus()
+
+        from .refdata import connect_snapshot_signals
+        connect_snapshot_signals()
@@ -0,0 +1,167 @@
+"""
+Shared cache layer.
+
+All gunicorn workers share settings.CACHES['default'] (file-based, or Redis when
+VISTA_REDIS_URL is set), so anything cached here is consistent across workers.
+
+Keys are namespaced per office and carry a version stamp:
+
+    vista:<namespace>:<office_id|all>:v<version>:<name>
+
+The version stamp lives in the same shared cache. When a model in
+INVALIDATION_RULES is saved or deleted, the bus bumps the stamp of its
+namespace/office; every worker reads the new stamp on its next lookup and
+misses, so changes are visible from the next request on. Old entries are never
+read again and simply expire.
+
+Note: signals do not fire for queryset.update()/bulk_create(); call
+invalidate() yourself after bulk edits of reference data.
+"""
+import os
+import socket
+import time
+
+from django.apps import apps
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+CACHE_ALIAS = 'default'
+GLOBAL_SCOPE = 'all'
+DEFAULT_TIMEOUT = 60 * 60
+
+_MISSING = object()
+
+# (model label, namespace, office id attribute or None for office-independent data)
+INVALIDATION_RULES = [
+    ('routing.RoutingRule', 'routing', 'office_id'),
+    ('accounts.Desk', 'desk', 'office_id'),
+    ('accounts.Desk', 'routing', 'office_id'),   # rules and the VO desk point at desks
+    ('accounts.Office', 'office', None),
+    ('visit_regn.Purpose', 'purpose', None),
+    ('accounts.UserAssignment', 'staff', None),
+    ('accounts.StaffMember', 'staff', None),
+    # Per-worker reference snapshot (core.refdata)
+    ('visit_regn.Purpose', 'refdata', None),
+    ('accounts.Desk', 'refdata', None),
+    ('accounts.Office', 'refdata', None),
+]
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _scope(office):
+    if office is None:
+        return GLOBAL_SCOPE
+    return getattr(office, 'pk', office)
+
+
+def _version_key(namespace, office):
+    return f"vista:ver:{namespace}:{_scope(office)}"
+
+
+def get_version(namespace, office=None):
+    cache = get_cache()
+    key = _version_key(namespace, office)
+    version = cache.get(key)
+    if version is None:
+        # First use, or the stamp was evicted: start from the clock so an old
+        # stamp (and the entries cached under it) can never come back
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace, office=None):
+    cache = get_cache()
+    key = _version_key(namespace, office)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def make_key(namespace, name, office=None):
+    return f"vista:{namespace}:{_scope(office)}:v{get_version(namespace, office)}:{name}"
+
+
+def cached(namespace, name, compute, office=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Returns the cached value for (namespace, office, name), computing and storing
+    it on a miss. None is a valid cached value.
+    """
+    cache = get_cache()
+    key = make_key(namespace, name, office)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def invalidate(namespace, office=None):
+    """
+    Bumps the version stamp now, and again once the surrounding transaction commits
+    (a worker may have re-cached the old rows in between).
+    """
+    bump_version(namespace, office)
+    transaction.on_commit(lambda: bump_version(namespace, office))
+
+
+def _make_receiver(namespace, office_attr):
+    def receiver(sender, instance, **kwargs):
+        office = getattr(instance, office_attr) if office_attr else None
+        invalidate(namespace, office)
+    return receiver
+
+
+def connect_invalidation_bus():
+    """Called from CoreConfig.ready()."""
+    for label, namespace, office_attr in INVALIDATION_RULES:
+        model = apps.get_model(label)
+        receiver = _make_receiver(namespace, office_attr)
+        uid = f"vista-cache:{label}:{namespace}"
+        post_save.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+
+
+# Per-worker values
+# ------------------------------------------------------------------------------
+# In-process totals (profiler, metrics) are published by each worker under its
+# own key and merged when read, so workers never contend on one entry.
+
+class WorkerShards:
+    """
+    One value per worker process in the shared cache, listed in a registry entry:
+
+        vista:<name>:<host>:<pid>     the worker's latest value
+        vista:<name>:workers          keys of the workers that published
+
+    Entries of stopped workers expire after `timeout` and drop out of the registry.
+    """
+
+    def __init__(self, name, timeout=24 * 60 * 60):
+        self.name = name
+        self.timeout = timeout
+        self.registry_key = f"vista:{name}:workers"
+
+    def worker_key(self):
+        return f"vista:{self.name}:{socket.gethostname()}:{os.getpid()}"
+
+    def publish(self, value):
+        cache = get_cache()
+        key = self.worker_key()
+        cache.set(key, value, self.timeout)
+        registry = cache.get(self.registry_key) or []
+        # Lost registry updates (two workers at once) heal on the next publish
+        if key not in registry:
+            live = list(cache.get_many(registry)) if registry else []
+            cache.set(self.registry_key, live + [key], self.timeout)
+
+    def collect(self):
+        """The values of every worker that published recently."""
+        cache = get_cache()
+        registry = cache.get(self.registry_key) or []
+        return list(cache.get_many(registry).values()) if registry else []
@@ -0,0 +1,95 @@
+"""
+SQLite production profile.
+
+- apply_sqlite_pragmas: applies settings.SQLITE_PRAGMAS (WAL, busy_timeout,
+  synchronous, mmap_size) to every new SQLite connection.
+- serialized_write: runs a write path under a per-process lock and retries it
+  with exponential backoff when SQLite reports "database is locked".
+
+Both are no-ops on MySQL (local development) or when SQLITE_PRAGMAS is not set.
+
+Also add_to_counters, for running totals kept in counter rows.
+"""
+import functools
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, OperationalError, connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+# Turned off by the benchmark to measure the untuned baseline
+TUNING_ENABLED = True
+
+_write_lock = threading.RLock()
+
+
+def is_sqlite_tuned(connection):
+    return TUNING_ENABLED and connection.vendor == 'sqlite' and bool(getattr(settings, 'SQLITE_PRAGMAS', None))
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver."""
+    if not is_sqlite_tuned(connection):
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+def _is_lock_error(exc):
+    message = str(exc).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def serialized_write(func):
+    """
+    Decorator for short write transactions (token issue, routing).
+
+    Only the outermost call retries: inside an atomic block a failed statement
+    has already broken the transaction, so the error is left to the caller.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.in_atomic_block or not is_sqlite_tuned(connection):
+            return func(*args, **kwargs)
+
+        retries = getattr(settings, 'SQLITE_WRITE_RETRIES', 5)
+        delay = getattr(settings, 'SQLITE_WRITE_BACKOFF', 0.05)
+        for attempt in range(retries + 1):
+            try:
+                with _write_lock:
+                    return func(*args, **kwargs)
+            except OperationalError as e:
+                if not _is_lock_error(e) or attempt == retries:
+                    raise
+                logger.warning("%s: database locked, retry %d/%d", func.__qualname__, attempt + 1, retries)
+                time.sleep(delay * (1 + random.random()))
+                delay *= 2
+    return wrapper
+
+
+def add_to_counters(model, keys, defaults=None, **deltas):
+    """
+    Adds deltas to the counter columns of the row matching keys (one UPDATE with
+    F() expressions, so concurrent writers never lose an increment), creating the
+    row from keys, defaults and the deltas if it does not exist yet.
+    Runs in the caller's transaction.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Another writer created the row first
+        model.objects.filter(**keys).update(**changes)
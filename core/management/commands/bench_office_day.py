@@ -0,0 +1,534 @@
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from .bench_sqlite_kiosks import percentile
+
+SCENARIO_DIR = Path(__file__).resolve().parents[2] / 'scenarios'
+
+CHANNELS = ('kiosk', 'qr', 'mobile', 'quick')
+
+SCENARIO_KEYS = {
+    'description', 'offices', 'open_hour', 'close_hour', 'hourly_profile',
+    'registrations_per_office', 'channels', 'purposes', 'desks_per_office',
+    'service_minutes', 'transfer_ratio', 'staff_idle_poll_seconds',
+    'displays_per_office', 'display_poll_seconds', 'vo_queue_poll_seconds',
+    'vo_exports_per_day', 'vo_reports', 'time_scale',
+}
+
+REQUEST_TIMEOUT = 30
+
+Response = namedtuple('Response', 'status headers body')
+
+
+# Scenarios
+# ------------------------------------------------------------------------------
+# A scenario is a JSON file in core/scenarios/ (see office_day.json). The simulated
+# day runs `time_scale` times faster than real time and every actor's pace is
+# scaled with it, so the load is that of `time_scale` such offices running at once.
+
+def bundled_scenarios():
+    return sorted(p.stem for p in SCENARIO_DIR.glob('*.json'))
+
+
+def load_scenario(name):
+    """Loads a bundled scenario by name, or any scenario file by path."""
+    path = Path(name)
+    if path.suffix != '.json':
+        path = SCENARIO_DIR / f'{name}.json'
+    if not path.exists():
+        raise CommandError(f"No scenario {name!r}. Bundled: {', '.join(bundled_scenarios())}")
+
+    with open(path, encoding='utf-8') as f:
+        scenario = json.load(f)
+
+    missing = SCENARIO_KEYS - scenario.keys()
+    unknown = scenario.keys() - SCENARIO_KEYS
+    if missing or unknown:
+        raise CommandError(f"{path.name}: missing keys {sorted(missing)}, unknown keys {sorted(unknown)}")
+    hours = scenario['close_hour'] - scenario['open_hour']
+    if hours <= 0 or len(scenario['hourly_profile']) != hours:
+        raise CommandError(f"{path.name}: hourly_profile needs one weight per opening hour ({hours})")
+    if not set(scenario['channels']) <= set(CHANNELS):
+        raise CommandError(f"{path.name}: channels must be among {', '.join(CHANNELS)}")
+    return scenario
+
+
+def day_seconds(scenario):
+    return (scenario['close_hour'] - scenario['open_hour']) * 3600
+
+
+def arrival_schedule(scenario, rng):
+    """
+    [(seconds after opening, office index, channel)] in time order: each office gets
+    registrations_per_office arrivals, spread over the hours by hourly_profile and
+    uniformly within each hour.
+    """
+    weights = scenario['hourly_profile']
+    total_weight = sum(weights)
+    channels, channel_weights = zip(*scenario['channels'].items())
+
+    arrivals = []
+    for office in range(scenario['offices']):
+        for hour, weight in enumerate(weights):
+            count = round(scenario['registrations_per_office'] * weight / total_weight)
+            for _ in range(count):
+                at = rng.uniform(hour * 3600, (hour + 1) * 3600)
+                arrivals.append((at, office, rng.choices(channels, channel_weights)[0]))
+    arrivals.sort()
+    return arrivals
+
+
+# Load generation
+# ------------------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Server exited early (code {process.returncode})")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Server did not start listening on port {port}")
+
+
+def server_command(port, workers):
+    """gunicorn sync workers serving this project."""
+    return [sys.executable, '-m', 'gunicorn', 'vista_project.wsgi:application',
+            '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning']
+
+
+def bench_host():
+    """A Host header the server accepts."""
+    return next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+
+
+class Recorder:
+    """Latencies and failures per endpoint label."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, label, ms, ok):
+        self.latencies.setdefault(label, [])
+        self.errors.setdefault(label, 0)
+        if ok:
+            self.latencies[label].append(ms)
+        else:
+            self.errors[label] += 1
+
+    def summary(self, elapsed):
+        rows = []
+        for label in sorted(self.latencies):
+            values = self.latencies[label]
+            rows.append({
+                'endpoint': label,
+                'ok': len(values),
+                'errors': self.errors[label],
+                'rps': len(values) / elapsed if elapsed else 0,
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'max': max(values, default=0.0),
+            })
+        return rows
+
+
+class HttpSession:
+    """
+    One simulated browser or device: keeps its cookies and sends a CSRF cookie and
+    header with every POST. Speaks HTTP/1.0 with a fresh connection per request,
+    like the sync gunicorn workers expect.
+    """
+
+    def __init__(self, port, host, recorder, cookies=None):
+        self.port = port
+        self.host = host
+        self.recorder = recorder
+        self.cookies = dict(cookies or {})
+        self.cookies[settings.CSRF_COOKIE_NAME] = ''.join(random.choices(string.ascii_letters + string.digits, k=32))
+
+    async def get(self, label, path):
+        return await self.request(label, 'GET', path)
+
+    async def post(self, label, path, data=None):
+        return await self.request(label, 'POST', path, data)
+
+    async def request(self, label, method, path, data=None):
+        body = urlencode(data or {}, doseq=True).encode()
+        head = [
+            f"{method} {path} HTTP/1.0",
+            f"Host: {self.host}",
+            "Cookie: " + '; '.join(f'{k}={v}' for k, v in self.cookies.items()),
+        ]
+        if method == 'POST':
+            head += [
+                "Content-Type: application/x-www-form-urlencoded",
+                f"Content-Length: {len(body)}",
+                # Unmasked secret, matching whatever CSRF cookie the server last set
+                f"X-CSRFToken: {self.cookies.get(settings.CSRF_COOKIE_NAME, '')}",
+            ]
+        payload = ('\r\n'.join(head) + '\r\n\r\n').encode() + (body if method == 'POST' else b'')
+
+        started = time.perf_counter()
+        try:
+            raw = await asyncio.wait_for(self._exchange(payload), timeout=REQUEST_TIMEOUT)
+            response = self._parse(raw)
+        except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+            self.recorder.record(label, 0, ok=False)
+            return None
+        self.recorder.record(label, (time.perf_counter() - started) * 1000, ok=response.status < 400)
+        return response
+
+    async def _exchange(self, payload):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        try:
+            writer.write(payload)
+            await writer.drain()
+            return await reader.read()
+        finally:
+            writer.close()
+
+    def _parse(self, raw):
+        head, _, body = raw.partition(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                cookie, _, _ = value.partition(';')
+                key, _, cookie_value = cookie.partition('=')
+                if cookie_value in ('', '""'):
+                    self.cookies.pop(key, None)
+                else:
+                    self.cookies[key] = cookie_value
+            headers[name] = value
+        return Response(status, headers, body)
+
+
+def location(response):
+    """Path of a redirect, or None."""
+    if response is None or response.status not in (301, 302, 303) or 'location' not in response.headers:
+        return None
+    parts = urlsplit(response.headers['location'])
+    return parts.path + (f'?{parts.query}' if parts.query else '')
+
+
+class OfficeDay:
+    """Runs one scenario against a server on `port`."""
+
+    def __init__(self, scenario, world, port, host, rng):
+        self.scenario = scenario
+        self.world = world
+        self.port = port
+        self.host = host
+        self.rng = rng
+        self.scale = scenario['time_scale']
+        self.recorder = Recorder()
+        self.stop = None
+
+        before, after = reverse('routing:attend_visit', args=[0]).rsplit('0', 1)
+        self.attend_re = re.compile(re.escape(before) + r'(\d+)' + re.escape(after))
+
+    def session(self, cookies=None):
+        return HttpSession(self.port, self.host, self.recorder, cookies)
+
+    async def pause(self, simulated_seconds):
+        """Sleeps for simulated time; returns True if the day ended meanwhile."""
+        try:
+            await asyncio.wait_for(self.stop.wait(), timeout=simulated_seconds / self.scale)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def run(self):
+        self.stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        actors = []
+        for office in self.world['offices']:
+            for _ in range(self.scenario['displays_per_office']):
+                actors.append(self.display())
+            for staff in office['staff']:
+                actors.append(self.staff(staff, office))
+            actors.append(self.vo_queue(office))
+            actors.append(self.vo_exports(office))
+        actor_tasks = [asyncio.create_task(actor) for actor in actors]
+
+        visits = []
+        schedule = arrival_schedule(self.scenario, self.rng)
+        for n, (at, office_index, channel) in enumerate(schedule):
+            delay = started + at / self.scale - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            office = self.world['offices'][office_index]
+            visits.append(asyncio.create_task(self.register(n, office, channel)))
+
+        remaining = started + day_seconds(self.scenario) / self.scale - loop.time()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        self.stop.set()
+        await asyncio.gather(*visits, *actor_tasks)
+        return loop.time() - started, len(schedule)
+
+    # Actors
+
+    async def register(self, n, office, channel):
+        session = self.session()
+        code = office['code']
+        purpose = self.rng.choice(self.world['purposes'])
+        form = {'name': f'Visitor {n}', 'mobile': f'9{n:09d}', 'purpose': purpose, 'reference_number': ''}
+
+        if channel in ('kiosk', 'qr'):
+            if channel == 'kiosk':
+                await session.get('kiosk:home', f"{reverse('visit_regn:kiosk_home')}?office={code}")
+            view = 'visit_regn:manual_register' if channel == 'kiosk' else 'visit_regn:qr_register'
+            url = f"{reverse(view)}?office={code}"
+            await session.get(f'{channel}:form', url)
+            response = await session.post(f'{channel}:register', url, form)
+            token_label = f'{channel}:token_print'
+        elif channel == 'mobile':
+            url = f"{reverse('visit_regn:mobile_entry')}?office={code}"
+            await session.get('mobile:form', url)
+            response = await session.post('mobile:register', url, form)
+            token_label = 'mobile:token'
+        else:
+            response = await session.get('quick:register', f"{reverse('visit_regn:quick_register')}?office={code}")
+            token_label = 'quick:token_print'
+
+        token_url = location(response)
+        if token_url:
+            await session.get(token_label, token_url)
+
+    async def display(self):
+        session = self.session()
+        url = reverse('transactions:get_latest_calls')
+        while True:
+            await session.get('display:latest_calls', url)
+            if await self.pause(self.scenario['display_poll_seconds']):
+                return
+
+    async def staff(self, staff, office):
+        session = self.session(staff['cookies'])
+        queue_url = reverse('routing:desk_queue')
+        other_desks = [d for d in office['desks'] if d != staff['desk']]
+        service_seconds = self.scenario['service_minutes'] * 60
+
+        while not self.stop.is_set():
+            response = await session.get('staff:desk_queue', queue_url)
+            waiting = self.attend_re.findall(response.body.decode('utf-8', 'replace')) if response else []
+            if not waiting:
+                if await self.pause(self.scenario['staff_idle_poll_seconds']):
+                    return
+                continue
+
+            visit_id = int(waiting[0])
+            response = await session.post('staff:call', reverse('routing:attend_visit', args=[visit_id]))
+            if location(response) is None:
+                continue
+            await session.get('staff:process', location(response))
+            if await self.pause(self.rng.expovariate(1 / service_seconds)):
+                return
+
+            if other_desks and self.rng.random() < self.scenario['transfer_ratio']:
+                await session.post('staff:transfer', reverse('routing:transfer_visit', args=[visit_id]),
+                                   {'target_desk': self.rng.choice(other_desks), 'remarks': 'Transferred'})
+            else:
+                await session.post('staff:complete', reverse('routing:complete_visit', args=[visit_id]),
+                                   {'remarks': 'Done'})
+
+    async def vo_queue(self, office):
+        session = self.session(office['vo_cookies'])
+        url = reverse('routing:visit_queue')
+        while True:
+            await session.get('vo:office_queue', url)
+            if await self.pause(self.scenario['vo_queue_poll_seconds']):
+                return
+
+    async def vo_exports(self, office):
+        session = self.session(office['vo_cookies'])
+        exports = self.scenario['vo_exports_per_day']
+        if not exports:
+            return
+        interval = day_seconds(self.scenario) / exports
+        # Evenly spread, the first half an interval after opening
+        if await self.pause(interval / 2):
+            return
+        while True:
+            for report in self.scenario['vo_reports']:
+                await session.get(f'vo:export:{report}', f"{reverse(f'mis:{report}')}?export=1")
+            if await self.pause(interval):
+                return
+
+
+class Command(BaseCommand):
+    help = (
+        "Load simulation of an office day: kiosk/QR/mobile/quick registrations arriving "
+        "by an hourly profile, staff calling, transferring and completing tokens, display "
+        "screens polling and the VO running MIS exports, against gunicorn on a scratch "
+        "SQLite database. Reports throughput and p50/p95/p99 per "
+        "endpoint. Run with the SQLite settings (PYTHONANYWHERE_DOMAIN set)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', default='office_day',
+                            help=f"Bundled scenario ({', '.join(bundled_scenarios())}) or path to a JSON file.")
+        parser.add_argument('--workers', type=int, default=2, help="Server worker processes.")
+        parser.add_argument('--time-scale', type=float, help="Override the scenario's time_scale.")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed (arrivals, purposes, service times).")
+        parser.add_argument('--json', dest='json_path', help="Also write the results to this file.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("The default database is not SQLite; run with PYTHONANYWHERE_DOMAIN set.")
+
+        scenario = load_scenario(options['scenario'])
+        if options['time_scale']:
+            scenario['time_scale'] = options['time_scale']
+        rng = random.Random(options['seed'])
+
+        workdir = tempfile.mkdtemp(prefix='vista-bench-')
+        db_path = os.path.join(workdir, 'bench.sqlite3')
+        connection.settings_dict['TEST']['NAME'] = db_path
+        connection.close()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            world = self.seed(scenario)
+            connections.close_all()
+
+            self.stdout.write(
+                f"Scenario {options['scenario']}: {scenario['description']}\n"
+                f"gunicorn x {options['workers']} workers, "
+                f"{day_seconds(scenario) / scenario['time_scale']:.0f}s at {scenario['time_scale']:g}x real time"
+            )
+            elapsed, arrivals, recorder = self.run_day(scenario, world, db_path, rng, options)
+            outcome = self.outcome()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        rows = recorder.summary(elapsed)
+        self.report(rows, elapsed, arrivals, outcome)
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    'scenario': options['scenario'],
+                    'workers': options['workers'],
+                    'time_scale': scenario['time_scale'],
+                    'seed': options['seed'],
+                    'elapsed': elapsed,
+                    'outcome': outcome,
+                    'endpoints': rows,
+                }, f, indent=2)
+
+    def run_day(self, scenario, world, db_path, rng, options):
+        port = free_port()
+        env = dict(os.environ, VISTA_SQLITE_PATH=db_path)
+        process = subprocess.Popen(
+            server_command(port, options['workers']),
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(port, process)
+            day = OfficeDay(scenario, world, port, bench_host(), rng)
+            elapsed, arrivals = asyncio.run(day.run())
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        return elapsed, arrivals, day.recorder
+
+    def report(self, rows, elapsed, arrivals, outcome):
+        self.stdout.write(
+            f"{arrivals} arrivals in {elapsed:.0f}s: {outcome['issued']} tokens issued, "
+            f"{outcome['completed']} completed, {outcome['open']} still open"
+        )
+        self.stdout.write(
+            f"{'endpoint':<26}{'ok':>7}{'err':>6}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['endpoint']:<26}{row['ok']:>7}{row['errors']:>6}{row['rps']:>8.1f}"
+                f"{row['p50']:>9.1f}{row['p95']:>9.1f}{row['p99']:>9.1f}{row['max']:>9.1f}"
+            )
+        total_ok = sum(row['ok'] for row in rows)
+        total_errors = sum(row['errors'] for row in rows)
+        self.stdout.write(f"{'total':<26}{total_ok:>7}{total_errors:>6}{total_ok / elapsed if elapsed else 0:>8.1f}")
+
+    def outcome(self):
+        from visit_regn.models import Visit
+        visits = Visit.objects.all()
+        return {
+            'issued': visits.count(),
+            'completed': visits.filter(status=Visit.Status.COMPLETED).count(),
+            'open': visits.exclude(status__in=[Visit.Status.COMPLETED, Visit.Status.CANCELLED]).count(),
+        }
+
+    def seed(self, scenario):
+        """Offices with desks, one clerk per desk and a VO, routing rules and logged-in sessions."""
+        from accounts.models import Office, Desk, User
+        from visit_regn.models import Purpose
+        from routing.models import RoutingRule
+
+        purposes = [Purpose.objects.create(name=f'Purpose {i}') for i in range(1, scenario['purposes'] + 1)]
+        Purpose.objects.create(name='General Enquiry')
+
+        def login(user):
+            client = Client()
+            client.force_login(user)
+            return {settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value}
+
+        offices = []
+        for n in range(1, scenario['offices'] + 1):
+            office = Office.objects.create(name=f'Sim Office {n}', code=f'SIM{n:02d}')
+            vo_desk = Desk.objects.create(name='Village Officer', office=office)
+            desks = [Desk.objects.create(name=f'Desk {i}', office=office)
+                     for i in range(1, scenario['desks_per_office'] + 1)]
+            for i, purpose in enumerate(purposes):
+                RoutingRule.objects.create(office=office, purpose=purpose, default_desk=desks[i % len(desks)])
+
+            staff = []
+            for i, desk in enumerate(desks, start=1):
+                user = User.objects.create_user(username=f'SIM{n:02d}C{i}', password='sim',
+                                                role='CLERK', office=office, desk=desk)
+                staff.append({'desk': desk.id, 'cookies': login(user)})
+            vo = User.objects.create_user(username=f'SIM{n:02d}VO', password='sim',
+                                          role='VO', office=office, desk=vo_desk)
+            offices.append({
+                'code': office.code,
+                'desks': [desk.id for desk in desks],
+                'staff': staff,
+                'vo_cookies': login(vo),
+            })
+
+        return {'offices': offices, 'purposes': [purpose.id for purpose in purposes]}
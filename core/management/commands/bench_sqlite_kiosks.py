@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+import core.db
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def kiosk_worker(kiosk_no, registrations, tuned, start_event, results):
+    """
+    One kiosk process: issues `registrations` tokens as fast as it can.
+    Each registration is the real write path (token counter, visit, logs, auto-routing).
+    """
+    from accounts.models import Office, User
+    from visit_regn.models import Visit, Purpose
+
+    core.db.TUNING_ENABLED = tuned
+    if not tuned:
+        connection.settings_dict['OPTIONS'] = {}
+
+    office = Office.objects.get(code='BENCH')
+    purpose = Purpose.objects.get(name='Bench Purpose')
+    visitor = User.objects.get(username='VISITOR')
+
+    latencies = []
+    lock_errors = 0
+    other_errors = 0
+
+    start_event.wait()
+    for i in range(registrations):
+        data = {'name': f'Kiosk {kiosk_no}', 'mobile': f'9{kiosk_no:04d}{i:05d}', 'purpose': purpose}
+        started = time.perf_counter()
+        try:
+            Visit.create_from_kiosk(data, office, user=visitor, mode='KIOSK')
+            latencies.append((time.perf_counter() - started) * 1000)
+        except OperationalError as e:
+            if core.db._is_lock_error(e):
+                lock_errors += 1
+            else:
+                other_errors += 1
+            # A failed statement can leave the connection mid-transaction
+            connection.close()
+
+    connections.close_all()
+    results.put({'latencies': latencies, 'lock_errors': lock_errors, 'other_errors': other_errors})
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark for the SQLite production profile: N kiosk processes "
+        "issue tokens at once against a scratch SQLite database, with and without "
+        "the WAL/busy_timeout pragmas and write serialization. Run with the SQLite "
+        "settings (PYTHONANYWHERE_DOMAIN set)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kiosks', type=int, default=8)
+        parser.add_argument('--registrations', type=int, default=50, help="Tokens issued per kiosk.")
+        parser.add_argument('--profile', choices=['plain', 'tuned', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("The default database is not SQLite; run with PYTHONANYWHERE_DOMAIN set.")
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError("This benchmark needs the 'fork' start method (Linux/macOS).")
+
+        profiles = ['plain', 'tuned'] if options['profile'] == 'both' else [options['profile']]
+        self.stdout.write(f"{options['kiosks']} kiosks x {options['registrations']} registrations each")
+
+        for profile in profiles:
+            stats = self.run_profile(profile == 'tuned', options['kiosks'], options['registrations'])
+            self.stdout.write(
+                f"{profile:>6}: {stats['ok']} issued, {stats['lock_errors']} lock errors, "
+                f"{stats['other_errors']} other errors, {stats['duplicates']} duplicate tokens | "
+                f"{stats['throughput']:.0f} tokens/s | "
+                f"p50 {stats['p50']:.1f} ms, p95 {stats['p95']:.1f} ms, p99 {stats['p99']:.1f} ms"
+            )
+
+    def run_profile(self, tuned, kiosks, registrations):
+        core.db.TUNING_ENABLED = tuned
+        workdir = tempfile.mkdtemp(prefix='vista-bench-')
+        saved_options = dict(connection.settings_dict.get('OPTIONS', {}))
+        if not tuned:
+            connection.settings_dict['OPTIONS'] = {}
+        connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+
+        connection.close()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.seed()
+            connections.close_all()
+
+            ctx = multiprocessing.get_context('fork')
+            start_event = ctx.Event()
+            results = ctx.Queue()
+            processes = [
+                ctx.Process(target=kiosk_worker, args=(n, registrations, tuned, start_event, results))
+                for n in range(kiosks)
+            ]
+            for process in processes:
+                process.start()
+
+            started = time.perf_counter()
+            start_event.set()
+            outcomes = [results.get() for _ in processes]
+            elapsed = time.perf_counter() - started
+            for process in processes:
+                process.join()
+
+            from visit_regn.models import Visit
+            tokens = list(Visit.objects.values_list('token', flat=True))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict['OPTIONS'] = saved_options
+            core.db.TUNING_ENABLED = True
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        latencies = [ms for outcome in outcomes for ms in outcome['latencies']]
+        return {
+            'ok': len(latencies),
+            'lock_errors': sum(o['lock_errors'] for o in outcomes),
+            'other_errors': sum(o['other_errors'] for o in outcomes),
+            'duplicates': len(tokens) - len(set(tokens)),
+            'throughput': len(latencies) / elapsed if elapsed else 0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+        }
+
+    def seed(self):
+        from accounts.models import Office, Desk, User
+        from visit_regn.models import Purpose
+        from routing.models import RoutingRule
+
+        office = Office.objects.create(name='Bench Office', code='BENCH')
+        desk = Desk.objects.create(name='Desk 1', office=office)
+        Desk.objects.create(name='Village Officer', office=office)
+        purpose = Purpose.objects.create(name='Bench Purpose')
+        RoutingRule.objects.create(office=office, purpose=purpose, default_desk=desk)
+        User.objects.create(username='VISITOR', role='VO')
@@ -0,0 +1,136 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.urls import reverse
+
+from .bench_office_day import bench_host
+from .bench_sqlite_kiosks import percentile
+
+# What visit_regn imported at module level before these were made lazy
+EAGER_IMPORTS = ('qrcode', 'PIL.Image', 'PIL.ImageDraw', 'PIL.ImageFont', 'openpyxl')
+HEAVY_MODULES = ('qrcode', 'PIL', 'openpyxl')
+
+# Runs in a fresh interpreter: load the WSGI application the way a worker does,
+# then serve the first requests. Prints one JSON line.
+WORKER = r"""
+import importlib, json, resource, sys, time
+
+def rss_mb():
+    # Current RSS; ru_maxrss is only a fallback (on Linux it keeps the parent's peak across exec)
+    try:
+        with open('/proc/self/status') as status:
+            return next(int(line.split()[1]) for line in status if line.startswith('VmRSS:')) / 1024
+    except OSError:
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+started = time.perf_counter()
+for name in json.loads(sys.argv[1]):
+    importlib.import_module(name)
+from vista_project.wsgi import application
+booted = time.perf_counter()
+heavy = [name for name in json.loads(sys.argv[2]) if name in sys.modules]
+boot_rss = rss_mb()
+
+from django.test import Client
+client = Client(HTTP_HOST=sys.argv[3])
+first = []
+for path in sys.argv[4:]:
+    t = time.perf_counter()
+    status = client.get(path).status_code
+    first.append(((time.perf_counter() - t) * 1000, status))
+print(json.dumps({
+    'boot_ms': (booted - started) * 1000,
+    'boot_rss_mb': boot_rss,
+    'first': first,
+    'rss_mb': rss_mb(),
+    'heavy': heavy,
+}))
+"""
+
+MODES = [
+    # (name, warm-up, imports done before the application loads)
+    ('eager imports', False, EAGER_IMPORTS),
+    ('lazy imports', False, ()),
+    ('lazy + warm-up', True, ()),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker startup cost: boot time, first-request latency and RSS of a fresh process "
+        "loading vista_project.wsgi, with the heavy imports eager (as before), lazy, and lazy with "
+        "warm-up (core/warmup.py). Runs against a scratch SQLite database; run with the SQLite "
+        "settings (PYTHONANYWHERE_DOMAIN set)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh processes per mode (medians reported).")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("The default database is not SQLite; run with PYTHONANYWHERE_DOMAIN set.")
+
+        workdir = tempfile.mkdtemp(prefix='vista-bench-')
+        db_path = os.path.join(workdir, 'bench.sqlite3')
+        connection.settings_dict['TEST']['NAME'] = db_path
+        connection.close()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            paths = self.seed()
+            connections.close_all()
+
+            self.stdout.write(f"{options['runs']} fresh processes per mode; first requests: {', '.join(paths)}")
+            for name, warm, imports in MODES:
+                runs = [self.run_worker(db_path, warm, imports, paths) for _ in range(options['runs'])]
+                first = [
+                    f"{percentile([run['first'][i][0] for run in runs], 50):.0f}"
+                    for i in range(len(paths))
+                ]
+                self.stdout.write(
+                    f"{name:>15}: boot {percentile([run['boot_ms'] for run in runs], 50):.0f} ms | "
+                    f"first requests {' / '.join(first)} ms | "
+                    f"RSS {percentile([run['boot_rss_mb'] for run in runs], 50):.1f} MB at boot, "
+                    f"{percentile([run['rss_mb'] for run in runs], 50):.1f} MB after | "
+                    f"loaded at boot: {', '.join(runs[0]['heavy']) or '-'}"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run_worker(self, db_path, warm, imports, paths):
+        env = dict(os.environ, VISTA_SQLITE_PATH=db_path, VISTA_WARM_UP='1' if warm else '0')
+        result = subprocess.run(
+            [sys.executable, '-c', WORKER, json.dumps(imports), json.dumps(HEAVY_MODULES), bench_host(), *paths],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Worker failed:\n{result.stderr}")
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        failed = [(path, status) for path, (_, status) in zip(paths, run['first']) if status != 200]
+        if failed:
+            raise CommandError(f"Requests failed: {failed}")
+        return run
+
+    def seed(self):
+        from accounts.models import Office, Desk
+        from routing.models import RoutingRule
+        from visit_regn.models import Purpose
+
+        office = Office.objects.create(name='Bench Office', code='BENCH')
+        desk = Desk.objects.create(name='Desk 1', office=office)
+        Desk.objects.create(name='Village Officer', office=office)
+        purpose = Purpose.objects.create(name='Bench Purpose')
+        RoutingRule.objects.create(office=office, purpose=purpose, default_desk=desk)
+        return [
+            reverse('visit_regn:manual_register') + '?office=BENCH',
+            reverse('track_status'),
+            reverse('visit_regn:kiosk_home') + '?office=BENCH',
+        ]
@@ -0,0 +1,63 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates districts, taluks, offices, desks and staff, then years of visits with "
+        "their logs, desk queue rows, transactions, office files and login sessions, for "
+        "scale testing. Deterministic for a given --seed and arguments. Writes to the "
+        "configured database: never run it against production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--districts', type=int, default=1)
+        parser.add_argument('--taluks', type=int, default=2, help="Taluks per district.")
+        parser.add_argument('--offices', type=int, default=3, help="Offices per taluk.")
+        parser.add_argument('--desks', type=int, default=4, help="Desks per office (plus the VO desk).")
+        parser.add_argument('--days', type=int, default=365, help="Calendar days of history.")
+        parser.add_argument('--end-date', type=datetime.date.fromisoformat,
+                            help="Last generated day (YYYY-MM-DD); default yesterday.")
+        parser.add_argument('--visits-per-day', type=int, default=60,
+                            help="Mean visits per office per working day before weekday/month/office factors.")
+        parser.add_argument('--code-prefix', default='S', help="Prefix of generated district/taluk/office codes.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per bulk_create transaction.")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Processes generating offices in parallel (same rows for any count).")
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        generator = SyntheticDataGenerator(
+            seed=options['seed'],
+            districts=options['districts'],
+            taluks_per_district=options['taluks'],
+            offices_per_taluk=options['offices'],
+            desks_per_office=options['desks'],
+            days=options['days'],
+            end_date=options['end_date'],
+            visits_per_day=options['visits_per_day'],
+            code_prefix=options['code_prefix'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            using=options['database'],
+            progress=self.stdout.write if options['verbosity'] >= 1 else None,
+        )
+        started = time.perf_counter()
+        try:
+            counts = generator.run()
+        except (ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        total = sum(counts.values())
+        for label, count in sorted(counts.items()):
+            self.stdout.write(f"{label:<28}{count:>12,}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{total:,} rows in {elapsed:.0f}s ({total / elapsed if elapsed else 0:,.0f} rows/s), "
+            f"{generator.start_date} to {generator.end_date}"
+        ))
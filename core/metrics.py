@@ -0,0 +1,178 @@
+"""
+/metrics in the Prometheus text format, for a local scraper or curl.
+
+Request metrics (core.middleware.MetricsMiddleware):
+- vista_http_request_duration_seconds{view}: latency histogram per URL name
+- vista_db_queries_total{view}: SQL statements run by those requests
+
+Each worker counts in memory and publishes its totals every
+METRICS_FLUSH_SECONDS (core.cache.WorkerShards); a scrape adds up all workers.
+Totals start from zero when a worker restarts, which Prometheus reads as a
+counter reset.
+
+Business gauges are read from running totals, not counted at scrape time:
+tokens issued today from DailyTokenCounter, the queue from routing.gauges
+and open/overdue files from filing.gauges.
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import WorkerShards
+
+# Upper bounds in seconds (Prometheus client defaults)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_series = {}
+_last_publish = 0.0
+
+
+class QueryCounter:
+    """execute_wrapper that only counts statements."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def observe(view, seconds, queries=0):
+    """Adds one request to this worker's totals."""
+    with _lock:
+        series = _series.get(view)
+        if series is None:
+            series = _series[view] = {'buckets': [0] * (len(BUCKETS) + 1), 'count': 0, 'sum': 0.0, 'queries': 0}
+        series['buckets'][bisect.bisect_left(BUCKETS, seconds)] += 1
+        series['count'] += 1
+        series['sum'] += seconds
+        series['queries'] += queries
+    maybe_publish()
+
+
+def _shards():
+    return WorkerShards('metrics', timeout=getattr(settings, 'METRICS_RETENTION_SECONDS', 60 * 60))
+
+
+def maybe_publish(force=False):
+    global _last_publish
+    now = time.monotonic()
+    if not force and now - _last_publish < getattr(settings, 'METRICS_FLUSH_SECONDS', 10):
+        return
+    _last_publish = now
+    with _lock:
+        snapshot = {view: dict(series, buckets=list(series['buckets'])) for view, series in _series.items()}
+    _shards().publish(snapshot)
+
+
+def request_totals():
+    """{view: {'buckets', 'count', 'sum', 'queries'}} over all workers."""
+    maybe_publish(force=True)
+    merged = {}
+    for worker in _shards().collect():
+        for view, series in worker.items():
+            total = merged.get(view)
+            if total is None:
+                merged[view] = dict(series, buckets=list(series['buckets']))
+                continue
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], series['buckets'])]
+            for field in ('count', 'sum', 'queries'):
+                total[field] += series[field]
+    return merged
+
+
+def business_gauges():
+    """[(metric name, help, [(labels, value)])] for today's queue and the open files."""
+    from filing.gauges import open_and_overdue
+    from routing.gauges import oldest_waiting, today_gauges
+    from visit_regn.models import DailyTokenCounter
+    from .refdata import get_snapshot
+
+    snapshot = get_snapshot()
+
+    def office_code(office_id):
+        office = snapshot.office(office_id)
+        return office.code if office else str(office_id)
+
+    def desk_name(desk_id):
+        desk = snapshot.desk(desk_id)
+        return desk.name if desk else str(desk_id)
+
+    issued = [
+        ({'office': office_code(office_id)}, last_seq)
+        for office_id, last_seq in DailyTokenCounter.objects.filter(date=timezone.localdate())
+        .values_list('office_id', 'last_seq').order_by('office_id')
+    ]
+
+    gauges = today_gauges()
+    now = timezone.now()
+    oldest = oldest_waiting({g.office_id for g in gauges if g.waiting > 0})
+    waiting, oldest_age, attended = [], [], {}
+    for gauge in sorted(gauges, key=lambda g: (g.office_id, g.desk_id)):
+        labels = {'office': office_code(gauge.office_id), 'desk': desk_name(gauge.desk_id)}
+        waiting.append((labels, max(gauge.waiting, 0)))
+        if gauge.desk_id in oldest:
+            oldest_age.append((labels, max(0, int((now - oldest[gauge.desk_id]).total_seconds()))))
+        count, seconds = attended.get(gauge.office_id, (0, 0))
+        attended[gauge.office_id] = (count + gauge.attended, seconds + gauge.wait_seconds)
+    average_wait = [
+        ({'office': office_code(office_id)}, round(seconds / count, 1))
+        for office_id, (count, seconds) in attended.items() if count > 0
+    ]
+
+    files = sorted(open_and_overdue().items())
+    return [
+        ('vista_tokens_issued_today', "Tokens issued today.", issued),
+        ('vista_queue_waiting', "Tokens routed to a desk and not attended yet (today's tokens).", waiting),
+        ('vista_queue_oldest_waiting_seconds', "Age of the oldest waiting token at the desk.", oldest_age),
+        ('vista_queue_average_wait_seconds', "Average issue-to-attend wait of today's attends.", average_wait),
+        ('vista_office_files_open', "Office files not closed.", [
+            ({'office': office_code(office_id)}, max(open_files, 0)) for office_id, (open_files, _) in files
+        ]),
+        ('vista_office_files_overdue', "Office files past their due date (filing.sla).", [
+            ({'office': office_code(office_id)}, max(overdue, 0)) for office_id, (_, overdue) in files
+        ]),
+    ]
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """The full exposition text."""
+    lines = [
+        '# HELP vista_http_request_duration_seconds Request latency by URL name.',
+        '# TYPE vista_http_request_duration_seconds histogram',
+    ]
+    totals = sorted(request_totals().items())
+    for view, series in totals:
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), series['buckets']):
+            cumulative += count
+            le = bound if bound == '+Inf' else repr(bound)
+            lines.append(f"vista_http_request_duration_seconds_bucket{_labels({'view': view, 'le': le})} {cumulative}")
+        lines.append(f"vista_http_request_duration_seconds_sum{_labels({'view': view})} {_number(series['sum'])}")
+        lines.append(f"vista_http_request_duration_seconds_count{_labels({'view': view})} {series['count']}")
+
+    lines += [
+        '# HELP vista_db_queries_total SQL statements run by requests, by URL name.',
+        '# TYPE vista_db_queries_total counter',
+    ]
+    lines += [f"vista_db_queries_total{_labels({'view': view})} {series['queries']}" for view, series in totals]
+
+    for name, help_text, samples in business_gauges():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+        lines += [f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,115 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, profiling
+from .routers import get_replica_alias, route_reads_to_replica, reset_read_routing
+
+# Set after a user's own write; while present their reads stay on the primary
+RECENT_WRITE_COOKIE = 'vista_recent_write'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def is_reporting_view(resolver_match):
+    if resolver_match is None:
+        return False
+    if resolver_match.namespace in getattr(settings, 'REPLICA_READ_NAMESPACES', ()):
+        return True
+    if resolver_match.url_name in getattr(settings, 'REPLICA_READ_URL_NAMES', ()):
+        return True
+    # Admin changelists (search/filter over large tables)
+    return resolver_match.namespace == 'admin' and (resolver_match.url_name or '').endswith('_changelist')
+
+
+class ReplicaMiddleware:
+    """
+    Routes read-only reporting views to the replica, with a read-your-writes guard:
+    for REPLICA_READ_YOUR_WRITES_SECONDS after a user's own write (any unsafe request)
+    their reports are served from the primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request._replica_token is not None:
+                reset_read_routing(request._replica_token)
+
+        if request.method not in SAFE_METHODS and get_replica_alias():
+            response.set_cookie(
+                RECENT_WRITE_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_READ_YOUR_WRITES_SECONDS', 5),
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not get_replica_alias() or request.method not in SAFE_METHODS:
+            return None
+        if RECENT_WRITE_COOKIE in request.COOKIES:
+            return None
+        if is_reporting_view(request.resolver_match):
+            request._replica_token = route_reads_to_replica()
+        return None
+
+
+class RequestProfilerMiddleware:
+    """
+    Profiles a random PROFILER_SAMPLE_RATE share of requests: wall time, SQL count,
+    SQL time and repeated statements (see core/profiling.py). With a rate of 0 the
+    middleware removes itself at startup, so it can stay in MIDDLEWARE in production.
+    """
+
+    def __init__(self, get_response):
+        self.rate = getattr(settings, 'PROFILER_SAMPLE_RATE', 0)
+        if self.rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.rate:
+            return self.get_response(request)
+        profile = profiling.QueryProfile()
+        started = time.perf_counter()
+        with profile.wrap_connections():
+            response = self.get_response(request)
+        profiling.record(request, response, time.perf_counter() - started, profile)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Times every request into the per-URL-name latency histograms of /metrics and
+    counts its SQL (core/metrics.py). METRICS_ENABLED = False
+    removes it at startup.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = metrics.QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = self.get_response(request)
+        metrics.observe(self.view_label(request), time.perf_counter() - started, counter.count)
+        return response
+
+    @staticmethod
+    def view_label(request):
+        match = request.resolver_match
+        # Unmatched paths share one label, so 404 probes cannot add series
+        return (match.view_name if match else None) or '(unresolved)'
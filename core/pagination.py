@@ -0,0 +1,168 @@
+"""
+Keyset (seek) pagination for the staff list views.
+
+Django's Paginator pages with OFFSET and counts the whole result for "Page x
+of y"; both get slower as the tables grow. KeysetPaginationMixin orders the
+list by keyset_ordering (the primary key is appended as a tie-breaker, so the
+order is total) and reads the paginate_by + 1 rows after, or before, the edge
+of the page on screen: the same index range read on the first page and on the
+thousandth, and no COUNT.
+
+Pages are addressed by opaque cursors (?cursor=...) instead of numbers.
+page_obj.next_query / previous_query are ready-made query strings that keep
+the view's other GET parameters. With keyset_approximate_total the page also
+carries an "about N" total (core.changelist.estimated_count).
+
+Ordering fields must be concrete, non-null fields of the model itself.
+"""
+import base64
+import json
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+from .changelist import COUNT_CAP, estimated_count
+
+CURSOR_PARAM = 'cursor'
+NEXT, PREVIOUS = 'n', 'p'
+
+
+def keyset_keys(model, ordering):
+    """[(field name, descending)] for an ordering, ending with the primary key."""
+    pk = model._meta.pk.name
+    keys = []
+    for name in ordering:
+        field = name.lstrip('-')
+        keys.append((pk if field == 'pk' else field, name.startswith('-')))
+    if pk not in (name for name, _ in keys):
+        keys.append((pk, keys[-1][1] if keys else False))
+    return keys
+
+
+def encode_cursor(obj, keys, direction):
+    values = [getattr(obj, name) for name, _ in keys]
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    raw = json.dumps([direction, values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, keys):
+    """(direction, key values), or None for no cursor or one that does not fit these keys."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(raw)
+        if direction not in (NEXT, PREVIOUS) or len(values) != len(keys):
+            return None
+        values = [model._meta.get_field(name).to_python(value) for (name, _), value in zip(keys, values)]
+    except (ValueError, TypeError, ValidationError, FieldDoesNotExist):
+        return None
+    return direction, values
+
+
+def seek_filter(keys, values, forward):
+    """Q for the rows after (forward) or before the given key values, in key order."""
+    query = Q()
+    for i, (name, descending) in enumerate(keys):
+        lookup = 'lt' if descending == forward else 'gt'
+        equal = {prefix: value for (prefix, _), value in zip(keys[:i], values[:i])}
+        query |= Q(**equal, **{f'{name}__{lookup}': values[i]})
+    return query
+
+
+class KeysetPage:
+    """Stands in for django.core.paginator.Page in the list templates."""
+
+    def __init__(self, object_list, keys, has_next, has_previous, request):
+        self.object_list = object_list
+        self.has_next_page = has_next and bool(object_list)
+        self.has_previous_page = has_previous and bool(object_list)
+        self.keys = keys
+        self.request = request
+        self.approximate_total = None
+        self.total_capped = False
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def _query(self, obj, direction):
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        params[CURSOR_PARAM] = encode_cursor(obj, self.keys, direction)
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query(self.object_list[-1], NEXT) if self.has_next_page else ''
+
+    @property
+    def previous_query(self):
+        return self._query(self.object_list[0], PREVIOUS) if self.has_previous_page else ''
+
+
+def keyset_page(querysets, keys, cursor, size, request):
+    """
+    One page of `size` rows. Several querysets with the same key fields (hot
+    and archived visits) are read side by side and merged.
+    """
+    forward = cursor is None or cursor[0] == NEXT
+    # Read backwards from the cursor for the previous page, then flip the rows
+    reverse = [descending == forward for _, descending in keys]
+    order = [f"-{name}" if desc else name for (name, _), desc in zip(keys, reverse)]
+
+    rows = []
+    for queryset in querysets:
+        if cursor is not None:
+            queryset = queryset.filter(seek_filter(keys, cursor[1], forward))
+        rows.extend(queryset.order_by(*order)[:size + 1])
+    if len(querysets) > 1:
+        # Stable sorts, least significant key first
+        for (name, _), desc in reversed(list(zip(keys, reverse))):
+            rows.sort(key=attrgetter(name), reverse=desc)
+
+    more = len(rows) > size
+    rows = rows[:size]
+    if not forward:
+        rows.reverse()
+    # Paging backwards came from a later page, paging forwards (with a cursor) from an earlier one
+    has_next = more if forward else True
+    has_previous = cursor is not None if forward else more
+    return KeysetPage(rows, keys, has_next, has_previous, request)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin: keyset pagination by keyset_ordering, paginate_by rows a page.
+    Replaces the view's own ordering.
+    """
+    keyset_ordering = ('-pk',)
+    keyset_approximate_total = False
+
+    def get_keyset_querysets(self, queryset):
+        """The querysets to page through (merged when there are several)."""
+        return [queryset]
+
+    def paginate_queryset(self, queryset, page_size):
+        querysets = self.get_keyset_querysets(queryset)
+        model = querysets[0].model
+        keys = keyset_keys(model, self.keyset_ordering)
+        cursor = decode_cursor(self.request.GET.get(CURSOR_PARAM), model, keys)
+        page = keyset_page(querysets, keys, cursor, page_size, self.request)
+        if self.keyset_approximate_total:
+            page.approximate_total = sum(estimated_count(qs) for qs in querysets)
+            page.total_capped = page.approximate_total >= COUNT_CAP
+        return None, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,228 @@
+"""
+Sampling request profiler (core.middleware.RequestProfilerMiddleware).
+
+For a sampled request, every SQL statement on every database alias goes through
+QueryProfile (connection.execute_wrapper), which counts and times it and
+groups identical statements (same SQL, parameters aside) to find repeats.
+
+Each worker keeps its totals per URL name in memory and publishes them to the
+shared cache every PROFILER_FLUSH_SECONDS (core.cache.WorkerShards); the
+profile page merges all workers. Resetting bumps an epoch stamp: every worker
+drops its totals on its next flush and older totals are ignored.
+
+Sampled requests slower than PROFILER_SLOW_MS are appended (one JSON line each)
+to the 'vista.slow_requests' logger. Unless LOGGING configures that logger, it
+writes to a size-rotated PROFILER_SLOW_LOG.
+"""
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .cache import WorkerShards, get_cache
+
+SLOW_LOGGER = 'vista.slow_requests'
+
+# Repeated statements kept per request and per URL name
+TOP_DUPLICATES = 5
+
+_EPOCH_KEY = 'vista:profiler:epoch'
+
+_lock = threading.Lock()
+_stats = {}
+_epoch = None
+_last_flush = 0.0
+_slow_logger = None
+
+
+class QueryProfile:
+    """execute_wrapper that counts, times and groups the statements it sees."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        """[(sql, times)] for statements run more than once, most repeated first."""
+        return [(sql, n) for sql, n in self.statements.most_common(TOP_DUPLICATES) if n > 1]
+
+    def wrap_connections(self):
+        """Context manager installing this wrapper on every configured database alias."""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+
+def _empty_totals():
+    return {
+        'requests': 0, 'wall_ms': 0.0, 'max_ms': 0.0, 'queries': 0, 'max_queries': 0,
+        'sql_ms': 0.0, 'slow': 0, 'duplicates': Counter(),
+    }
+
+
+def record(request, response, seconds, profile):
+    """Adds one sampled request to this worker's totals and the slow log."""
+    match = request.resolver_match
+    url_name = (match.view_name if match else None) or '(unresolved)'
+    wall_ms = seconds * 1000
+    sql_ms = profile.seconds * 1000
+    duplicates = profile.duplicates()
+
+    with _lock:
+        entry = _stats.get(url_name)
+        if entry is None:
+            entry = _stats[url_name] = _empty_totals()
+        entry['requests'] += 1
+        entry['wall_ms'] += wall_ms
+        entry['max_ms'] = max(entry['max_ms'], wall_ms)
+        entry['queries'] += profile.count
+        entry['max_queries'] = max(entry['max_queries'], profile.count)
+        entry['sql_ms'] += sql_ms
+        for sql, n in duplicates:
+            entry['duplicates'][sql] += n - 1
+        if len(entry['duplicates']) > TOP_DUPLICATES * 4:
+            entry['duplicates'] = Counter(dict(entry['duplicates'].most_common(TOP_DUPLICATES)))
+
+        slow = wall_ms >= getattr(settings, 'PROFILER_SLOW_MS', 1000)
+        if slow:
+            entry['slow'] += 1
+
+    if slow:
+        slow_logger().warning(json.dumps({
+            'time': timezone.now().isoformat(timespec='seconds'),
+            'method': request.method,
+            'path': request.path,
+            'url_name': url_name,
+            'status': response.status_code,
+            'wall_ms': round(wall_ms, 1),
+            'queries': profile.count,
+            'sql_ms': round(sql_ms, 1),
+            'duplicates': [{'sql': sql, 'times': n} for sql, n in duplicates],
+        }))
+
+    maybe_flush()
+
+
+def _shards():
+    return WorkerShards('profiler', timeout=getattr(settings, 'PROFILER_RETENTION_SECONDS', 24 * 60 * 60))
+
+
+def current_epoch(cache):
+    epoch = cache.get(_EPOCH_KEY)
+    if epoch is None:
+        cache.add(_EPOCH_KEY, int(time.time()), timeout=None)
+        epoch = cache.get(_EPOCH_KEY)
+    return epoch
+
+
+def maybe_flush(force=False):
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < getattr(settings, 'PROFILER_FLUSH_SECONDS', 30):
+        return
+    _last_flush = now
+    flush()
+
+
+def flush():
+    """Publishes this worker's totals (dropping them first after a reset)."""
+    global _epoch
+    epoch = current_epoch(get_cache())
+    with _lock:
+        if _epoch is not None and epoch != _epoch:
+            _stats.clear()
+        _epoch = epoch
+        snapshot = {
+            name: dict(entry, duplicates=dict(entry['duplicates'])) for name, entry in _stats.items()
+        }
+    _shards().publish({'since': epoch, 'stats': snapshot})
+
+
+def reset():
+    """Starts a new profiling window on every worker."""
+    cache = get_cache()
+    cache.set(_EPOCH_KEY, max(int(time.time()), (cache.get(_EPOCH_KEY) or 0) + 1), timeout=None)
+    maybe_flush(force=True)
+
+
+def summary():
+    """
+    Totals per URL name over all workers, slowest total time first:
+    [{'url_name', 'requests', 'avg_ms', 'max_ms', 'avg_queries', 'max_queries',
+      'avg_sql_ms', 'slow', 'duplicates': [(sql, extra executions)]}], plus the window start.
+    """
+    maybe_flush(force=True)
+    epoch = current_epoch(get_cache())
+    merged = {}
+    for worker in _shards().collect():
+        if worker['since'] != epoch:
+            continue
+        for name, entry in worker['stats'].items():
+            total = merged.get(name)
+            if total is None:
+                total = merged[name] = _empty_totals()
+            for field in ('requests', 'wall_ms', 'queries', 'sql_ms', 'slow'):
+                total[field] += entry[field]
+            total['max_ms'] = max(total['max_ms'], entry['max_ms'])
+            total['max_queries'] = max(total['max_queries'], entry['max_queries'])
+            total['duplicates'].update(entry['duplicates'])
+
+    rows = []
+    for name, total in sorted(merged.items(), key=lambda item: -item[1]['wall_ms']):
+        n = total['requests']
+        rows.append({
+            'url_name': name,
+            'requests': n,
+            'avg_ms': total['wall_ms'] / n,
+            'max_ms': total['max_ms'],
+            'avg_queries': total['queries'] / n,
+            'max_queries': total['max_queries'],
+            'avg_sql_ms': total['sql_ms'] / n,
+            'slow': total['slow'],
+            'duplicates': total['duplicates'].most_common(TOP_DUPLICATES),
+        })
+    since = datetime.datetime.fromtimestamp(epoch, tz=timezone.get_current_timezone()) if epoch else None
+    return rows, since
+
+
+def slow_logger():
+    """The slow-request logger, given a rotating file handler unless LOGGING set one up."""
+    global _slow_logger
+    if _slow_logger is None:
+        logger = logging.getLogger(SLOW_LOGGER)
+        with _lock:
+            if not logger.handlers:
+                path = getattr(settings, 'PROFILER_SLOW_LOG', os.path.join(settings.BASE_DIR, 'logs', 'slow_requests.log'))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    path,
+                    maxBytes=getattr(settings, 'PROFILER_SLOW_LOG_BYTES', 5 * 1024 * 1024),
+                    backupCount=getattr(settings, 'PROFILER_SLOW_LOG_BACKUPS', 5),
+                    encoding='utf-8', delay=True,
+                )
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+        _slow_logger = logger
+    return _slow_logger
@@ -0,0 +1,179 @@
+"""
+Reference data snapshot (Purpose, Desk, Office).
+
+These tables change a few times a year but are read on nearly every kiosk and
+queue request. Each worker keeps one immutable snapshot in memory: read-only
+mappings of model instances with O(1) lookups by id (and office code).
+
+The snapshot is rebuilt (3 queries) on the next get_snapshot() after:
+- a Purpose/Desk/Office save or delete in this worker (signals below), or
+- a change in another worker, seen through the shared 'refdata' version stamp
+  (core.cache.INVALIDATION_RULES).
+
+Instances in the snapshot are shared by every request in the worker: use them for
+display, form choices and FK assignment, but never modify or save them.
+"""
+import threading
+from types import MappingProxyType
+
+from django import forms
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.forms.models import ModelChoiceIterator
+
+from core.cache import get_version
+
+NAMESPACE = 'refdata'
+MODELS = ('visit_regn.Purpose', 'accounts.Desk', 'accounts.Office')
+
+_EMPTY = MappingProxyType({})
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def _to_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ReferenceSnapshot:
+    """One immutable version of the reference tables. Mappings keep id order."""
+
+    def __init__(self, version, purposes, offices, desks):
+        self.version = version
+        self.purposes_by_id = MappingProxyType({p.pk: p for p in purposes})
+        self.purposes_by_name = tuple(sorted(purposes, key=lambda p: p.name.lower()))
+        self.offices_by_id = MappingProxyType({o.pk: o for o in offices})
+        self.offices_by_code = MappingProxyType({o.code: o for o in offices})
+        self.desks_by_id = MappingProxyType({d.pk: d for d in desks})
+        by_office = {}
+        for desk in desks:
+            by_office.setdefault(desk.office_id, {})[desk.pk] = desk
+        self.desks_by_office = MappingProxyType({k: MappingProxyType(v) for k, v in by_office.items()})
+
+    @classmethod
+    def load(cls, version):
+        Purpose = apps.get_model('visit_regn', 'Purpose')
+        Office = apps.get_model('accounts', 'Office')
+        Desk = apps.get_model('accounts', 'Desk')
+        return cls(
+            version,
+            purposes=list(Purpose.objects.order_by('id')),
+            offices=list(Office.objects.order_by('id')),
+            desks=list(Desk.objects.order_by('id')),
+        )
+
+    def __setattr__(self, name, value):
+        if name in self.__dict__:
+            raise AttributeError("ReferenceSnapshot is immutable")
+        super().__setattr__(name, value)
+
+    def purpose(self, pk):
+        return self.purposes_by_id.get(_to_pk(pk))
+
+    def find_purpose(self, text):
+        """First purpose (by id) whose name contains text, case-insensitive."""
+        text = text.lower()
+        return next((p for p in self.purposes_by_id.values() if text in p.name.lower()), None)
+
+    def office(self, pk):
+        return self.offices_by_id.get(_to_pk(pk))
+
+    def office_by_code(self, code):
+        return self.offices_by_code.get(code)
+
+    def first_office(self):
+        return next(iter(self.offices_by_id.values()), None)
+
+    def desk(self, pk):
+        return self.desks_by_id.get(_to_pk(pk))
+
+    def desks_for(self, office):
+        """{desk_id: Desk} for an Office or office id."""
+        if office is None:
+            return _EMPTY
+        return self.desks_by_office.get(getattr(office, 'pk', office), _EMPTY)
+
+
+def get_snapshot():
+    global _snapshot
+    version = get_version(NAMESPACE)
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = ReferenceSnapshot.load(version)
+                _snapshot = snapshot
+    return snapshot
+
+
+def clear_snapshot(**kwargs):
+    global _snapshot
+    _snapshot = None
+
+
+def _on_change(sender, **kwargs):
+    clear_snapshot()
+    # A request may rebuild from the old rows before the change commits
+    transaction.on_commit(clear_snapshot)
+
+
+def connect_snapshot_signals():
+    """Called from CoreConfig.ready()."""
+    for label in MODELS:
+        model = apps.get_model(label)
+        post_save.connect(_on_change, sender=model, dispatch_uid=f"vista-refdata:{label}")
+        post_delete.connect(_on_change, sender=model, dispatch_uid=f"vista-refdata:{label}")
+
+
+class SnapshotChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.get_objects().values():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.get_objects()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.get_objects())
+
+
+class SnapshotChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField whose choices come from the reference snapshot instead of a
+    queryset: no query to render the options or to clean the submitted id.
+
+    `source` is a callable returning {pk: instance} in display order; it is called
+    on every render/clean so the field always sees the current snapshot.
+    """
+    iterator = SnapshotChoiceIterator
+
+    def __init__(self, queryset, *, source=None, **kwargs):
+        super().__init__(queryset, **kwargs)
+        if source is not None:
+            self.source = source
+
+    def source(self):
+        return _EMPTY
+
+    def get_objects(self):
+        return self.source()
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        obj = self.get_objects().get(_to_pk(getattr(value, 'pk', value)))
+        if obj is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return obj
@@ -0,0 +1,59 @@
+"""
+Read-replica routing for reporting traffic.
+
+ReplicaMiddleware marks reporting requests (MIS, track_status, admin changelists);
+while a request is marked, ReplicaRouter sends its reads to settings.REPLICA_DATABASE.
+Token issue and routing never run on marked requests, and any write inside a
+marked request switches the rest of it back to the primary.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Alias reads should go to for the current request (None = primary)
+_read_alias = ContextVar('vista_read_alias', default=None)
+
+# Always read from the primary: a lagging replica would log people out
+PRIMARY_ONLY_APPS = {'sessions'}
+
+
+def get_replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    if alias and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+def route_reads_to_replica():
+    """Marks the current context; returns a token for reset_read_routing()."""
+    return _read_alias.set(get_replica_alias())
+
+
+def reset_read_routing(token):
+    _read_alias.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Read-your-writes within the request: after a write, stay on the primary
+        if _read_alias.get() is not None:
+            _read_alias.set(None)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        replica = get_replica_alias()
+        if replica and {obj1._state.db, obj2._state.db} <= {'default', replica}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is fed by replication (or a file copy), never migrated directly
+        if db == get_replica_alias():
+            return False
+        return None
@@ -0,0 +1,503 @@
+"""
+Synthetic data for scale testing (manage.py generate_synthetic_data).
+
+Builds districts > taluks > offices with desks, staff users and routing rules, then
+replays working days for each office: visits arriving by the hourly profile, routed
+to the purpose's desk, attended, sometimes transferred, completed or cancelled at
+close-out, with their logs, desk queue rows, transactions, office files and the
+staff's login sessions. Files get their due dates and overdue flags (filing.sla)
+as they are built, and the open file / queue gauges are recounted at the end, as
+bulk_create bypasses the save() paths that keep them.
+
+Everything is drawn from random.Random(seed) (one stream per office), so the
+same arguments always produce the same rows. Rows are written with chunked
+bulk_create and explicit primary keys (MySQL does not return ids from bulk
+inserts), one transaction per chunk, so memory stays flat however many years are
+generated. Office k of N takes ids base + k, base + k + N, ...: offices can be
+generated by parallel worker processes and still get the same ids. Rows are built
+with raw *_id values: assigning instances to foreign keys costs a descriptor and
+router call per field, which dominates at tens of millions of rows.
+"""
+import datetime
+import multiprocessing
+import random
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import District, Taluk, Office, Desk, User, StaffMember, UserAssignment, LoginSession
+from filing import gauges as file_gauges, sla
+from filing.models import OfficeFile
+from routing import gauges as queue_gauges
+from routing.models import RoutingRule, DeskQueue
+from transactions.models import Transaction
+from visit_regn.models import Purpose, Visit, VisitLog, DailyTokenCounter
+
+# (name, relative frequency, share of visits that open an office file)
+PURPOSES = [
+    ('Income Certificate', 18, 0.05),
+    ('Land Tax Payment', 16, 0.0),
+    ('Possession Certificate', 9, 0.35),
+    ('Caste Certificate', 8, 0.05),
+    ('Residence Certificate', 7, 0.05),
+    ('General Enquiry', 7, 0.0),
+    ('Mutation (Pokkuvaravu)', 6, 0.9),
+    ('Location Certificate', 5, 0.3),
+    ('Relationship Certificate', 4, 0.2),
+    ('Nativity Certificate', 4, 0.05),
+    ('Thandaper Extract', 3, 0.0),
+    ('One and Same Certificate', 3, 0.2),
+    ('Family Membership Certificate', 3, 0.25),
+    ('Complaint / Grievance', 3, 0.6),
+    ('Building Tax Assessment', 2, 0.5),
+    ('Disaster Relief Application', 1, 0.8),
+]
+
+MODES = [(Visit.RegistrationMode.KIOSK, 45), (Visit.RegistrationMode.MOBILE, 30),
+         (Visit.RegistrationMode.QR, 15), (Visit.RegistrationMode.QUICK, 10)]
+
+# Share of the day's visitors arriving in each hour from 10:00
+HOURLY_PROFILE = [0.14, 0.22, 0.18, 0.06, 0.16, 0.14, 0.10]
+OPEN_HOUR = 10
+
+# Relative volume by weekday (Mon..Sat) and month (Jan..Dec: admissions in May-June,
+# financial year end in March)
+WEEKDAY_FACTOR = [1.3, 1.05, 1.0, 1.0, 0.95, 0.7]
+MONTH_FACTOR = [0.9, 1.0, 1.25, 0.95, 1.2, 1.35, 1.0, 0.9, 0.9, 0.95, 0.95, 0.85]
+
+FIRST_NAMES = ['Anil', 'Sunil', 'Biju', 'Shaji', 'Rajesh', 'Suresh', 'Manoj', 'Vinod', 'Pradeep', 'Joseph',
+               'Thomas', 'Abdul', 'Muhammed', 'Ashraf', 'Lekha', 'Sreeja', 'Bindu', 'Mini', 'Anitha', 'Lissy',
+               'Mary', 'Fathima', 'Sajitha', 'Deepa', 'Reshma', 'Arun', 'Akhil', 'Anjali', 'Gopika', 'Nithin']
+LAST_NAMES = ['Kumar', 'Nair', 'Pillai', 'Menon', 'Varghese', 'Mathew', 'Kurian', 'Thomas', 'K', 'P', 'M',
+              'Rahman', 'Haris', 'Das', 'Raj', 'Chandran', 'Babu', 'George', 'Jose', 'S']
+
+INTERIM_STATUSES = [('Processing', 40), ('Site Visit Required', 20), ('Addl Documents Awaited', 20),
+                    ('Payment Pending', 10), ('Sent for external verification report', 10)]
+
+REPEAT_VISITOR_RATE = 0.35      # visits by someone who came before
+TRANSFER_RATE = 0.15
+SECOND_TRANSFER_RATE = 0.2      # of transferred visits
+CANCEL_RATE = 0.05              # left before being called; cancelled at close-out
+MEAN_WAIT_MINUTES = 18
+MEAN_SERVICE_MINUTES = 7
+MEAN_FILE_DAYS = 30             # time an office file stays open
+
+# Insert order respects foreign keys (MySQL checks them per statement)
+MODELS = [Visit, DeskQueue, VisitLog, Transaction, OfficeFile, DailyTokenCounter, LoginSession]
+
+# Fields set to the historical time instead of "now" during generation
+AUTO_TIME_FIELDS = [
+    (Visit, 'token_issue_time'), (Visit, 'created_at'), (Visit, 'updated_at'),
+    (VisitLog, 'timestamp'), (DeskQueue, 'assigned_at'),
+    (Transaction, 'created_at'), (Transaction, 'updated_at'),
+    (OfficeFile, 'created_at'), (OfficeFile, 'updated_at'),
+    (LoginSession, 'login_time'),
+]
+
+
+@contextmanager
+def historical_timestamps():
+    """Turns off auto_now/auto_now_add so generated rows keep their own times."""
+    saved = []
+    for model, name in AUTO_TIME_FIELDS:
+        field = model._meta.get_field(name)
+        saved.append((field, field.auto_now, field.auto_now_add))
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def pk_of(obj):
+    return None if obj is None else obj.pk
+
+
+def working_days(start, end):
+    """Mon-Sat except second Saturdays, start..end inclusive."""
+    day = start
+    while day <= end:
+        if day.weekday() < 5 or (day.weekday() == 5 and not 8 <= day.day <= 14):
+            yield day
+        day += datetime.timedelta(days=1)
+
+
+class SyntheticDataGenerator:
+    def __init__(self, seed=1, districts=1, taluks_per_district=2, offices_per_taluk=3, desks_per_office=4,
+                 days=365, end_date=None, visits_per_day=60, code_prefix='S', chunk_size=5000,
+                 workers=1, using='default', progress=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.districts = districts
+        self.taluks_per_district = taluks_per_district
+        self.offices_per_taluk = offices_per_taluk
+        self.desks_per_office = desks_per_office
+        self.end_date = end_date or timezone.localdate() - datetime.timedelta(days=1)
+        self.start_date = self.end_date - datetime.timedelta(days=days - 1)
+        self.visits_per_day = visits_per_day
+        self.code_prefix = code_prefix
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.using = using
+        self.progress = progress or (lambda message: None)
+        self.tz = timezone.get_current_timezone()
+        # Files are overdue as of the run, whatever the generated days
+        self.now = timezone.now()
+
+        self.buffers = {model: [] for model in MODELS}
+        self.counts = {model: 0 for model in MODELS}
+        self.base_ids = {}
+        self.office_count = 0
+
+    # Output
+
+    def add(self, obj, info):
+        model = type(obj)
+        obj.pk = self.base_ids[model] + info['index'] + self.office_count * info['rows'][model]
+        info['rows'][model] += 1
+        buffer = self.buffers[model]
+        buffer.append(obj)
+        if len(buffer) >= self.chunk_size:
+            self.flush()
+        return obj
+
+    def flush(self):
+        with transaction.atomic(using=self.using):
+            for model in MODELS:
+                buffer = self.buffers[model]
+                if buffer:
+                    model.objects.using(self.using).bulk_create(buffer, batch_size=self.chunk_size)
+                    self.counts[model] += len(buffer)
+                    buffer.clear()
+
+    def reserve_ids(self):
+        for model in MODELS:
+            self.base_ids[model] = (model.objects.using(self.using).aggregate(m=Max('pk'))['m'] or 0) + 1
+
+    def reset_sequences(self):
+        """Explicit ids leave PostgreSQL/Oracle sequences behind; SQLite and MySQL need nothing."""
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(no_style(), MODELS)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    # Generation
+
+    def run(self):
+        """Generates everything; returns {model label: rows created}."""
+        with historical_timestamps():
+            purposes = self.create_purposes()
+            offices = self.create_offices(purposes)
+            self.office_count = len(offices)
+            self.reserve_ids()
+            visitor = User.objects.db_manager(self.using).get_or_create(
+                username='VISITOR', defaults={'role': 'VO', 'password': make_password(None)})[0]
+
+            workers = min(self.workers, len(offices))
+            if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+                counts = self.run_workers(workers, offices, purposes, visitor)
+            else:
+                counts = self.generate(offices, purposes, visitor)
+        self.reset_sequences()
+        self.rebuild_gauges(offices)
+
+        counts = {model._meta.label: count for model, count in counts.items()}
+        counts.update(self.setup_counts)
+        return counts
+
+    def generate(self, offices, purposes, visitor, label=''):
+        """Replays every working day for `offices`; returns {model: rows written}."""
+        days = list(working_days(self.start_date, self.end_date))
+        for n, day in enumerate(days, start=1):
+            for office in offices:
+                self.generate_day(office, day, purposes, visitor)
+            if n % 20 == 0 or n == len(days):
+                self.progress(f"{day}: {n}/{len(days)} days, {sum(self.counts.values()):,} rows written{label}")
+        self.flush()
+        return self.counts
+
+    def run_workers(self, workers, offices, purposes, visitor):
+        """Forks `workers` processes, each generating every workers-th office."""
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+
+        def work(n):
+            if n:
+                self.progress = lambda message: None
+            try:
+                counts = self.generate(offices[n::workers], purposes, visitor, label=f' (worker 1 of {workers})')
+                results.put((None, {model._meta.label: count for model, count in counts.items()}))
+            except Exception as e:
+                results.put((f'{type(e).__name__}: {e}', None))
+            finally:
+                connections.close_all()
+
+        processes = [context.Process(target=work, args=(n,)) for n in range(workers)]
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        errors = [error for error, _ in outcomes if error]
+        if errors:
+            raise RuntimeError(f"Generation failed: {errors[0]}")
+        totals = {model: 0 for model in MODELS}
+        for _, counts in outcomes:
+            for model in MODELS:
+                totals[model] += counts[model._meta.label]
+        return totals
+
+    def rebuild_gauges(self, offices):
+        """The gauge modules work on the default database only; recount others with rebuild_gauges."""
+        if self.using != DEFAULT_DB_ALIAS:
+            self.progress(f"Gauges not recounted on {self.using!r}: run rebuild_gauges against it.")
+            return
+        for info in offices:
+            file_gauges.rebuild(office=info['office'])
+        for day in working_days(self.start_date, self.end_date):
+            queue_gauges.rebuild(day)
+        self.progress("Open file, overdue file and queue gauges recounted")
+
+    def create_purposes(self):
+        """Existing purposes are reused by name."""
+        manager = Purpose.objects.db_manager(self.using)
+        purposes = []
+        for name, weight, file_share in PURPOSES:
+            purpose = manager.filter(name=name).first() or manager.create(name=name)
+            purposes.append((purpose, weight, file_share))
+        return purposes
+
+    def create_offices(self, purposes):
+        prefix = self.code_prefix
+        if Office.objects.using(self.using).filter(code__startswith=prefix).exists():
+            raise ValueError(f"Offices with code prefix {prefix!r} already exist; use another prefix.")
+
+        offices = []
+        setup = {'accounts.District': 0, 'accounts.Taluk': 0, 'accounts.Office': 0, 'accounts.Desk': 0,
+                 'accounts.User': 0, 'accounts.StaffMember': 0, 'routing.RoutingRule': 0}
+        with transaction.atomic(using=self.using):
+            for d in range(1, self.districts + 1):
+                district = District.objects.using(self.using).create(
+                    name=f'Synthetic District {d}', code=f'{prefix}{d:02d}')
+                setup['accounts.District'] += 1
+                for t in range(1, self.taluks_per_district + 1):
+                    taluk = Taluk.objects.using(self.using).create(
+                        name=f'Synthetic Taluk {d}.{t}', code=f'{district.code}{t:02d}', district=district)
+                    setup['accounts.Taluk'] += 1
+                    for o in range(1, self.offices_per_taluk + 1):
+                        offices.append(self.create_office(taluk, o, purposes, setup, index=len(offices)))
+
+        self.setup_counts = setup
+        return offices
+
+    def create_office(self, taluk, number, purposes, setup, index):
+        rng = self.rng
+        using = self.using
+        office = Office.objects.using(using).create(
+            name=f'{rng.choice(FIRST_NAMES)}puram {taluk.code}{number:02d}', code=f'{taluk.code}{number:02d}',
+            taluk=taluk, is_headquarters=number == 1)
+        vo_desk = Desk.objects.using(using).create(name='Village Officer', office=office)
+        desks = [Desk.objects.using(using).create(name=f'Desk {i}', office=office)
+                 for i in range(1, self.desks_per_office + 1)]
+
+        password = make_password(None)
+        vo = User(username=f'{office.code}VO', role=User.Role.VO, office=office, desk=vo_desk, password=password)
+        clerks = [User(username=f'{office.code}C{i}', role=rng.choice([User.Role.CLERK, User.Role.VA]),
+                       office=office, desk=desk, password=password)
+                  for i, desk in enumerate(desks, start=1)]
+        # Read back: MySQL does not return ids from bulk_create
+        User.objects.using(using).bulk_create([vo] + clerks)
+        users = list(User.objects.using(using).filter(office=office).order_by('id'))
+        StaffMember.objects.using(using).bulk_create([
+            StaffMember(pen=f'PEN{user.username}', name=self.person_name(rng), designation=user.get_role_display(),
+                        office=office, date_of_joining=self.start_date)
+            for user in users
+        ])
+        staff = list(StaffMember.objects.using(using).filter(office=office).order_by('id'))
+        UserAssignment.objects.using(using).bulk_create([
+            UserAssignment(user=user, staff_member=member, from_date=self.start_date)
+            for user, member in zip(users, staff)
+        ])
+        RoutingRule.objects.using(using).bulk_create([
+            RoutingRule(office=office, purpose=purpose, default_desk=desks[i % len(desks)])
+            for i, (purpose, _, _) in enumerate(purposes)
+        ])
+        setup['accounts.Office'] += 1
+        setup['accounts.Desk'] += len(desks) + 1
+        setup['accounts.User'] += len(users)
+        setup['accounts.StaffMember'] += len(staff)
+        setup['routing.RoutingRule'] += len(purposes)
+
+        desk_staff = {user.desk_id: (user, member) for user, member in zip(users, staff)}
+        return {
+            'index': index,
+            'rng': random.Random(f'{self.seed}:{office.code}'),
+            'rows': {model: 0 for model in MODELS},
+            'office': office,
+            'desks': desks,
+            'vo_desk': vo_desk,
+            'desk_staff': desk_staff,
+            'routing': {purpose.pk: desks[i % len(desks)] for i, (purpose, _, _) in enumerate(purposes)},
+            # Busier and quieter villages
+            'size': rng.lognormvariate(0, 0.35),
+            'residents': [],
+            'file_serials': {},
+        }
+
+    def person_name(self, rng):
+        return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+    def visitor(self, office):
+        """(name, mobile): a returning resident or a new one."""
+        residents = office['residents']
+        rng = office['rng']
+        if residents and rng.random() < REPEAT_VISITOR_RATE:
+            # Recent residents return more often than old ones
+            return residents[int(len(residents) * (1 - rng.random() ** 3))]
+        resident = (self.person_name(rng), f'{rng.choice("6789")}{rng.randrange(10 ** 9):09d}')
+        residents.append(resident)
+        return resident
+
+    def at(self, day, seconds):
+        return datetime.datetime.combine(day, datetime.time(OPEN_HOUR), self.tz) + datetime.timedelta(seconds=seconds)
+
+    def generate_day(self, info, day, purposes, visitor_user):
+        rng = info['rng']
+        office = info['office']
+        mean = (self.visits_per_day * info['size'] * WEEKDAY_FACTOR[day.weekday()]
+                * MONTH_FACTOR[day.month - 1])
+        count = max(0, round(rng.gauss(mean, mean ** 0.5)))
+        if not count:
+            return
+
+        arrivals = sorted(
+            hour * 3600 + rng.random() * 3600
+            for hour in rng.choices(range(len(HOURLY_PROFILE)), HOURLY_PROFILE, k=count)
+        )
+        closing = len(HOURLY_PROFILE) * 3600 + 1800
+        purpose_weights = [weight for _, weight, _ in purposes]
+        modes, mode_weights = zip(*MODES)
+        date_str = day.strftime('%d%m%Y')
+
+        desk_free_at = {desk.pk: 0 for desk in info['desks']}
+        for seq, arrival in enumerate(arrivals, start=1):
+            purpose, _, file_share = rng.choices(purposes, purpose_weights)[0]
+            mode = rng.choices(modes, mode_weights)[0]
+            name, mobile = self.visitor(info) if mode != Visit.RegistrationMode.QUICK else ('Guest', '')
+            desk = info['routing'][purpose.pk]
+            issued = self.at(day, arrival)
+            visit = Visit(
+                office_id=office.pk, token=f'{office.code}-{date_str}-{seq:03d}', mobile=mobile, name=name,
+                purpose_id=purpose.pk, registration_mode=mode, created_by_id=visitor_user.pk,
+                token_issue_time=issued, created_at=issued,
+            )
+            logs = [
+                dict(action=VisitLog.Action.CREATED, when=issued, by_user=visitor_user,
+                     remarks=f'Registered via {mode}'),
+                dict(action=VisitLog.Action.ROUTED, when=issued, to_desk=desk, remarks='Auto-routed based on purpose'),
+            ]
+
+            # Served in order by the desk; some leave before being called
+            start = max(arrival + rng.expovariate(1 / (MEAN_WAIT_MINUTES * 60)), desk_free_at[desk.pk])
+            if start > closing or rng.random() < CANCEL_RATE:
+                cancelled = self.at(day, closing)
+                visit.status = Visit.Status.CANCELLED
+                visit.current_desk_id = desk.pk
+                visit.updated_at = cancelled
+                self.add(visit, info)
+                self.add(DeskQueue(visit_id=visit.pk, desk_id=desk.pk, assigned_at=issued, is_active=False), info)
+                logs.append(dict(action=VisitLog.Action.CANCELLED, when=cancelled,
+                                 remarks='Auto-cancelled at close-out'))
+                self.add_logs(visit, logs, info)
+                continue
+
+            user, member = info['desk_staff'][desk.pk]
+            attended = self.at(day, start)
+            logs.append(dict(action=VisitLog.Action.ATTENDED, when=attended, by_user=user, by_staff=member))
+            finish = start + rng.expovariate(1 / (MEAN_SERVICE_MINUTES * 60))
+
+            transfers = 0
+            if rng.random() < TRANSFER_RATE:
+                transfers = 2 if rng.random() < SECOND_TRANSFER_RATE else 1
+            for _ in range(transfers):
+                target = rng.choice([d for d in info['desks'] + [info['vo_desk']] if d.pk != desk.pk])
+                logs.append(dict(action=VisitLog.Action.TRANSFERRED, when=self.at(day, finish), by_user=user,
+                                 by_staff=member, from_desk=desk, to_desk=target))
+                desk_free_at[desk.pk] = finish
+                desk = target
+                user, member = info['desk_staff'][desk.pk]
+                finish += rng.expovariate(1 / (MEAN_SERVICE_MINUTES * 60))
+            if desk.pk in desk_free_at:
+                desk_free_at[desk.pk] = finish
+
+            completed = self.at(day, finish)
+            logs.append(dict(action=VisitLog.Action.COMPLETED, when=completed, by_user=user, by_staff=member))
+            visit.status = Visit.Status.COMPLETED
+            visit.token_attend_time = attended
+            visit.current_desk_id = desk.pk
+            visit.updated_at = completed
+            self.add(visit, info)
+            self.add(DeskQueue(visit_id=visit.pk, desk_id=desk.pk, assigned_at=issued, assigned_by_id=user.pk,
+                               is_active=False), info)
+            self.add_logs(visit, logs, info)
+
+            opens_file = rng.random() < file_share
+            self.add(Transaction(
+                visit_id=visit.pk, status='OPEN_FILE' if opens_file else 'CLOSED',
+                tp_number=f'{rng.randrange(1, 10 ** 5)}' if rng.random() < 0.5 else None,
+                block=f'Blk{rng.randrange(1, 10)}' if rng.random() < 0.3 else None,
+                created_at=attended, updated_at=completed,
+            ), info)
+            if opens_file:
+                self.open_file(info, visit, desk, completed)
+
+        self.add(DailyTokenCounter(office_id=office.pk, date=day, last_seq=len(arrivals)), info)
+        self.login_sessions(info, day)
+
+    def add_logs(self, visit, logs, info):
+        for entry in logs:
+            self.add(VisitLog(visit_id=visit.pk, action=entry['action'], timestamp=entry['when'],
+                              by_user_id=pk_of(entry.get('by_user')), by_staff_id=pk_of(entry.get('by_staff')),
+                              from_desk_id=pk_of(entry.get('from_desk')), to_desk_id=pk_of(entry.get('to_desk')),
+                              remarks=entry.get('remarks')), info)
+
+    def open_file(self, info, visit, desk, when):
+        """Serial per office and year; files whose (random) closing day has passed are closed."""
+        rng = info['rng']
+        year = when.year
+        serial = info['file_serials'].get(year, 0) + 1
+        info['file_serials'][year] = serial
+        office_file = OfficeFile(
+            visit_id=visit.pk, office_id=info['office'].pk, file_number=f'{serial}/{year}', year=year,
+            serial_number=serial, desk_id=desk.pk, interim_status=rng.choices(*zip(*INTERIM_STATUSES))[0],
+            created_at=when, updated_at=when,
+        )
+        closes_on = when.date() + datetime.timedelta(days=round(rng.expovariate(1 / MEAN_FILE_DAYS)))
+        if closes_on <= self.end_date:
+            office_file.status = 'CLOSED'
+            office_file.interim_status = 'Closed'
+            office_file.updated_at = datetime.datetime.combine(closes_on, datetime.time(15), self.tz)
+        sla.apply(office_file, self.now)
+        self.add(office_file, info)
+
+    def login_sessions(self, info, day):
+        rng = info['rng']
+        for user, member in info['desk_staff'].values():
+            if rng.random() < 0.08:  # on leave
+                continue
+            login = self.at(day, rng.uniform(-1200, 1800))
+            self.add(LoginSession(
+                user_id=user.pk, staff_member_id=member.pk, login_time=login,
+                logout_time=login + datetime.timedelta(hours=rng.uniform(6.5, 8)),
+                ip_address=f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0',
+            ), info)
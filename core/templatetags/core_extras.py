@@ -1,6 +1,8 @@
 from django import template
+from django.db.models import BooleanField, ExpressionWrapper, Q
 from django.utils import timezone
 from accounts.models import UserAssignment
+from core.cache import cached
 
 register = template.Library()
 
@@ -11,26 +13,20 @@ def get_active_staff_name(user):
     """
     if not user.is_authenticated:
         return ""
-        
+
     today = timezone.now().date()
-    assignment = UserAssignment.objects.filter(
+    # Rendered on every page; shared cache, invalidated on assignment/staff changes
+    return cached('staff', f'active_name:{user.pk}:{today}', lambda: _active_staff_name(user, today))
+
+
+def _active_staff_name(user, today):
+    # One query: open-ended assignments first, then ones still running, latest first
+    name = UserAssignment.objects.filter(
         user=user,
         from_date__lte=today
     ).filter(
-        to_date__isnull=True
-    ).order_by('-from_date').first()
-    
-    if not assignment:
-        # Try to find one that ends in future if infinity check failed (though isnull cover logic)
-        # Re-implementing logic from utils slightly differently to be sure
-        from django.db.models import Q
-        assignment = UserAssignment.objects.filter(
-            user=user,
-            from_date__lte=today
-        ).filter(
-            Q(to_date__isnull=True) | Q(to_date__gte=today)
-        ).order_by('-from_date').first()
-
-    if assignment:
-        return assignment.staff_member.name
-    return ""
+        Q(to_date__isnull=True) | Q(to_date__gte=today)
+    ).order_by(
+        ExpressionWrapper(Q(to_date__isnull=True), output_field=BooleanField()).desc(), '-from_date'
+    ).values_list('staff_member__name', flat=True).first()
+    return name or ""
@@ -0,0 +1,185 @@
+"""
+Query budgets for the main pages.
+
+Every view is rendered twice against the same office: once with a few rows of
+everything, and again after adding more rows than that. The number of queries
+must be the same both times (no per-row queries) and stay within the view's
+budget below (the count measured when it was set, plus 2). When a change adds
+a query on purpose, raise the budget; when the test fails on "grows with
+rows", a loop in the view or template is hitting the database (use
+select_related/prefetch_related or annotate in the queryset).
+
+Row counts stay below the smallest page size (10), so paginated lists would
+show the growth too.
+"""
+import datetime
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Office, Desk, User, StaffMember, UserAssignment, LoginSession
+from filing import sla
+from filing.models import OfficeFile
+from routing.models import DeskQueue, RoutingRule
+from transactions.models import Transaction
+from visit_regn.models import Visit, VisitLog, Purpose
+
+SMALL = 2
+LARGE = 7
+
+# (name, url name, url args or callable(data), query string, user, budget)
+PAGES = [
+    ('dashboard (VO)', 'dashboard', None, '', 'vo', 11),
+    ('dashboard (clerk)', 'dashboard', None, '', 'clerk', 11),
+    ('track status: token', 'track_status', None, lambda d: f'?q={d.first_visit.token}', 'anonymous', 4),
+    ('track status: file matches', 'track_status', None, '?q=7/2024', 'anonymous', 5),
+    ('track status: mobile matches', 'track_status', None, '?q=9400000000', 'anonymous', 7),
+    ('kiosk home', 'visit_regn:kiosk_home', None, '?office=QB01', 'anonymous', 5),
+    ('kiosk register form', 'visit_regn:manual_register', None, '?office=QB01', 'anonymous', 2),
+    ('mobile entry', 'visit_regn:mobile_entry', None, '?office=QB01', 'anonymous', 2),
+    ('token print', 'visit_regn:token_print', lambda d: [d.first_visit.pk], '', 'anonymous', 5),
+    ('staff visit queue', 'visit_regn:visit_queue', None, '', 'clerk', 9),
+    ('staff visit detail', 'visit_regn:visit_detail', lambda d: [d.first_visit.pk], '', 'clerk', 12),
+    ('office queue', 'routing:visit_queue', None, '', 'vo', 8),
+    ('desk queue', 'routing:desk_queue', None, '', 'clerk', 8),
+    ('VO routing', 'routing:vo_routing', None, '', 'vo', 7),
+    ('reference options', 'routing:reference_options', None, '?office=', 'vo', 4),
+    ('process transaction', 'transactions:process_transaction', lambda d: [d.first_visit.pk], '', 'clerk', 8),
+    ('visitor display', 'transactions:visitor_display', None, '', 'anonymous', 2),
+    ('latest calls', 'transactions:get_latest_calls', None, '', 'anonymous', 3),
+    ('file list (VO)', 'filing:file_list', None, '', 'vo', 7),
+    ('file list (clerk)', 'filing:file_list', None, '', 'clerk', 7),
+    ('file list: overdue', 'filing:file_list', None, '?overdue=1', 'clerk', 7),
+    ('file detail', 'filing:file_detail', lambda d: [d.first_file.pk], '', 'clerk', 10),
+    ('MIS dashboard', 'mis:dashboard', None, '', 'vo', 11),
+    ('MIS daily report', 'mis:daily_report', None, '', 'vo', 8),
+    ('MIS daily export', 'mis:daily_report', None, '?export=1', 'vo', 8),
+    ('MIS file report', 'mis:file_report', None, '', 'vo', 7),
+    ('MIS file export', 'mis:file_report', None, '?export=1', 'vo', 6),
+    ('MIS aging report', 'mis:aging_report', None, '', 'vo', 7),
+    ('MIS aging export', 'mis:aging_report', None, '?export=1', 'vo', 6),
+    ('MIS SLA breaches', 'mis:sla_report', None, '', 'vo', 8),
+    ('MIS service analysis', 'mis:service_report', None, '', 'vo', 8),
+    ('users', 'user_list', None, '', 'admin', 7),
+    ('staff members', 'staff_list', None, '', 'admin', 7),
+    ('assignments', 'userassignment_list', None, '', 'admin', 7),
+    ('login sessions', 'loginsession_list', None, '', 'admin', 7),
+    ('offices', 'office_list', None, '', 'admin', 7),
+    ('desks', 'desk_list', None, '', 'admin', 7),
+    ('admin: visits', 'admin:visit_regn_visit_changelist', None, '', 'superuser', 8),
+    ('admin: visit logs', 'admin:visit_regn_visitlog_changelist', None, '', 'superuser', 7),
+    ('admin: desk queue', 'admin:routing_deskqueue_changelist', None, '', 'superuser', 9),
+    ('admin: login sessions', 'admin:accounts_loginsession_changelist', None, '', 'superuser', 7),
+]
+
+
+class QueryBudgetData:
+    """One office with a VO, a clerk at Desk 1 and rows that grow with add()."""
+
+    def __init__(self):
+        self.office = Office.objects.create(name='Budget Office', code='QB01')
+        self.vo_desk = Desk.objects.create(name='Village Officer', office=self.office)
+        self.desk = Desk.objects.create(name='Desk 1', office=self.office)
+        self.purpose = Purpose.objects.create(name='Income Certificate')
+        RoutingRule.objects.create(office=self.office, purpose=self.purpose, default_desk=self.desk)
+
+        self.users = {
+            'vo': User.objects.create_user('QBVO', password='x', role='VO', office=self.office, desk=self.vo_desk),
+            'clerk': User.objects.create_user('QBCLERK', password='x', role='CLERK', office=self.office,
+                                              desk=self.desk),
+            'admin': User.objects.create_user('QBADMIN', password='x', role='ADMIN'),
+            'superuser': User.objects.create_superuser('QBROOT', password='x', role='SUPER_ADMIN'),
+        }
+        for user in self.users.values():
+            self.add_staff(user)
+        self.rows = 0
+        self.first_visit = None
+        self.first_file = None
+
+    def add_staff(self, user):
+        staff = StaffMember.objects.create(pen=f'PEN-{user.username}', name=f'Staff {user.username}',
+                                           designation='Clerk', office=self.office,
+                                           date_of_joining=datetime.date(2020, 1, 1))
+        UserAssignment.objects.create(user=user, staff_member=staff, from_date=datetime.date(2020, 1, 1))
+        return staff
+
+    def add(self, count):
+        """count more of every kind of row the pages list."""
+        clerk = self.users['clerk']
+        month_ago = timezone.now() - datetime.timedelta(days=40)
+        for _ in range(count):
+            n = self.rows = self.rows + 1
+            # Live visits at the clerk's desk: waiting and in progress
+            for status in (Visit.Status.ROUTED, Visit.Status.IN_PROGRESS):
+                visit = Visit.objects.create(
+                    office=self.office, token=f'QB01-{n:03d}-{status[:2]}', name=f'Visitor {n}',
+                    mobile='9400000000', purpose=self.purpose, registration_mode='KIOSK',
+                    status=status, current_desk=self.desk, created_by=clerk,
+                )
+                DeskQueue.objects.create(visit=visit, desk=self.desk, assigned_by=clerk)
+                Transaction.objects.create(visit=visit)
+                VisitLog.objects.create(visit=visit, action='CREATED', by_user=clerk)
+                VisitLog.objects.create(visit=visit, action='ROUTED', to_desk=self.desk)
+                self.first_visit = self.first_visit or visit
+
+            # An old open file with its own visit, in this and another office (same number)
+            other = Office.objects.create(name=f'Other Office {n}', code=f'QBX{n:02d}')
+            Desk.objects.create(name=f'Desk {n + 1}', office=self.office)
+            for office in (self.office, other):
+                file_visit = Visit.objects.create(
+                    office=office, token=f'{office.code}-F{n:03d}', name=f'Applicant {n}', mobile='9400000000',
+                    purpose=self.purpose, registration_mode='KIOSK', status=Visit.Status.COMPLETED,
+                    current_desk=self.desk, created_by=clerk,
+                )
+                Transaction.objects.create(visit=file_visit, status='OPEN_FILE')
+                office_file = OfficeFile.objects.create(visit=file_visit, office=office, desk=self.desk,
+                                                        file_number=f'{7 if n == 1 else n + 100}/2024')
+                OfficeFile.objects.filter(pk=office_file.pk).update(created_at=month_ago)
+                sla.recompute(office=office)
+                self.first_file = self.first_file or office_file
+
+            user = User.objects.create_user(f'QBUSER{n}', password='x', role='CLERK', office=self.office,
+                                            desk=self.desk)
+            staff = self.add_staff(user)
+            LoginSession.objects.create(user=user, staff_member=staff, ip_address='10.0.0.1')
+
+
+@override_settings(REPLICA_DATABASE=None)
+class QueryBudgetTests(TestCase):
+    maxDiff = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = QueryBudgetData()
+
+    def count_queries(self):
+        counts = {}
+        for name, url_name, args, query, user, budget in PAGES:
+            if user == 'anonymous':
+                self.client.logout()
+            else:
+                self.client.force_login(self.data.users[user])
+            url = reverse(url_name, args=args(self.data) if callable(args) else args)
+            url += query(self.data) if callable(query) else query
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, f"{name}: {url} returned {response.status_code}")
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            counts[name] = len(queries)
+        return counts
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.data.add(SMALL)
+        small = self.count_queries()
+        self.data.add(LARGE - SMALL)
+        large = self.count_queries()
+
+        grew = {name: (small[name], large[name]) for name in small if large[name] != small[name]}
+        self.assertEqual(grew, {}, f"Queries grow with rows (with {SMALL} vs {LARGE} rows)")
+
+        over = {name: (large[name], budget) for name, *_, budget in PAGES if large[name] > budget}
+        self.assertEqual(over, {}, "Over the query budget (queries, budget)")
@@ -0,0 +1,44 @@
+"""
+Test support.
+
+TestRunner (settings.TEST_RUNNER) runs the tests against an in-process cache,
+LOCMEM_CACHE, instead of the configured shared one, and empties it before
+every test. Each test's database changes are rolled back (and their ids used
+again), but the cache is not rolled back, so an entry left by one test would
+be stale in the next.
+"""
+import unittest
+
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def clear_caches():
+    from .refdata import clear_snapshot
+    for cache in caches.all(initialized_only=True):
+        cache.clear()
+    clear_snapshot()
+
+
+class CacheClearingResult:
+    def startTest(self, test):
+        clear_caches()
+        super().startTest(test)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_settings = override_settings(CACHES=LOCMEM_CACHE)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+        return type('CacheClearingTestResult', (CacheClearingResult, base), {})
@@ -1,3 +1,504 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import logging
+import random
+import tempfile
+from io import StringIO
+from urllib.parse import parse_qs
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.test import TestCase, RequestFactory, override_settings
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve, reverse
+from django.utils import timezone
+from accounts.models import Office, Desk, User, LoginSession
+from filing import gauges as file_gauges, sla
+from filing.models import OfficeFile
+from routing.models import QueueGauge, RoutingRule
+from routing.services import get_routing_table, get_vo_desk
+from transactions.models import Transaction
+from visit_regn.models import Purpose, Visit, VisitLog
+from . import metrics, profiling
+from .cache import cached, get_cache, get_version
+from .changelist import EstimatedCountPaginator
+from .management.commands.bench_office_day import arrival_schedule, bundled_scenarios, load_scenario
+from .middleware import MetricsMiddleware, ReplicaMiddleware, RequestProfilerMiddleware, RECENT_WRITE_COOKIE
+from .pagination import CURSOR_PARAM, decode_cursor, keyset_keys, keyset_page
+from .routers import ReplicaRouter
+from .synthetic import SyntheticDataGenerator
+from .testing import LOCMEM_CACHE
+from .warmup import warm_up
+
+# 'default' stands in for the replica alias: only the routing decision is under test
+@override_settings(REPLICA_DATABASE='default')
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def read_alias_during(self, method, url, cookies=None, write=False):
+        seen = {}
+
+        def view(request):
+            if write:
+                self.router.db_for_write(Visit)
+            seen['alias'] = self.router.db_for_read(Visit)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        request = getattr(self.factory, method)(url)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(url)
+
+        def get_response(req):
+            middleware.process_view(req, view, (), {})
+            return view(req)
+
+        middleware.get_response = get_response
+        response = middleware(request)
+        return seen['alias'], response
+
+    def test_reporting_views_read_from_replica(self):
+        for url in [reverse('mis:dashboard'), reverse('track_status'), reverse('admin:visit_regn_visit_changelist')]:
+            alias, _ = self.read_alias_during('get', url)
+            self.assertEqual(alias, 'default', url)
+        # Routing is reset once the request is done
+        self.assertIsNone(self.router.db_for_read(Visit))
+
+    def test_operational_views_stay_on_primary(self):
+        alias, _ = self.read_alias_during('get', reverse('routing:visit_queue'))
+        self.assertIsNone(alias)
+
+    def test_read_your_writes(self):
+        _, response = self.read_alias_during('post', reverse('routing:vo_routing'))
+        self.assertIn(RECENT_WRITE_COOKIE, response.cookies)
+
+        alias, _ = self.read_alias_during('get', reverse('mis:dashboard'), cookies={RECENT_WRITE_COOKIE: '1'})
+        self.assertIsNone(alias)
+
+        alias, _ = self.read_alias_during('get', reverse('mis:dashboard'), write=True)
+        self.assertIsNone(alias)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SharedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.office = Office.objects.create(name='Cache Office', code='CO')
+        self.other_office = Office.objects.create(name='Other Office', code='OO')
+        self.desk_a = Desk.objects.create(name='Desk A', office=self.office)
+        self.desk_b = Desk.objects.create(name='Desk B', office=self.office)
+        self.purpose = Purpose.objects.create(name='Certificate')
+
+    def test_keys_are_namespaced_per_office(self):
+        self.assertEqual(cached('desk', 'x', lambda: 'mine', office=self.office), 'mine')
+        self.assertEqual(cached('desk', 'x', lambda: 'theirs', office=self.other_office), 'theirs')
+        self.assertEqual(cached('desk', 'x', lambda: 'recomputed', office=self.office), 'mine')
+
+    def test_routing_rule_change_invalidates_table(self):
+        rule = RoutingRule.objects.create(office=self.office, purpose=self.purpose, default_desk=self.desk_a)
+        self.assertEqual(get_routing_table(self.office)[self.purpose.id], self.desk_a)
+
+        # Served from the cache until something changes
+        with self.assertNumQueries(0):
+            get_routing_table(self.office)
+
+        rule.default_desk = self.desk_b
+        rule.save()
+        self.assertEqual(get_routing_table(self.office)[self.purpose.id], self.desk_b)
+
+        rule.delete()
+        self.assertEqual(get_routing_table(self.office), {})
+
+    def test_change_in_one_office_keeps_others_cached(self):
+        cached('desk', 'vo_desk', lambda: None, office=self.other_office)
+        Desk.objects.create(name='Village Officer', office=self.office)
+        with self.assertNumQueries(0):
+            self.assertIsNone(cached('desk', 'vo_desk', lambda: 'recomputed', office=self.other_office))
+
+    def test_bump_after_commit(self):
+        before = get_version('purpose')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purpose.name = 'Certificate (Income)'
+            self.purpose.save()
+        self.assertEqual(get_version('purpose'), before + 2)
+
+
+class OfficeDayScenarioTests(TestCase):
+    """bench_office_day scenario files and arrival schedule (no server needed)."""
+
+    def test_bundled_scenarios_load(self):
+        self.assertIn('office_day', bundled_scenarios())
+        for name in bundled_scenarios():
+            load_scenario(name)
+
+    def test_schedule_follows_profile_and_seed(self):
+        scenario = load_scenario('office_day')
+        schedule = arrival_schedule(scenario, random.Random(7))
+
+        self.assertEqual(schedule, arrival_schedule(scenario, random.Random(7)))
+        self.assertEqual(len(schedule), scenario['registrations_per_office'])
+        self.assertEqual(schedule, sorted(schedule))
+        # Busiest hour of the profile gets the most arrivals
+        per_hour = [0] * len(scenario['hourly_profile'])
+        for at, _, _ in schedule:
+            per_hour[int(at // 3600)] += 1
+        busiest = scenario['hourly_profile'].index(max(scenario['hourly_profile']))
+        self.assertEqual(per_hour.index(max(per_hour)), busiest)
+
+
+class SyntheticDataTests(TestCase):
+    def generate(self, **kwargs):
+        options = dict(seed=3, districts=1, taluks_per_district=1, offices_per_taluk=2, desks_per_office=2,
+                       days=14, end_date=datetime.date(2025, 3, 15), visits_per_day=15, chunk_size=100)
+        options.update(kwargs)
+        return SyntheticDataGenerator(**options).run()
+
+    def snapshot(self):
+        return (
+            list(Visit.objects.order_by('id').values_list('id', 'token', 'mobile', 'status', 'current_desk_id',
+                                                          'token_issue_time')),
+            list(VisitLog.objects.order_by('id').values_list('visit_id', 'action', 'to_desk_id', 'timestamp')),
+            list(OfficeFile.objects.order_by('id').values_list('file_number', 'status', 'created_at')),
+        )
+
+    def test_same_seed_same_rows(self):
+        with transaction.atomic():
+            self.generate()
+            first = self.snapshot()
+            transaction.set_rollback(True)
+        counts = self.generate()
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(counts['visit_regn.Visit'], len(first[0]))
+
+    def test_rows_are_consistent_history(self):
+        self.generate()
+
+        visits = Visit.objects.all()
+        self.assertTrue(visits.exists())
+        self.assertFalse(visits.exclude(status__in=[Visit.Status.COMPLETED, Visit.Status.CANCELLED]).exists())
+        # Historical times, not the time of the run
+        self.assertFalse(visits.filter(token_issue_time__date__gt=datetime.date(2025, 3, 15)).exists())
+        self.assertFalse(VisitLog.objects.filter(timestamp__date__gt=datetime.date(2025, 3, 15)).exists())
+        self.assertEqual(VisitLog.objects.filter(action='CREATED').count(), visits.count())
+        self.assertEqual(Transaction.objects.count(), visits.filter(status=Visit.Status.COMPLETED).count())
+        # Repeat visitors share a mobile number
+        repeats = visits.exclude(mobile='').values('mobile').annotate(n=Count('id')).filter(n__gt=1)
+        self.assertTrue(repeats.exists())
+        # File serials run 1..n per office and year
+        for office_id in OfficeFile.objects.values_list('office_id', flat=True).distinct():
+            serials = list(OfficeFile.objects.filter(office_id=office_id).order_by('serial_number')
+                           .values_list('serial_number', flat=True))
+            self.assertEqual(serials, list(range(1, len(serials) + 1)))
+
+    def test_files_have_due_dates_and_gauges(self):
+        self.generate()
+
+        open_files = OfficeFile.objects.exclude(status='CLOSED')
+        self.assertTrue(open_files.exists())
+        self.assertFalse(open_files.filter(due_at__isnull=True).exists())
+        # Generated in 2025: every open file is past its target by now
+        self.assertFalse(open_files.filter(is_overdue=False).exists())
+        self.assertFalse(OfficeFile.objects.filter(status='CLOSED', due_at__isnull=False).exists())
+        self.assertEqual(sla.recompute(), 0)
+
+        counts = {office_id: (open_files.filter(office_id=office_id).count(),) * 2
+                  for office_id in open_files.values_list('office_id', flat=True).distinct()}
+        self.assertEqual(file_gauges.open_and_overdue(), counts)
+        day = datetime.date(2025, 3, 15)
+        attended = Visit.objects.filter(token_issue_time__date=day, token_attend_time__isnull=False).count()
+        self.assertGreater(attended, 0)
+        self.assertEqual(sum(QueueGauge.objects.filter(date=day).values_list('attended', flat=True)), attended)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PROFILER_SAMPLE_RATE=1, PROFILER_SLOW_MS=0)
+class RequestProfilerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        profiling._stats.clear()
+        profiling._epoch = None
+        self.addCleanup(profiling._stats.clear)
+
+        # Slow log to a temporary file instead of logs/
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        self.log_path = f"{log_dir.name}/slow.log"
+        logger = logging.getLogger(profiling.SLOW_LOGGER)
+        handler = logging.FileHandler(self.log_path, delay=True)
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(handler.close)
+        self.addCleanup(setattr, profiling, '_slow_logger', None)
+
+    def profiled_get(self, path, response):
+        request = RequestFactory().get(path)
+        request.resolver_match = resolve(path)
+        return RequestProfilerMiddleware(response)(request)
+
+    def test_disabled_without_sample_rate(self):
+        with override_settings(PROFILER_SAMPLE_RATE=0):
+            with self.assertRaises(MiddlewareNotUsed):
+                RequestProfilerMiddleware(lambda request: HttpResponse())
+
+    def test_counts_queries_and_repeats_per_url_name(self):
+        def view(request):
+            for _ in range(3):
+                Visit.objects.filter(pk=1).exists()
+            Visit.objects.count()
+            return HttpResponse()
+
+        self.profiled_get(reverse('track_status'), view)
+        self.profiled_get(reverse('track_status'), view)
+
+        rows, since = profiling.summary()
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual(row['url_name'], 'track_status')
+        self.assertEqual(row['requests'], 2)
+        self.assertEqual(row['avg_queries'], 4)
+        self.assertEqual(row['slow'], 2)
+        # The exists() query ran 3 times per request: 2 extra each
+        self.assertEqual(len(row['duplicates']), 1)
+        self.assertEqual(row['duplicates'][0][1], 4)
+
+        with open(self.log_path) as log:
+            entries = [json.loads(line) for line in log]
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['url_name'], 'track_status')
+        self.assertEqual(entries[0]['queries'], 4)
+        self.assertEqual(entries[0]['duplicates'][0]['times'], 3)
+
+        profiling.reset()
+        self.assertEqual(profiling.summary()[0], [])
+
+    def test_page_is_super_admin_only(self):
+        admin = User.objects.create_user('PROFADMIN', password='x', role='ADMIN')
+        root = User.objects.create_user('PROFROOT', password='x', role='SUPER_ADMIN')
+        self.profiled_get(reverse('track_status'), lambda request: HttpResponse())
+
+        self.client.force_login(admin)
+        self.assertRedirects(self.client.get(reverse('request_profile')), reverse('landing'),
+                             fetch_redirect_response=False)
+        self.client.force_login(root)
+        response = self.client.get(reverse('request_profile'))
+        self.assertContains(response, 'track_status')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics._series.clear()
+        self.addCleanup(metrics._series.clear)
+
+    def timed_get(self, path, response):
+        request = RequestFactory().get(path)
+        try:
+            request.resolver_match = resolve(path)
+        except Resolver404:
+            request.resolver_match = None
+        return MetricsMiddleware(response)(request)
+
+    def test_latency_histogram_and_query_count_per_url_name(self):
+        def view(request):
+            Visit.objects.count()
+            Visit.objects.exists()
+            return HttpResponse()
+
+        self.timed_get(reverse('track_status'), view)
+        self.timed_get(reverse('track_status'), view)
+        self.timed_get('/no/such/page/', lambda request: HttpResponse(status=404))
+
+        totals = metrics.request_totals()
+        self.assertEqual(set(totals), {'track_status', '(unresolved)'})
+        self.assertEqual(totals['track_status']['count'], 2)
+        self.assertEqual(totals['track_status']['queries'], 4)
+
+        text = metrics.render()
+        self.assertIn('vista_http_request_duration_seconds_bucket{view="track_status",le="+Inf"} 2', text)
+        self.assertIn('vista_http_request_duration_seconds_count{view="(unresolved)"} 1', text)
+        self.assertIn('vista_db_queries_total{view="track_status"} 4', text)
+
+    def test_business_gauges(self):
+        office = Office.objects.create(name='Metrics Office', code='MET1')
+        desk = Desk.objects.create(name='Desk 1', office=office)
+        purpose = Purpose.objects.create(name='Income Certificate')
+        RoutingRule.objects.create(office=office, purpose=purpose, default_desk=desk)
+        visits = [Visit.create_from_kiosk({'name': f'V{i}', 'mobile': '9400000000', 'purpose': purpose}, office)
+                  for i in range(3)]
+
+        files = [OfficeFile.objects.create(visit=visit, office=office, desk=desk) for visit in visits]
+        files[0].status = 'CLOSED'
+        files[0].save()
+        # An old file: backdate it and recount, as after an import
+        OfficeFile.objects.filter(pk=files[1].pk).update(created_at=timezone.now() - datetime.timedelta(days=45))
+        call_command('rebuild_gauges', stdout=StringIO())
+        call_command('sweep_file_sla', '--recompute', stdout=StringIO())
+
+        text = metrics.render()
+        self.assertIn('vista_tokens_issued_today{office="MET1"} 3', text)
+        self.assertIn('vista_queue_waiting{office="MET1",desk="Desk 1"} 3', text)
+        self.assertIn('vista_queue_oldest_waiting_seconds{office="MET1",desk="Desk 1"}', text)
+        self.assertIn('vista_office_files_open{office="MET1"} 2', text)
+        self.assertIn('vista_office_files_overdue{office="MET1"} 1', text)
+
+    def test_endpoint_needs_the_token(self):
+        url = reverse('metrics')
+        # The test client's 127.0.0.1 is what a same-host reverse proxy looks like
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(url).status_code, 403)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertContains(response, '# TYPE vista_http_request_duration_seconds histogram')
+
+        remote = {'REMOTE_ADDR': '10.1.2.3'}
+        with override_settings(METRICS_ALLOWED_IPS=('10.1.2.3',)):
+            self.assertEqual(self.client.get(url, **remote).status_code, 200)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(url, **remote).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class WarmUpTests(TestCase):
+    def test_steps_run_and_fill_caches(self):
+        office = Office.objects.create(name='Warm Office', code='WARM')
+        Desk.objects.create(name='Village Officer', office=office)
+        get_cache().clear()
+
+        results = {name: count for name, count, _ in warm_up(connect=True)}
+        self.assertNotIn(None, results.values(), results)
+        self.assertEqual(results['connections'], len(connections.all()))
+        self.assertGreater(results['templates'], 20)
+        self.assertEqual(results['routing'], 1)
+        # The second request for the VO desk is a cache hit
+        with self.assertNumQueries(0):
+            self.assertEqual(get_vo_desk(office).name, 'Village Officer')
+
+    def test_runs_off_the_event_loop_under_asgi(self):
+        async def import_asgi():
+            return warm_up()
+
+        results = {name: count for name, count, _ in asyncio.run(import_asgi())}
+        self.assertNotIn(None, results.values(), results)
+
+    def test_connections_are_left_to_the_workers_by_default(self):
+        self.assertNotIn('connections', [name for name, _, _ in warm_up()])
+        with override_settings(WARM_UP_CONNECTIONS=True):
+            self.assertIn('connections', [name for name, _, _ in warm_up()])
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name='Admin Office', code='ADM1')
+        desk = Desk.objects.create(name='Desk 1', office=self.office)
+        purpose = Purpose.objects.create(name='Income Certificate')
+        RoutingRule.objects.create(office=self.office, purpose=purpose, default_desk=desk)
+        self.visits = [
+            Visit.create_from_kiosk({'name': f'V{i}', 'mobile': f'94000000{i}0', 'purpose': purpose}, self.office)
+            for i in range(3)
+        ]
+        self.client.force_login(User.objects.create_superuser('ROOT', password='x'))
+
+    def search(self, term):
+        response = self.client.get(reverse('admin:visit_regn_visit_changelist'), {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return {visit.token for visit in response.context['cl'].result_list}
+
+    def test_prefix_search_on_token_and_mobile(self):
+        tokens = {visit.token for visit in self.visits}
+        self.assertEqual(self.search('ADM1-'), tokens)
+        self.assertEqual(self.search('940000001'), {self.visits[1].token})
+        # Prefix only: the middle of a token or number does not match
+        self.assertEqual(self.search(self.visits[0].token[5:]), set())
+        self.assertEqual(self.search('0000001'), set())
+
+    def test_date_hierarchy_drill_down(self):
+        today = timezone.localdate()
+        response = self.client.get(reverse('admin:visit_regn_visit_changelist'), {
+            'office__id__exact': self.office.pk,
+            'token_issue_time__year': today.year,
+            'token_issue_time__month': today.month,
+            'token_issue_time__day': today.day,
+        })
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+    def test_estimated_paginator(self):
+        class Paginator(EstimatedCountPaginator):
+            count_cap = 2
+
+        # Filtered, or no statistics yet: counted, but only up to the cap
+        self.assertEqual(Paginator(Visit.objects.filter(office=self.office).order_by('pk'), 100).count, 2)
+        self.assertEqual(Paginator(Visit.objects.order_by('pk'), 100).count, 2)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            self.assertEqual(Paginator(Visit.objects.order_by('pk'), 100).count, 3)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        office = Office.objects.create(name='Keyset Office', code='KEY1')
+        desk = Desk.objects.create(name='Desk 1', office=office)
+        purpose = Purpose.objects.create(name='Income Certificate')
+        RoutingRule.objects.create(office=office, purpose=purpose, default_desk=desk)
+        for i in range(7):
+            Visit.create_from_kiosk({'name': f'V{i}', 'purpose': purpose}, office)
+        # Pairs of equal issue times: the id breaks the tie
+        now = timezone.now()
+        for visit in Visit.objects.all():
+            Visit.objects.filter(pk=visit.pk).update(token_issue_time=now.replace(second=visit.pk // 2))
+        self.expected = list(Visit.objects.order_by('-token_issue_time', '-id').values_list('id', flat=True))
+
+    def page(self, querysets, cursor=None, size=3):
+        keys = keyset_keys(Visit, ('-token_issue_time',))
+        request = RequestFactory().get('/', {CURSOR_PARAM: cursor} if cursor else {})
+        return keyset_page(querysets, keys, decode_cursor(cursor, Visit, keys), size, request)
+
+    def walk(self, querysets):
+        pages, page = [], self.page(querysets)
+        while True:
+            pages.append([visit.pk for visit in page])
+            if not page.has_next():
+                break
+            page = self.page(querysets, parse_qs(page.next_query)['cursor'][0])
+        backwards = [[visit.pk for visit in page]]
+        while page.has_previous():
+            page = self.page(querysets, parse_qs(page.previous_query)['cursor'][0])
+            backwards.insert(0, [visit.pk for visit in page])
+        return pages, backwards
+
+    def test_pages_forward_and_back(self):
+        pages, backwards = self.walk([Visit.objects.all()])
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(backwards, pages)
+
+    def test_merges_several_querysets(self):
+        evens, odds = Visit.objects.filter(id__in=self.expected[::2]), Visit.objects.exclude(id__in=self.expected[::2])
+        pages, _ = self.walk([evens, odds])
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+
+    def test_bad_cursor_is_the_first_page(self):
+        page = self.page([Visit.objects.all()], cursor='not-a-cursor')
+        self.assertEqual([visit.pk for visit in page], self.expected[:3])
+        self.assertFalse(page.has_previous())
+
+    def test_list_view_keeps_filters_in_links(self):
+        admin = User.objects.create_user('KSADMIN', password='x', role='ADMIN')
+        LoginSession.objects.bulk_create([LoginSession(user=admin, ip_address='10.0.0.1') for _ in range(30)])
+        self.client.force_login(admin)
+        response = self.client.get(reverse('loginsession_list'), {'q': '10.0'})
+        self.assertEqual(len(response.context['sessions']), 25)
+        self.assertEqual(response.context['page_obj'].approximate_total, 30)
+        self.assertIn('q=10.0', response.context['page_obj'].next_query)
+        response = self.client.get(reverse('loginsession_list') + '?' + response.context['page_obj'].next_query)
+        self.assertEqual(len(response.context['sessions']), 5)
+        self.assertFalse(response.context['page_obj'].has_next())
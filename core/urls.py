@@ -6,5 +6,7 @@ urlpatterns = [
     path('', LandingLoginView.as_view(), name='landing'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('track/', views.track_status, name='track_status'),
+    path('profiler/', views.request_profile, name='request_profile'),
+    path('metrics', views.metrics, name='metrics'),
 
 ]
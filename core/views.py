@@ -1,6 +1,13 @@
 from django.shortcuts import render, redirect
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
 from django.utils import timezone
+from accounts import devices
+from accounts.devices import get_device
 # Import specific models if they exist, otherwise use placeholders or try-except
 try:
     # from visits.models import Token  # Legacy module removed
@@ -41,20 +48,20 @@ def dashboard(request):
     
     # Office Files Logic (Same as FileListView)
     if request.user.role == 'VO':
-         office_files_count = OfficeFile.objects.filter(
-             office=request.user.office
-         ).exclude(status='CLOSED').count()
+         my_files = OfficeFile.objects.filter(office=request.user.office)
     elif request.user.desk:
-        office_files_count = OfficeFile.objects.filter(
-            desk=request.user.desk
-        ).exclude(status='CLOSED').count()
+        my_files = OfficeFile.objects.filter(desk=request.user.desk)
     else:
-        office_files_count = 0
+        my_files = OfficeFile.objects.none()
+    office_files_count = my_files.exclude(status='CLOSED').count()
+    # Read off the (office or desk, is_overdue, due_at) index (filing.sla)
+    overdue_files_count = my_files.filter(is_overdue=True).count()
 
     kpis = {
         'visit_queue': visit_queue_count,
         'my_desk': my_desk_queue_count,
         'office_files': office_files_count,
+        'overdue_files': overdue_files_count,
         # 'tokens': 5  # Legacy placeholder
     }
 
@@ -75,17 +82,23 @@ def track_status(request):
     """
     Public View to Track Visit Token or File Status
     """
+    device = get_device(request)
+    if device is not None and not device.can(devices.TRACK):
+        raise PermissionDenied("This device may not do that.")
+
     query = request.GET.get('q', '').strip()
     result = None
     
     # Import locally to avoid circular imports if any
     from visit_regn.models import Visit
     from filing.models import OfficeFile
+    from archive.services import get_visit_by_token, visits_by_mobile
 
     if query:
         # 1. Try Searching for Visit by Token
         try:
-            visit = Visit.objects.get(token__iexact=query)
+            # Hot table first, then the archive
+            visit = get_visit_by_token(query)
             result = {
                 'type': 'Visit Token',
                 'ref': visit.token,
@@ -112,12 +125,15 @@ def track_status(request):
 
         except Visit.DoesNotExist:
             # 2. Try Searching for Office File by File Number (Handle Duplicates)
-            matching_files = OfficeFile.objects.filter(file_number__iexact=query)
+            # One query for the matches and everything shown about them
+            matching_files = list(OfficeFile.objects.filter(file_number__iexact=query).select_related(
+                'office', 'desk', 'visit__current_desk'
+            ))
             
-            if matching_files.exists():
-                count = matching_files.count()
+            if matching_files:
+                count = len(matching_files)
                 if count == 1:
-                    office_file = matching_files.first()
+                    office_file = matching_files[0]
                     result = {
                         'type': 'Office File',
                         'ref': office_file.file_number,
@@ -154,12 +170,12 @@ def track_status(request):
             
             else:
                 # 3. Try Searching for Visits by Mobile Number
-                matching_visits = Visit.objects.filter(mobile=query).order_by('-token_issue_time')
+                matching_visits = visits_by_mobile(query)
                 
-                if matching_visits.exists():
+                if matching_visits:
                     result = {
                         'type': 'Multiple Matches',
-                        'count': matching_visits.count(),
+                        'count': len(matching_visits),
                         'matches': []
                     }
                     for v in matching_visits:
@@ -191,8 +207,54 @@ def track_status(request):
     is_kiosk = request.GET.get('kiosk') == 'true'
     if not is_kiosk and request.user.is_authenticated and request.user.username.startswith('VS'):
         is_kiosk = True
+    if device is not None:
+        is_kiosk = True
         
     if is_kiosk:
         return render(request, 'track_status_kiosk.html', context)
         
-    return render(request, 'track_status.html', context)
\ No newline at end of file
+    return render(request, 'track_status.html', context)
+
+
+@login_required
+def request_profile(request):
+    """
+    Sampled request timings per URL name (core.middleware.RequestProfilerMiddleware).
+    """
+    if request.user.role != 'SUPER_ADMIN':
+        messages.error(request, "You do not have permission to access this page.")
+        return redirect('landing')
+
+    from . import profiling
+
+    if request.method == 'POST' and request.POST.get('action') == 'reset':
+        profiling.reset()
+        messages.success(request, "Profiler totals reset.")
+        return redirect('request_profile')
+
+    rows, since = profiling.summary()
+    context = {
+        'rows': rows,
+        'since': since,
+        'sample_percent': settings.PROFILER_SAMPLE_RATE * 100,
+        'slow_ms': settings.PROFILER_SLOW_MS,
+        'slow_log': settings.PROFILER_SLOW_LOG,
+    }
+    return render(request, 'core/request_profile.html', context)
+
+
+def metrics(request):
+    """
+    Prometheus text-format metrics (core/metrics.py). Needs the METRICS_TOKEN
+    bearer token, except with DEBUG or from an address in METRICS_ALLOWED_IPS.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    allowed = settings.DEBUG or request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS or (
+        token and constant_time_compare(authorization, f'Bearer {token}')
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+
+    from . import metrics as exposition
+    return HttpResponse(exposition.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,142 @@
+"""
+Worker warm-up: does the first-request work before a worker takes traffic.
+
+vista_project/wsgi.py and asgi.py call warm_up() after loading the application
+when WARM_UP_WORKERS is set. Each step is best effort: a failure is logged and
+the worker starts anyway (the first request then pays for it, as without
+warm-up).
+
+- urls: imports every URLconf and the views they name
+- templates: compiles the project's own templates into the cached loader
+- refdata: loads the reference snapshot (core.refdata)
+- routing: fills the shared routing-table / VO-desk cache for every office
+- connections: opens the database connections (WARM_UP_CONNECTIONS only)
+
+Heavy libraries used by a few routes only (qrcode, Pillow, openpyxl) are
+imported where they are used and are left for the first such request.
+
+wsgi.py may be imported by a process that forks the workers afterwards
+(`gunicorn --preload`), and forked workers must not share its database
+connections. So unless WARM_UP_CONNECTIONS is set, warm_up() closes the
+connections its steps opened, and the compiled templates and snapshot are all
+the workers inherit. Set WARM_UP_CONNECTIONS only where each worker process
+imports the application itself; with gunicorn, connect in the worker instead:
+vista_project/gunicorn_conf.py calls post_fork().
+
+ASGI servers (uvicorn) import asgi.py on their event loop, where Django refuses
+database access (and closing connections), so there warm_up() runs its steps in
+a thread of their own.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('vista.warmup')
+
+
+def load_urls():
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    return 1
+
+
+def compile_templates():
+    """Loads every .html template under BASE_DIR, so the cached loader holds it compiled."""
+    from django.template import TemplateSyntaxError, engines
+    base_dir = str(settings.BASE_DIR)
+    compiled = 0
+    for backend in engines.all():
+        for template_dir in backend.template_dirs:
+            template_dir = str(template_dir)
+            if not template_dir.startswith(base_dir):
+                continue
+            for root, _, files in os.walk(template_dir):
+                for name in files:
+                    if not name.endswith('.html'):
+                        continue
+                    path = os.path.relpath(os.path.join(root, name), template_dir).replace(os.sep, '/')
+                    try:
+                        backend.get_template(path)
+                    except TemplateSyntaxError:
+                        logger.warning("Template %s does not compile", path)
+                        continue
+                    compiled += 1
+    return compiled
+
+
+def load_refdata():
+    from .refdata import get_snapshot
+    return len(get_snapshot().offices_by_id)
+
+
+def warm_routing():
+    from routing.services import get_routing_table, get_vo_desk
+    from .refdata import get_snapshot
+    offices = list(get_snapshot().offices_by_id.values())
+    for office in offices:
+        get_routing_table(office)
+        get_vo_desk(office)
+    return len(offices)
+
+
+def open_connections():
+    for alias in connections:
+        connections[alias].ensure_connection()
+    return len(connections.all())
+
+
+STEPS = [
+    ('urls', load_urls),
+    ('templates', compile_templates),
+    ('refdata', load_refdata),
+    ('routing', warm_routing),
+    ('connections', open_connections),
+]
+
+
+def warm_up(connect=None):
+    """Runs the warm-up steps. Returns [(step, count or None on failure, seconds)]."""
+    if connect is None:
+        connect = settings.WARM_UP_CONNECTIONS
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(warm_up, connect).result()
+    results = []
+    for name, step in STEPS:
+        if name == 'connections' and not connect:
+            continue
+        started = time.perf_counter()
+        try:
+            count = step()
+        except Exception:
+            logger.warning("Warm-up step '%s' failed", name, exc_info=True)
+            count = None
+        results.append((name, count, time.perf_counter() - started))
+    if not connect:
+        connections.close_all()
+    logger.info("Worker warm-up: %s", ", ".join(
+        f"{name} {'failed' if count is None else count} ({seconds * 1000:.0f} ms)"
+        for name, count, seconds in results
+    ))
+    return results
+
+
+def post_fork(server, worker):
+    """gunicorn hook: opens the forked worker's own connections (the app was preloaded in the master)."""
+    from django.apps import apps
+    if not apps.ready:
+        # Not preloaded: the worker loads wsgi.py itself and connects on its first request
+        return
+    try:
+        open_connections()
+    except Exception:
+        logger.warning("Opening connections in worker %s failed", worker.pid, exc_info=True)
@@ -0,0 +1,23 @@
+from django.contrib import admin
+from .models import DomainEvent, EventCursor
+
+
+@admin.register(DomainEvent)
+class DomainEventAdmin(admin.ModelAdmin):
+    """The outbox is append-only: viewable, never edited."""
+    list_display = ('id', 'kind', 'office', 'visit', 'office_file', 'by_user', 'occurred_at')
+    list_filter = ('kind',)
+    list_select_related = ('office', 'visit', 'office_file', 'by_user')
+    search_fields = ('=visit__token',)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EventCursor)
+class EventCursorAdmin(admin.ModelAdmin):
+    list_display = ('name', 'position', 'updated_at')
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0002_district_office_is_headquarters_alter_office_code_and_more'),
+        ('filing', '0004_alter_officefile_interim_status'),
+        ('visit_regn', '0003_alter_visit_registration_mode'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.BigIntegerField(default=0, help_text='Id of the last event handled')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DomainEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('visit.created', 'Visit Created'), ('visit.routed', 'Visit Routed'), ('visit.attended', 'Visit Attended'), ('visit.transferred', 'Visit Transferred'), ('visit.completed', 'Visit Completed'), ('visit.cancelled', 'Visit Cancelled'), ('file.opened', 'File Opened'), ('file.linked', 'Visit Linked to File'), ('file.updated', 'File Updated'), ('file.closed', 'File Closed'), ('file.document_added', 'Document Added')], max_length=30)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('by_user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('office', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.office')),
+                ('office_file', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='filing.officefile')),
+                ('visit', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='visit_regn.visit')),
+            ],
+            options={
+                'verbose_name': 'Domain Event',
+                'verbose_name_plural': 'Domain Events',
+                'ordering': ['id'],
+            },
+        ),
+    ]
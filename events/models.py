@@ -0,0 +1,52 @@
+from django.db import models
+from django.conf import settings
+from django.utils import timezone
+from accounts.models import Office
+
+# Transactional outbox: one row per visit/file state change, inserted in the same
+# transaction as the change itself (see events.services.record_event).
+# Rows are append-only; consumers read them in id order from an EventCursor.
+# Object FKs use db_constraint=False so events outlive archived/deleted rows.
+
+class DomainEvent(models.Model):
+    class Kind(models.TextChoices):
+        VISIT_CREATED = 'visit.created', 'Visit Created'
+        VISIT_ROUTED = 'visit.routed', 'Visit Routed'
+        VISIT_ATTENDED = 'visit.attended', 'Visit Attended'
+        VISIT_TRANSFERRED = 'visit.transferred', 'Visit Transferred'
+        VISIT_COMPLETED = 'visit.completed', 'Visit Completed'
+        VISIT_CANCELLED = 'visit.cancelled', 'Visit Cancelled'
+        FILE_OPENED = 'file.opened', 'File Opened'
+        FILE_LINKED = 'file.linked', 'Visit Linked to File'
+        FILE_UPDATED = 'file.updated', 'File Updated'
+        FILE_CLOSED = 'file.closed', 'File Closed'
+        FILE_DOCUMENT_ADDED = 'file.document_added', 'Document Added'
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=30, choices=Kind.choices)
+    office = models.ForeignKey(Office, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    visit = models.ForeignKey('visit_regn.Visit', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    office_file = models.ForeignKey('filing.OfficeFile', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    by_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    payload = models.JSONField(default=dict, blank=True)
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Domain Event"
+        verbose_name_plural = "Domain Events"
+
+    def __str__(self):
+        return f"#{self.id} {self.kind}"
+
+
+class EventCursor(models.Model):
+    """Position of one named consumer in the DomainEvent stream."""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0, help_text="Id of the last event handled")
+    # Ids below position not committed yet when read: {id: first seen (epoch seconds)}
+    pending = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
@@ -0,0 +1,153 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DomainEvent, EventCursor
+
+logger = logging.getLogger('vista.events')
+
+Kind = DomainEvent.Kind
+
+
+def _build(kind, visit=None, office_file=None, office=None, by_user=None, occurred_at=None, **payload):
+    if office is None:
+        source = office_file if office_file is not None else visit
+        office_id = getattr(source, 'office_id', None)
+    else:
+        office_id = getattr(office, 'pk', office)
+    if visit is None and office_file is not None:
+        visit_id = office_file.visit_id
+    else:
+        visit_id = getattr(visit, 'pk', visit)
+    return DomainEvent(
+        kind=kind,
+        office_id=office_id,
+        visit_id=visit_id,
+        office_file_id=getattr(office_file, 'pk', office_file),
+        by_user_id=getattr(by_user, 'pk', None),
+        payload=payload,
+        occurred_at=occurred_at or timezone.now(),
+    )
+
+
+def record_event(kind, visit=None, office_file=None, office=None, by_user=None, **payload):
+    """
+    Appends one event to the outbox. Call it inside the transaction that makes the
+    state change, so the event exists if and only if the change committed.
+    visit/office_file/office accept instances or ids; office defaults to the object's office.
+    """
+    event = _build(kind, visit=visit, office_file=office_file, office=office, by_user=by_user, **payload)
+    event.save()
+    return event
+
+
+def record_events(events):
+    """
+    Bulk version of record_event for set-based changes.
+    `events` is an iterable of dicts with record_event's arguments.
+    """
+    return DomainEvent.objects.bulk_create([_build(**event) for event in events])
+
+
+def visit_payload(visit, **extra):
+    payload = {'token': visit.token, 'status': visit.status, 'desk_id': visit.current_desk_id}
+    payload.update(extra)
+    return payload
+
+
+def file_payload(office_file, **extra):
+    payload = {
+        'file_number': office_file.file_number,
+        'status': office_file.status,
+        'interim_status': office_file.interim_status,
+        'desk_id': office_file.desk_id,
+    }
+    payload.update(extra)
+    return payload
+
+
+# Consumers
+# ------------------------------------------------------------------------------
+# Ids are allocated at INSERT but transactions can commit out of order (MySQL),
+# or long after their events' occurred_at, so a gap in the sequence may be an
+# event that is still about to appear. Readers note the missing ids with the time
+# they first saw them (the consumer's `pending`) and look for them again on every
+# read: a late event is delivered when it commits. Ids still missing after
+# OUTBOX_GAP_SECONDS are taken as rolled back and forgotten.
+
+# Missing ids remembered per consumer; beyond this the oldest are given up
+MAX_PENDING = 1000
+
+
+def read_events(after=0, limit=500, kinds=None, office=None, pending=None, now=None):
+    """
+    Returns (events, cursor, pending): committed events with id > after in id
+    order, preceded by any late events among `pending`, optionally filtered by
+    kind/office; the position to resume from; and the ids still missing.
+    pending maps missing ids to when they were first seen (time.time()); pass
+    back what the previous call returned. The cursor can move past filtered-out
+    events, so always resume from it.
+    """
+    now = time.time() if now is None else now
+    gap_seconds = getattr(settings, 'OUTBOX_GAP_SECONDS', 3600)
+    office_id = getattr(office, 'pk', office)
+    pending = {int(missing): seen for missing, seen in (pending or {}).items()}
+
+    def wanted(event):
+        if kinds is not None and event.kind not in kinds:
+            return False
+        return office_id is None or event.office_id == office_id
+
+    events = []
+    if pending:
+        for event in DomainEvent.objects.filter(id__in=pending).order_by('id'):
+            del pending[event.id]
+            if wanted(event):
+                events.append(event)
+        pending = {missing: seen for missing, seen in pending.items() if now - seen < gap_seconds}
+
+    cursor = after
+    for event in DomainEvent.objects.filter(id__gt=after).order_by('id')[:limit]:
+        # A new consumer (after=0) starts at the first committed event
+        if cursor:
+            for missing in range(cursor + 1, event.id):
+                pending.setdefault(missing, now)
+        cursor = event.id
+        if wanted(event):
+            events.append(event)
+
+    if len(pending) > MAX_PENDING:
+        dropped = sorted(pending, key=lambda missing: (pending[missing], missing))[:len(pending) - MAX_PENDING]
+        logger.warning("Outbox reader gave up on %d missing event ids", len(dropped))
+        for missing in dropped:
+            del pending[missing]
+    return events, cursor, pending
+
+
+def get_cursor(name):
+    return EventCursor.objects.get_or_create(name=name)[0].position
+
+
+@transaction.atomic
+def consume(name, handler, batch_size=500, kinds=None, office=None):
+    """
+    Feeds the next batch after consumer `name`'s cursor to handler(events) and
+    advances the cursor, all in one transaction: if handler raises, the cursor
+    stays put and the batch is delivered again next time. Handlers that write to
+    the same database therefore process each event exactly once.
+    Returns the number of events handled.
+    """
+    cursor, _ = EventCursor.objects.select_for_update().get_or_create(name=name)
+    events, position, pending = read_events(cursor.position, limit=batch_size, kinds=kinds, office=office,
+                                            pending=cursor.pending)
+    if events:
+        handler(events)
+    # Stored as JSON, with string keys
+    pending = {str(missing): seen for missing, seen in pending.items()}
+    if (position, pending) != (cursor.position, cursor.pending):
+        cursor.position, cursor.pending = position, pending
+        cursor.save(update_fields=['position', 'pending', 'updated_at'])
+    return len(events)
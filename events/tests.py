@@ -0,0 +1,94 @@
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.models import Office, Desk, User
+from visit_regn.models import Visit, Purpose
+from routing.models import RoutingRule
+from routing.services import attend_visit, complete_visit, bulk_reassign_visits
+from .models import DomainEvent, EventCursor
+from .services import read_events, consume, record_event, Kind
+
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name="Test Office", code="TOFF")
+        self.desk1 = Desk.objects.create(name="Desk 1", office=self.office)
+        self.desk2 = Desk.objects.create(name="Desk 2", office=self.office)
+        self.purpose = Purpose.objects.create(name="Certificate")
+        RoutingRule.objects.create(office=self.office, purpose=self.purpose, default_desk=self.desk1)
+        self.user = User.objects.create_user(username='clerk', password='password', office=self.office, desk=self.desk1)
+
+    def register(self):
+        data = {'name': 'Visitor', 'mobile': '9876543210', 'purpose': self.purpose}
+        return Visit.create_from_kiosk(data, self.office, user=self.user, mode='KIOSK')
+
+    def test_visit_lifecycle_is_recorded_in_order(self):
+        visit = self.register()
+        attend_visit(visit, self.user)
+        complete_visit(visit, self.user, "Done")
+
+        events = list(DomainEvent.objects.filter(visit=visit))
+        self.assertEqual([e.kind for e in events], [
+            Kind.VISIT_CREATED, Kind.VISIT_ROUTED, Kind.VISIT_ATTENDED, Kind.VISIT_COMPLETED
+        ])
+        self.assertEqual(events[1].payload['desk_id'], self.desk1.id)
+        self.assertTrue(all(e.office_id == self.office.id for e in events))
+        self.assertEqual([e.id for e in events], sorted(e.id for e in events))
+
+    def test_bulk_reassign_records_one_event_per_visit(self):
+        visits = [self.register() for _ in range(3)]
+        bulk_reassign_visits(self.desk2, self.user, from_desk=self.desk1)
+        transferred = DomainEvent.objects.filter(kind=Kind.VISIT_TRANSFERRED)
+        self.assertEqual(sorted(transferred.values_list('visit_id', flat=True)), sorted(v.id for v in visits))
+
+    def test_consume_advances_cursor(self):
+        self.register()
+        self.register()
+        seen = []
+        handled = consume('display', seen.extend)
+        self.assertEqual(handled, 4)  # created + routed, twice
+        self.assertEqual(EventCursor.objects.get(name='display').position, seen[-1].id)
+
+        self.assertEqual(consume('display', seen.extend), 0)
+        self.register()
+        self.assertEqual(consume('display', seen.extend, kinds={Kind.VISIT_CREATED}), 1)
+        self.assertEqual(len(seen), 5)
+
+    def test_failed_handler_leaves_cursor(self):
+        self.register()
+
+        def boom(events):
+            raise RuntimeError("handler failed")
+
+        with self.assertRaises(RuntimeError):
+            consume('stats', boom)
+        self.assertFalse(EventCursor.objects.filter(name='stats', position__gt=0).exists())
+        self.assertEqual(consume('stats', lambda events: None), 2)
+
+    @override_settings(OUTBOX_GAP_SECONDS=3600)
+    def test_late_commit_below_the_cursor_is_delivered(self):
+        first = record_event(Kind.VISIT_CREATED, office=self.office)
+        # first.id + 1 stands for an event whose transaction is still open
+        after_gap = DomainEvent.objects.create(id=first.id + 2, kind=Kind.VISIT_ROUTED, office_id=self.office.id)
+
+        seen = []
+        self.assertEqual(consume('display', seen.extend), 2)
+        cursor = EventCursor.objects.get(name='display')
+        self.assertEqual((cursor.position, list(cursor.pending)), (after_gap.id, [str(first.id + 1)]))
+
+        # It commits much later, with a business timestamp from long before
+        late = DomainEvent.objects.create(id=first.id + 1, kind=Kind.VISIT_ATTENDED, office_id=self.office.id,
+                                          occurred_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(consume('display', seen.extend), 1)
+        self.assertEqual(seen[-1], late)
+        self.assertEqual(EventCursor.objects.get(name='display').pending, {})
+
+    @override_settings(OUTBOX_GAP_SECONDS=3600)
+    def test_gap_is_given_up_after_the_window(self):
+        first = record_event(Kind.VISIT_CREATED, office=self.office)
+        after_gap = DomainEvent.objects.create(id=first.id + 2, kind=Kind.VISIT_ROUTED, office_id=self.office.id)
+        events, cursor, pending = read_events(first.id, now=1000.0)
+        self.assertEqual(([e.id for e in events], cursor, pending), ([after_gap.id], after_gap.id, {first.id + 1: 1000.0}))
+
+        self.assertEqual(read_events(cursor, pending=pending, now=1000.0 + 3599)[2], pending)
+        self.assertEqual(read_events(cursor, pending=pending, now=1000.0 + 3600), ([], cursor, {}))
@@ -1,3 +1,63 @@
-from django.contrib import admin
+import zipfile
 
-# Register your models here.
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from core.changelist import FastChangelistMixin
+from . import register_import
+from .forms import RegisterImportForm
+from .models import OfficeFile
+
+# Row errors shown on the import page
+MAX_ERRORS_SHOWN = 200
+
+
+@admin.register(OfficeFile)
+class OfficeFileAdmin(FastChangelistMixin, admin.ModelAdmin):
+    list_display = ('file_number', 'office', 'applicant_name', 'status', 'desk', 'created_at')
+    list_select_related = ('office', 'desk')
+    list_filter = ('office', 'status')
+    prefix_search_fields = ('file_number',)
+    search_help_text = "File number, from the start."
+    raw_id_fields = ('visit',)
+    change_list_template = 'admin/filing/officefile/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_register_view), name='filing_officefile_import'),
+        ] + super().get_urls()
+
+    def import_register_view(self, request):
+        """Upload an old file register (filing.register_import)."""
+        from openpyxl.utils.exceptions import InvalidFileException
+
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = RegisterImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == 'POST' and form.is_valid():
+            try:
+                result = register_import.import_register(
+                    form.cleaned_data['workbook'], form.cleaned_data['office'],
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+            except register_import.RowError as e:
+                form.add_error('workbook', str(e))
+            except (InvalidFileException, zipfile.BadZipFile, OSError):
+                form.add_error('workbook', "This is not an Excel (.xlsx) workbook.")
+            else:
+                prefix = "Dry run, would import " if form.cleaned_data['dry_run'] else "Imported "
+                level = messages.WARNING if result.errors else messages.SUCCESS
+                self.message_user(request, prefix + str(result), level)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Import file register",
+            'form': form,
+            'result': result,
+            'errors': result.errors[:MAX_ERRORS_SHOWN] if result else [],
+        }
+        return TemplateResponse(request, 'admin/filing/officefile/import_register.html', context)
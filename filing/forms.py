@@ -1,4 +1,5 @@
 from django import forms
+from accounts.models import Office
 from .models import OfficeFile, DocumentSubmission
 
 class OfficeFileForm(forms.ModelForm):
@@ -29,3 +30,8 @@ class DocumentSubmissionForm(forms.ModelForm):
         widgets = {
             'papers_submitted': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'List the papers submitted...'}),
         }
+
+class RegisterImportForm(forms.Form):
+    office = forms.ModelChoiceField(queryset=Office.objects.order_by('name'))
+    workbook = forms.FileField(help_text="Excel (.xlsx) file register, column names in the first row.")
+    dry_run = forms.BooleanField(required=False, help_text="Check the rows and report errors without importing.")
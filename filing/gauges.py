@@ -0,0 +1,65 @@
+"""
+Open office files per office and creation day (OpenFileGauge), maintained as
+files open and close instead of counted: OfficeFile.save() calls file_changed().
+Overdue files per office (OverdueFileGauge) move with the is_overdue flag,
+in filing.sla. `manage.py rebuild_gauges` recounts both after imports.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core.db import add_to_counters
+from . import sla
+from .models import OfficeFile, OpenFileGauge, OverdueFileGauge
+
+
+def is_open(status):
+    return status != 'CLOSED'
+
+
+def file_changed(office_file, was_open):
+    now_open = is_open(office_file.status)
+    if now_open == was_open or office_file.office_id is None:
+        return
+    add_to_counters(
+        OpenFileGauge,
+        {'office_id': office_file.office_id, 'opened_on': timezone.localtime(office_file.created_at).date()},
+        open_files=1 if now_open else -1,
+    )
+
+
+@transaction.atomic
+def rebuild(office=None):
+    """Recounts every office's open and overdue files. Returns the number of open file rows written."""
+    files = OfficeFile.objects.exclude(status='CLOSED').filter(office__isnull=False)
+    rows = OpenFileGauge.objects.all()
+    overdue_rows = OverdueFileGauge.objects.all()
+    if office is not None:
+        files = files.filter(office=office)
+        rows = rows.filter(office=office)
+        overdue_rows = overdue_rows.filter(office=office)
+
+    overdue = files.filter(is_overdue=True).values('office_id').annotate(count=Count('id')).order_by()
+    overdue_rows.delete()
+    OverdueFileGauge.objects.bulk_create(
+        OverdueFileGauge(office_id=row['office_id'], overdue_files=row['count']) for row in overdue
+    )
+
+    totals = {}
+    for office_id, created_at in files.values_list('office_id', 'created_at').iterator():
+        key = (office_id, timezone.localtime(created_at).date())
+        totals[key] = totals.get(key, 0) + 1
+
+    rows.delete()
+    OpenFileGauge.objects.bulk_create(
+        OpenFileGauge(office_id=office_id, opened_on=day, open_files=count)
+        for (office_id, day), count in totals.items()
+    )
+    return len(totals)
+
+
+def open_and_overdue():
+    """{office_id: (open files, overdue files)} from the gauge rows."""
+    rows = OpenFileGauge.objects.values('office_id').annotate(open=Sum('open_files')).order_by()
+    overdue = sla.overdue_by_office()
+    return {row['office_id']: (row['open'], overdue.get(row['office_id'], 0)) for row in rows}
@@ -0,0 +1,87 @@
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from filing import register_import
+
+SUBJECTS = ('Mutation', 'Income Certificate', 'Possession Certificate', 'Land Tax', 'Encroachment')
+STATUSES = ('Pending', 'Closed', 'Disposed', '')
+
+
+class Command(BaseCommand):
+    help = (
+        "Import throughput of filing/register_import.py: writes a synthetic file register "
+        "workbook and imports it into a scratch database: a temporary SQLite file with the "
+        "SQLite settings (PYTHONANYWHERE_DOMAIN set), the test database (test_<NAME>) on MySQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--batch-size', type=int, default=register_import.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='vista-bench-')
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+        connection.close()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            from accounts.models import Office, Desk
+            from filing.models import OfficeFile, DocumentSubmission
+
+            office = Office.objects.create(name='Bench Office', code='BENCH')
+            for name in ('Desk 1', 'Desk 2', 'Village Officer'):
+                Desk.objects.create(name=name, office=office)
+
+            self.stdout.write(f"Database: {connection.vendor} {connection.settings_dict['NAME']}")
+            path = os.path.join(workdir, 'register.xlsx')
+            started = time.perf_counter()
+            self.write_workbook(path, options['rows'])
+            self.stdout.write(
+                f"Wrote {options['rows']} rows ({os.path.getsize(path) / 1e6:.1f} MB) "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+
+            dry = register_import.import_register(path, office, batch_size=options['batch_size'], dry_run=True)
+            self.stdout.write(f"Read + validate only: {dry}")
+            result = register_import.import_register(path, office, batch_size=options['batch_size'])
+            self.stdout.write(f"Import: {result}")
+            self.stdout.write(
+                f"In the database: {OfficeFile.objects.count()} files, "
+                f"{DocumentSubmission.objects.count()} document submissions"
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def write_workbook(self, path, rows):
+        from openpyxl import Workbook
+        rng = random.Random(42)
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Register')
+        sheet.append(['Sl No', 'File No', 'Date', 'Applicant', 'Subject', 'Desk', 'Status',
+                      'Reply Type', 'Remarks', 'Papers Submitted'])
+        start = datetime.date(2012, 1, 1)
+        serials = {}
+        for i in range(rows):
+            day = start + datetime.timedelta(days=i * 4000 // rows)
+            serials[day.year] = serials.get(day.year, 0) + 1
+            sheet.append([
+                i + 1,
+                f"{serials[day.year]}/{day.year}",
+                day,
+                f"Applicant {i}",
+                rng.choice(SUBJECTS),
+                rng.choice(('Desk 1', 'Desk 2', '')),
+                rng.choice(STATUSES),
+                rng.choice(('Certificate', 'Report', '')),
+                'Old register' if i % 3 == 0 else None,
+                'Application, ID copy' if i % 2 == 0 else None,
+            ])
+        workbook.save(path)
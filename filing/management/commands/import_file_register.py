@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Office
+from filing import register_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports an office's old file register from an Excel workbook into OfficeFile, keeping the "
+        "original file numbers (filing/register_import.py lists the accepted column names). Rows "
+        "with errors are skipped and listed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('workbook', help="Path to the .xlsx register.")
+        parser.add_argument('--office', required=True, help="Office code the files belong to.")
+        parser.add_argument('--sheet', help="Worksheet name (default: the first sheet).")
+        parser.add_argument('--batch-size', type=int, default=register_import.BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; write nothing.")
+        parser.add_argument('--show-errors', type=int, default=20, help="Row errors to list (0 for all).")
+
+    def handle(self, *args, **options):
+        office = Office.objects.filter(code=options['office']).first()
+        if not office:
+            raise CommandError(f"Office '{options['office']}' not found")
+        if not os.path.isfile(options['workbook']):
+            raise CommandError(f"No such file: {options['workbook']}")
+
+        try:
+            result = register_import.import_register(
+                options['workbook'], office, sheet=options['sheet'],
+                batch_size=options['batch_size'], dry_run=options['dry_run'],
+            )
+        except register_import.RowError as e:
+            raise CommandError(str(e))
+        except KeyError:
+            raise CommandError(f"No sheet '{options['sheet']}' in the workbook")
+
+        shown = result.errors if not options['show_errors'] else result.errors[:options['show_errors']]
+        for row_number, message in shown:
+            self.stderr.write(f"Row {row_number}: {message}")
+        if len(shown) < len(result.errors):
+            self.stderr.write(f"... and {len(result.errors) - len(shown)} more")
+        prefix = "Dry run, would import " if options['dry_run'] else "Imported "
+        self.stdout.write(self.style.SUCCESS(prefix + str(result)))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Office
+from filing import sla
+
+
+class Command(BaseCommand):
+    help = (
+        "Flags office files that fell due since the last run (filing.sla). "
+        "Schedule nightly (cron / PythonAnywhere scheduled task)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--office', help="Office code to limit the sweep to.")
+        parser.add_argument(
+            '--recompute', action='store_true',
+            help="Work out every file's due date again first: after changing FILE_SLA_DAYS "
+                 "or editing files outside the application.",
+        )
+
+    def handle(self, *args, **options):
+        office = None
+        if options['office']:
+            office = Office.objects.filter(code=options['office']).first()
+            if not office:
+                raise CommandError(f"Office '{options['office']}' not found")
+
+        if options['recompute']:
+            changed = sla.recompute(office=office)
+            self.stdout.write(f"Due dates recomputed: {changed} file(s) changed")
+        result = sla.sweep(office=office)
+        self.stdout.write(self.style.SUCCESS(
+            f"Overdue files: {result['flagged']} newly overdue, {result['cleared']} no longer overdue."
+        ))
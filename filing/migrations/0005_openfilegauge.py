@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def count_open_files(apps, schema_editor):
+    OfficeFile = apps.get_model('filing', 'OfficeFile')
+    OpenFileGauge = apps.get_model('filing', 'OpenFileGauge')
+    totals = {}
+    files = OfficeFile.objects.exclude(status='CLOSED').filter(office__isnull=False)
+    for office_id, created_at in files.values_list('office_id', 'created_at').iterator():
+        key = (office_id, timezone.localtime(created_at).date())
+        totals[key] = totals.get(key, 0) + 1
+    OpenFileGauge.objects.bulk_create(
+        OpenFileGauge(office_id=office_id, opened_on=day, open_files=count)
+        for (office_id, day), count in totals.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_district_office_is_headquarters_alter_office_code_and_more'),
+        ('filing', '0004_alter_officefile_interim_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenFileGauge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opened_on', models.DateField()),
+                ('open_files', models.IntegerField(default=0)),
+                ('office', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='open_file_gauges', to='accounts.office')),
+            ],
+            options={
+                'unique_together': {('office', 'opened_on')},
+            },
+        ),
+        migrations.RunPython(count_open_files, migrations.RunPython.noop),
+    ]
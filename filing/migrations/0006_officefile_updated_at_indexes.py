@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filing', '0005_openfilegauge'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='officefile',
+            index=models.Index(fields=['office', 'updated_at'], name='filing_offi_office__d85ac3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='officefile',
+            index=models.Index(fields=['desk', 'updated_at'], name='filing_offi_desk_id_7d8447_idx'),
+        ),
+    ]
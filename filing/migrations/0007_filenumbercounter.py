@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_loginsession_login_time_index'),
+        ('filing', '0006_officefile_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('last_serial', models.PositiveIntegerField(default=0)),
+                ('office', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='file_number_counters', to='accounts.office')),
+            ],
+            options={
+                'unique_together': {('office', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filing', '0007_filenumbercounter'),
+        ('visit_regn', '0004_visit_token_mobile_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='officefile',
+            name='applicant_name',
+            field=models.CharField(blank=True, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='officefile',
+            name='subject',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='documentsubmission',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='officefile',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='officefile',
+            name='visit',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='office_file', to='visit_regn.visit'),
+        ),
+    ]
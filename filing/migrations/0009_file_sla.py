@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:45
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_due_dates(apps, schema_editor):
+    from filing.sla import due_date
+    OfficeFile = apps.get_model('filing', 'OfficeFile')
+    now = timezone.now()
+    files = []
+    for office_file in OfficeFile.objects.exclude(status='CLOSED').iterator():
+        office_file.due_at = due_date(office_file.status, office_file.created_at, office_file.interim_status,
+                                      office_file.reply_type)
+        office_file.is_overdue = office_file.due_at <= now
+        files.append(office_file)
+    OfficeFile.objects.bulk_update(files, ['due_at', 'is_overdue'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_loginsession_login_time_index'),
+        ('filing', '0008_legacy_register_fields'),
+        ('visit_regn', '0004_visit_token_mobile_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='officefile',
+            name='due_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='officefile',
+            name='is_overdue',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='officefile',
+            index=models.Index(fields=['is_overdue', 'due_at'], name='filing_offi_is_over_0013e1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='officefile',
+            index=models.Index(fields=['office', 'is_overdue', 'due_at'], name='filing_offi_office__25a084_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='officefile',
+            index=models.Index(fields=['desk', 'is_overdue', 'due_at'], name='filing_offi_desk_id_83a026_idx'),
+        ),
+        migrations.RunPython(set_due_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_overdue_files(apps, schema_editor):
+    OfficeFile = apps.get_model('filing', 'OfficeFile')
+    OverdueFileGauge = apps.get_model('filing', 'OverdueFileGauge')
+    rows = OfficeFile.objects.filter(is_overdue=True, office__isnull=False).values('office_id').annotate(
+        count=Count('id')).order_by()
+    OverdueFileGauge.objects.bulk_create(
+        OverdueFileGauge(office_id=row['office_id'], overdue_files=row['count']) for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_loginsession_login_time_index'),
+        ('filing', '0009_file_sla'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueFileGauge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('overdue_files', models.IntegerField(default=0)),
+                ('office', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='overdue_file_gauge', to='accounts.office')),
+            ],
+        ),
+        migrations.RunPython(count_overdue_files, migrations.RunPython.noop),
+    ]
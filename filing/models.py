@@ -2,7 +2,8 @@ from django.db import models
 from visit_regn.models import Visit
 from accounts.models import Desk, User, Office
 from django.utils import timezone
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from core.db import serialized_write
 
 class OfficeFile(models.Model):
     STATUS_CHOICES = [
@@ -19,7 +20,8 @@ class OfficeFile(models.Model):
         ('Closed', 'Closed'),
     ]
 
-    visit = models.OneToOneField(Visit, on_delete=models.CASCADE, related_name='office_file')
+    # Empty for files imported from the old registers (filing.register_import)
+    visit = models.OneToOneField(Visit, on_delete=models.CASCADE, related_name='office_file', null=True, blank=True)
     office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name='office_files', null=True, blank=True)
     
     file_number = models.CharField(max_length=50, blank=True, help_text="Auto-generated File Number (Serial/Year)")
@@ -61,49 +63,148 @@ class OfficeFile(models.Model):
     remarks2 = models.CharField(max_length=255, blank=True, null=True)
     remarks3 = models.CharField(max_length=255, blank=True, null=True)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Applicant and subject as written in an imported register (files opened here take them from the visit)
+    applicant_name = models.CharField(max_length=150, blank=True)
+    subject = models.CharField(max_length=255, blank=True)
+
+    # A default rather than auto_now_add, so imported files keep their opening date
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Target time (filing.sla): when an open file is due, and whether that has passed
+    due_at = models.DateTimeField(null=True, blank=True, editable=False)
+    is_overdue = models.BooleanField(default=False, editable=False)
+
     class Meta:
         unique_together = ('office', 'year', 'serial_number')
+        indexes = [
+            # FileListView pages by (-updated_at, -id) within an office or desk
+            models.Index(fields=['office', 'updated_at']),
+            models.Index(fields=['desk', 'updated_at']),
+            # Overdue files by due date: the nightly sweep and aging report, per office and desk
+            models.Index(fields=['is_overdue', 'due_at']),
+            models.Index(fields=['office', 'is_overdue', 'due_at']),
+            models.Index(fields=['desk', 'is_overdue', 'due_at']),
+        ]
+
+    # Open file gauges (filing.gauges): remember the status loaded from the database
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
 
+    # Atomic so that serialized_write can retry the whole save on a locked SQLite database
+    @serialized_write
+    @transaction.atomic
     def save(self, *args, **kwargs):
+        from . import sla
+        adding = self._state.adding
+        loaded_status = None if adding else getattr(self, '_loaded_status', None)
+        sla.apply(self)
+        overdue_change = 0 if adding else sla.store_flag(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'due_at', 'is_overdue'}
+        self._save(*args, **kwargs)
+        self._loaded_status = self.status
+        sla.count_overdue({self.office_id: int(self.is_overdue) if adding else overdue_change})
+        if adding or loaded_status is not None:  # unknown when status was deferred
+            from . import gauges
+            gauges.file_changed(self, was_open=not adding and gauges.is_open(loaded_status))
+
+    def _save(self, *args, **kwargs):
         if not self.office and self.visit:
              self.office = self.visit.office
              
-        if not self.file_number:
-            now = timezone.localtime()
-            current_year = now.year
-            
-            with transaction.atomic():
-                # Lock the table or just filter carefully. 
-                # Ideally selection for update to avoid race conditions but for low volume this is okay?
-                # Let's use select_for_update on a queryset if possible, but finding "last" is safer.
-                
-                # Check for existing highest serial for this office & year
-                last_file = OfficeFile.objects.filter(
-                    office=self.office, 
-                    year=current_year
-                ).order_by('serial_number').last()
-                
-                next_serial = (last_file.serial_number + 1) if last_file and last_file.serial_number else 1
-                
-                self.year = current_year
-                self.serial_number = next_serial
-                self.file_number = f"{self.serial_number}/{self.year}"
-                
-                super().save(*args, **kwargs)
-        else:
+        if self.file_number:
             super().save(*args, **kwargs)
+            return
+
+        # Next serial from the office's counter, not from the last file (filing.numbering)
+        from . import numbering
+        self.year = numbering.current_year()
+        for attempt in range(1, numbering.MAX_ATTEMPTS + 1):
+            self.serial_number = numbering.reserve(self.office, self.year)
+            self.file_number = numbering.format_file_number(self.serial_number, self.year)
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                taken = OfficeFile.objects.filter(
+                    office=self.office, year=self.year, serial_number=self.serial_number
+                ).exists()
+                self.file_number = ''
+                if not taken or attempt == numbering.MAX_ATTEMPTS:
+                    raise
+                # Numbered outside the counter (e.g. imported): skip past those files
+                numbering.resync(self.office, self.year)
+
+    @property
+    def days_overdue(self):
+        if not self.is_overdue:
+            return 0
+        return (timezone.now() - self.due_at).days
+
+    @property
+    def applicant(self):
+        return (self.visit.name if self.visit else None) or self.applicant_name
+
+    @property
+    def subject_name(self):
+        return self.visit.purpose.name if self.visit else self.subject
 
     def __str__(self):
+        if self.visit is None:
+            return f"File {self.file_number}"
         return f"File {self.file_number} (Visit: {self.visit.token})"
 
 class DocumentSubmission(models.Model):
     office_file = models.ForeignKey(OfficeFile, on_delete=models.CASCADE, related_name='document_submissions')
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(default=timezone.now, editable=False)
     papers_submitted = models.TextField(help_text="Details of papers/documents submitted")
     submitted_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
 
     def __str__(self):
         return f"Docs for {self.office_file.file_number} at {self.submitted_at}"
+
+class OpenFileGauge(models.Model):
+    """
+    Open (not closed) files per office and creation day, kept up to date as files
+    open and close (filing.gauges) so /metrics reads it instead of counting files.
+    """
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name='open_file_gauges')
+    opened_on = models.DateField()
+    open_files = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('office', 'opened_on')
+
+    def __str__(self):
+        return f"{self.office_id} - {self.opened_on}"
+
+class OverdueFileGauge(models.Model):
+    """
+    Overdue files per office, moved as filing.sla flags and clears files so
+    /metrics reads it instead of counting the flags.
+    """
+    office = models.OneToOneField(Office, on_delete=models.CASCADE, related_name='overdue_file_gauge')
+    overdue_files = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.office_id}: {self.overdue_files}"
+
+class FileNumberCounter(models.Model):
+    """
+    Last file serial handed out per office and year (filing.numbering).
+    Created on first use, starting after the highest serial already on file.
+    """
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name='file_number_counters')
+    year = models.PositiveIntegerField()
+    last_serial = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('office', 'year')
+
+    def __str__(self):
+        return f"{self.office_id} - {self.year}: {self.last_serial}"
@@ -0,0 +1,68 @@
+"""
+File numbers ("<serial>/<year>", serials counted per office and year).
+
+reserve() moves the office's FileNumberCounter forward with a single UPDATE
+(last_serial = last_serial + n), so two clerks opening files at the same
+moment get different serials instead of both reading the same "last file"
+and colliding on unique (office, year, serial_number). The counter row stays
+locked until the caller's transaction ends. Bulk imports reserve a whole
+block of serials at once.
+
+Serials written some other way (files imported with their own numbers) can
+leave the counter behind the files: OfficeFile.save() then gets an
+IntegrityError, calls resync() and tries the next serial (MAX_ATTEMPTS).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import FileNumberCounter, OfficeFile
+
+MAX_ATTEMPTS = 5
+
+
+def current_year():
+    return timezone.localtime().year
+
+
+def format_file_number(serial, year):
+    return f"{serial}/{year}"
+
+
+def _highest_serial(office, year):
+    return OfficeFile.objects.filter(office=office, year=year).aggregate(top=Max('serial_number'))['top'] or 0
+
+
+@transaction.atomic
+def reserve(office, year=None, count=1):
+    """Reserves `count` consecutive serials for the office's year. Returns the first."""
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    year = year or current_year()
+    counter = FileNumberCounter.objects.filter(office=office, year=year)
+    if not counter.update(last_serial=F('last_serial') + count):
+        try:
+            # First file of the year (or first since counters were introduced)
+            with transaction.atomic():
+                FileNumberCounter.objects.create(
+                    office=office, year=year, last_serial=_highest_serial(office, year) + count,
+                )
+        except IntegrityError:
+            # Another writer created the counter first
+            counter.update(last_serial=F('last_serial') + count)
+    return counter.values_list('last_serial', flat=True).get() - count + 1
+
+
+def reserve_block(office, count, year=None):
+    """range of `count` serials for a bulk import."""
+    first = reserve(office, year, count)
+    return range(first, first + count)
+
+
+@transaction.atomic
+def resync(office, year=None):
+    """Moves the counter past the highest serial on file (never back). Returns the counter value."""
+    year = year or current_year()
+    highest = _highest_serial(office, year)
+    FileNumberCounter.objects.filter(office=office, year=year, last_serial__lt=highest).update(last_serial=highest)
+    return FileNumberCounter.objects.filter(office=office, year=year).values_list('last_serial', flat=True).first()
@@ -0,0 +1,329 @@
+"""
+Import of the old office file registers (Excel) into OfficeFile, so that file
+number search and the reference-number auto-link in FileCreateView find old
+files too.
+
+The workbook is streamed (openpyxl read-only mode). The first row names the
+columns (HEADERS lists the accepted names, in any order and case; only a file
+number, or a date for unnumbered files, is required). Rows are validated and
+normalized BATCH_SIZE at a time, and each batch is written with bulk_create:
+its files, then their DocumentSubmissions ("papers submitted" column).
+
+- File numbers ("123/2019", or serial and year columns) are kept as written.
+  A number already on file, or twice in the workbook, is a row error.
+- Rows without a number get the next serials of their year from the office's
+  counter (filing.numbering.reserve_block).
+- Imported files have no visit: the applicant and subject are stored on the
+  file, and created_at is the register date (1 January of the file's year if
+  there is none).
+
+Rows with errors are skipped and reported with their row number; the other
+rows are imported. bulk_create skips OfficeFile.save(), so the due dates
+(filing.sla) are set here, and afterwards the counters are moved past the
+imported serials and the open file gauges are recounted.
+"""
+import datetime
+import re
+import time
+from collections import defaultdict
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.refdata import get_snapshot
+from . import gauges, numbering, sla
+from .models import OfficeFile, DocumentSubmission
+
+BATCH_SIZE = 2000
+
+HEADERS = {
+    'file_number': ('file number', 'file no', 'file'),
+    'serial_number': ('serial', 'serial no', 'serial number', 'sl no'),
+    'year': ('year',),
+    'opened_on': ('date', 'opened on', 'date opened', 'date of receipt', 'received on'),
+    'applicant_name': ('applicant', 'applicant name', 'name'),
+    'subject': ('subject', 'purpose'),
+    'desk': ('desk', 'seat', 'section'),
+    'status': ('status',),
+    'interim_status': ('interim status', 'stage'),
+    'reply_to': ('reply to',),
+    'reply_date': ('reply date',),
+    'reply_type': ('reply type',),
+    'despatch_mode': ('despatch mode', 'dispatch mode'),
+    'despatch_id': ('despatch id', 'despatch no', 'memo no'),
+    'remarks': ('remarks',),
+    'papers_submitted': ('papers submitted', 'documents', 'papers'),
+}
+DATE_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y-%m-%d', '%d/%m/%y')
+CLOSED_WORDS = {'closed', 'close', 'disposed'}
+OPEN_WORDS = {'', 'open', 'pending'}
+FILE_NUMBER = re.compile(r'(\d+)\s*/\s*(\d{4})')
+FIRST_YEAR = 1950
+
+
+class RowError(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []  # [(row number, message)]
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"{self.created} file(s) from {self.rows} row(s) in {self.seconds:.1f}s "
+                f"({self.rows_per_second:.0f} rows/s), {len(self.errors)} row(s) with errors")
+
+
+def _header_key(value):
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', str(value or '').lower()).split())
+
+
+def map_columns(header):
+    """{field: column index} for a header row."""
+    aliases = {alias: field for field, names in HEADERS.items() for alias in names}
+    columns = {}
+    for index, value in enumerate(header):
+        field = aliases.get(_header_key(value))
+        if field and field not in columns:
+            columns[field] = index
+    if 'file_number' not in columns and not {'serial_number', 'year'} <= set(columns) and 'opened_on' not in columns:
+        raise RowError("No file number column (or serial and year, or date) in the first row")
+    return columns
+
+
+def _text(value, max_length=None):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = ' '.join(str(value).split())
+    return text[:max_length] if max_length else text
+
+
+def _int(value, label):
+    text = _text(value)
+    if not text:
+        return None
+    try:
+        return int(float(text))
+    except ValueError:
+        raise RowError(f"{label} '{text}' is not a number")
+
+
+def _date(value, label):
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    text = _text(value)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise RowError(f"{label} '{text}' is not a date")
+
+
+def _choice(value, choices, label, other=None):
+    """The choice matching value (any case), None if empty; unknown values are `other`, or an error without one."""
+    text = _text(value)
+    if not text:
+        return None
+    for code, _ in choices:
+        if code.lower() == text.lower():
+            return code
+    if other is not None:
+        return other
+    raise RowError(f"Unknown {label} '{text}'")
+
+
+class RegisterImport:
+    def __init__(self, office, batch_size=BATCH_SIZE, dry_run=False):
+        self.office = office
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.desks = {desk.name.lower(): desk.pk for desk in get_snapshot().desks_for(office.pk).values()}
+        self.this_year = timezone.localdate().year
+        self.tz = timezone.get_current_timezone()
+        self.seen = set()
+        self.years = set()
+        self.result = ImportResult()
+
+    def normalize(self, values, columns):
+        """Field values for OfficeFile (plus 'papers_submitted') from one row. Raises RowError."""
+        def cell(field):
+            index = columns.get(field)
+            return values[index] if index is not None and index < len(values) else None
+
+        serial = year = None
+        number = _text(cell('file_number'))
+        if number:
+            match = FILE_NUMBER.search(number)
+            if not match:
+                raise RowError(f"File number '{number}' is not <serial>/<year>")
+            serial, year = int(match.group(1)), int(match.group(2))
+        elif cell('serial_number') is not None or cell('year') is not None:
+            serial, year = _int(cell('serial_number'), "Serial"), _int(cell('year'), "Year")
+            if serial is None or year is None:
+                raise RowError("Serial and year must both be given")
+
+        opened_on = _date(cell('opened_on'), "Date")
+        if year is None:
+            if opened_on is None:
+                raise RowError("No file number and no date")
+            year = opened_on.year
+        if not FIRST_YEAR <= year <= self.this_year + 1:
+            raise RowError(f"Year {year} is out of range")
+        if serial is not None:
+            if serial < 1:
+                raise RowError(f"Serial {serial} must be positive")
+            if (year, serial) in self.seen:
+                raise RowError(f"File {serial}/{year} appears twice in the register")
+
+        status_word = _text(cell('status')).lower()
+        if status_word in CLOSED_WORDS:
+            status = 'CLOSED'
+        elif status_word in OPEN_WORDS:
+            status = 'OPEN'
+        else:
+            raise RowError(f"Unknown status '{status_word}'")
+
+        desk_name = _text(cell('desk'))
+        desk_id = self.desks.get(desk_name.lower())
+        if desk_name and desk_id is None:
+            raise RowError(f"No desk '{desk_name}' in {self.office.code}")
+
+        opened = opened_on or datetime.date(year, 1, 1)
+        return {
+            'year': year,
+            'serial_number': serial,
+            'created_at': datetime.datetime.combine(opened, datetime.time.min, self.tz),
+            'applicant_name': _text(cell('applicant_name'), 150),
+            'subject': _text(cell('subject'), 255),
+            'desk_id': desk_id,
+            'status': status,
+            'interim_status': (_choice(cell('interim_status'), OfficeFile.INTERIM_STATUS_CHOICES, "interim status")
+                               or ('Closed' if status == 'CLOSED' else 'Processing')),
+            'reply_to': _text(cell('reply_to'), 255) or None,
+            'reply_date': _date(cell('reply_date'), "Reply date"),
+            'reply_type': _choice(cell('reply_type'), OfficeFile.REPLY_TYPE_CHOICES, "reply type", other='Other'),
+            'despatch_mode': _choice(cell('despatch_mode'), OfficeFile.DESPATCH_MODE_CHOICES, "despatch mode",
+                                     other='Other'),
+            'despatch_id': _text(cell('despatch_id'), 100) or None,
+            'remarks1': _text(cell('remarks'), 255) or None,
+            'papers_submitted': _text(cell('papers_submitted')),
+        }
+
+    def run(self, source, sheet=None):
+        from openpyxl import load_workbook
+        started = time.perf_counter()
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+            # Some writers store a wrong sheet size, which read-only mode would trust
+            worksheet.reset_dimensions()
+            rows = worksheet.iter_rows(values_only=True)
+            columns = map_columns(next(rows, ()))
+            batch = []
+            for row_number, values in enumerate(rows, start=2):
+                if not any(value not in (None, '') for value in values):
+                    continue
+                self.result.rows += 1
+                try:
+                    data = self.normalize(values, columns)
+                except RowError as e:
+                    self.result.errors.append((row_number, str(e)))
+                    continue
+                if data['serial_number'] is not None:
+                    self.seen.add((data['year'], data['serial_number']))
+                batch.append((row_number, data))
+                if len(batch) >= self.batch_size:
+                    self.write(batch)
+                    batch = []
+            if batch:
+                self.write(batch)
+        finally:
+            workbook.close()
+
+        if not self.dry_run and self.result.created:
+            for year in self.years:
+                numbering.resync(self.office, year)
+            gauges.rebuild(self.office)
+        self.result.seconds = time.perf_counter() - started
+        return self.result
+
+    def write(self, batch):
+        years = {data['year'] for _, data in batch if data['serial_number'] is not None}
+        serials = {data['serial_number'] for _, data in batch if data['serial_number'] is not None}
+        on_file = set(OfficeFile.objects.filter(
+            office=self.office, year__in=years, serial_number__in=serials,
+        ).values_list('year', 'serial_number')) if serials else set()
+
+        numbered, unnumbered = [], defaultdict(list)
+        for row_number, data in batch:
+            key = (data['year'], data['serial_number'])
+            if key in on_file:
+                self.result.errors.append((row_number, f"File {key[1]}/{key[0]} is already on file"))
+            elif data['serial_number'] is None:
+                unnumbered[data['year']].append(data)
+            else:
+                numbered.append(data)
+        if self.dry_run:
+            self.result.created += len(numbered) + sum(map(len, unnumbered.values()))
+            return
+
+        with transaction.atomic():
+            self.create(numbered)
+            rows = []
+            for year, datas in unnumbered.items():
+                # After the numbered files, so the counter is moved past them first
+                numbering.resync(self.office, year)
+                for data, serial in zip(datas, numbering.reserve_block(self.office, len(datas), year)):
+                    data['serial_number'] = serial
+                rows.extend(datas)
+            self.create(rows)
+        self.years.update(data['year'] for data in numbered)
+        self.result.created += len(numbered) + len(rows)
+
+    def create(self, rows):
+        if not rows:
+            return
+        now = timezone.now()
+        files = []
+        for data in rows:
+            fields = {key: value for key, value in data.items() if key != 'papers_submitted'}
+            fields['file_number'] = numbering.format_file_number(fields['serial_number'], fields['year'])
+            office_file = OfficeFile(office=self.office, **fields)
+            sla.apply(office_file, now)
+            files.append(office_file)
+        OfficeFile.objects.bulk_create(files)
+
+        papers = [(office_file, data) for office_file, data in zip(files, rows) if data['papers_submitted']]
+        if not papers:
+            return
+        if not connections[OfficeFile.objects.db].features.can_return_rows_from_bulk_insert:
+            # MySQL does not hand the new ids back
+            ids = dict(((year, serial), pk) for pk, year, serial in OfficeFile.objects.filter(
+                office=self.office, file_number__in=[f.file_number for f, _ in papers],
+            ).values_list('pk', 'year', 'serial_number'))
+            for office_file, _ in papers:
+                office_file.pk = ids[(office_file.year, office_file.serial_number)]
+        DocumentSubmission.objects.bulk_create([
+            DocumentSubmission(office_file=office_file, papers_submitted=data['papers_submitted'],
+                               submitted_at=office_file.created_at)
+            for office_file, data in papers
+        ])
+
+
+def import_register(source, office, sheet=None, batch_size=BATCH_SIZE, dry_run=False):
+    """Imports a register workbook (path or file object) into the office's files. Returns an ImportResult."""
+    return RegisterImport(office, batch_size=batch_size, dry_run=dry_run).run(source, sheet)
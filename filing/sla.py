@@ -0,0 +1,169 @@
+"""
+Target times (SLA) for office files.
+
+Every open file carries due_at, its opening time plus the target for its
+interim status and reply type (TARGETS, extended by settings.FILE_SLA_DAYS),
+and is_overdue, set once due_at has passed. OfficeFile.save() sets both. The
+nightly `manage.py sweep_file_sla` flags the files that fell due since with
+an UPDATE per office over the (office, is_overdue, due_at) index, so the
+aging report, the dashboard counters and the desk overdue lists filter on the
+flag instead of working out every file's age. Closed files have no due date. Every change of
+the flag also moves the office's OverdueFileGauge row (count_overdue), which
+/metrics reads.
+
+Run `sweep_file_sla --recompute` after changing the targets, or after changing
+files with queryset.update() / bulk_create() (filing.register_import sets the
+fields itself).
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from core.db import add_to_counters
+from .models import OfficeFile, OverdueFileGauge
+
+DEFAULT_DAYS = 30
+
+# (interim status, reply type): days from opening; None matches any. The most
+# specific entry wins, an interim status before a reply type.
+TARGETS = {
+    ('Site Visit Required', None): 45,
+    ('Addl Documents Awaited', None): 60,
+    ('Payment Pending', None): 45,
+    ('Sent for external verification report', None): 90,
+    (None, 'Certificate'): 15,
+}
+
+# Days past due for the breach distribution: (label, from, to or None)
+BREACH_BUCKETS = (
+    ('Up to 7 days', 0, 7),
+    ('8 to 30 days', 8, 30),
+    ('31 to 90 days', 31, 90),
+    ('Over 90 days', 91, None),
+)
+
+
+def targets():
+    return {**TARGETS, **getattr(settings, 'FILE_SLA_DAYS', {})}
+
+
+def target_days(interim_status, reply_type):
+    table = targets()
+    for key in ((interim_status, reply_type), (interim_status, None), (None, reply_type)):
+        if key in table:
+            return table[key]
+    return DEFAULT_DAYS
+
+
+def due_date(status, created_at, interim_status, reply_type):
+    """When a file with these values is due, None for a closed one."""
+    if status == 'CLOSED' or created_at is None:
+        return None
+    return created_at + datetime.timedelta(days=target_days(interim_status, reply_type))
+
+
+def apply(office_file, now=None):
+    """Sets due_at and is_overdue on an (unsaved) file; returns True if either changed."""
+    due_at = due_date(office_file.status, office_file.created_at, office_file.interim_status,
+                      office_file.reply_type)
+    is_overdue = due_at is not None and due_at <= (now or timezone.now())
+    changed = (due_at, is_overdue) != (office_file.due_at, office_file.is_overdue)
+    office_file.due_at, office_file.is_overdue = due_at, is_overdue
+    return changed
+
+
+def count_overdue(deltas):
+    """Adds {office_id: change in overdue files} to the offices' gauge rows."""
+    for office_id, delta in deltas.items():
+        if office_id is not None:
+            add_to_counters(OverdueFileGauge, {'office_id': office_id}, overdue_files=delta)
+
+
+def store_flag(office_file):
+    """
+    Writes a saved file's new is_overdue ahead of its save; returns the change
+    in overdue files (-1, 0 or 1). Against the stored flag, not the instance's:
+    a sweep may have run since the instance was loaded.
+    """
+    return OfficeFile.objects.filter(pk=office_file.pk, is_overdue=not office_file.is_overdue).update(
+        is_overdue=office_file.is_overdue) * (1 if office_file.is_overdue else -1)
+
+
+def _update_by_office(files, sign, **values):
+    """files.update(**values) one office at a time; returns {office_id: sign * rows updated}."""
+    offices = files.values_list('office_id', flat=True).distinct().order_by()
+    return {office_id: sign * files.filter(office_id=office_id).update(**values) for office_id in list(offices)}
+
+
+def sweep(now=None, office=None):
+    """Flags the files that fell due (and unflags any whose due date moved). Returns {'flagged', 'cleared'}."""
+    now = now or timezone.now()
+    files = OfficeFile.objects.all()
+    if office is not None:
+        files = files.filter(office=office)
+    with transaction.atomic():
+        flagged = _update_by_office(files.filter(is_overdue=False, due_at__lte=now), 1, is_overdue=True)
+        cleared = _update_by_office(files.filter(Q(due_at__gt=now) | Q(due_at__isnull=True), is_overdue=True), -1,
+                                    is_overdue=False)
+        count_overdue(flagged)
+        count_overdue(cleared)
+    return {'flagged': sum(flagged.values()), 'cleared': -sum(cleared.values())}
+
+
+def recompute(office=None, now=None, batch_size=1000):
+    """Works out every file's due date again (new targets, bulk edits). Returns the number of files changed."""
+    now = now or timezone.now()
+    files = OfficeFile.objects.all()
+    if office is not None:
+        files = files.filter(office=office)
+    with transaction.atomic():
+        closed = files.filter(status='CLOSED')
+        deltas = _update_by_office(closed.filter(is_overdue=True), -1, due_at=None, is_overdue=False)
+        changed = -sum(deltas.values()) + closed.exclude(due_at__isnull=True).update(due_at=None)
+        stale = []
+        open_files = files.exclude(status='CLOSED').only(
+            'office_id', 'status', 'created_at', 'interim_status', 'reply_type', 'due_at', 'is_overdue')
+        for office_file in open_files.iterator(chunk_size=batch_size):
+            was_overdue = office_file.is_overdue
+            if apply(office_file, now):
+                stale.append(office_file)
+                deltas[office_file.office_id] = (
+                    deltas.get(office_file.office_id, 0) + office_file.is_overdue - was_overdue)
+        OfficeFile.objects.bulk_update(stale, ['due_at', 'is_overdue'], batch_size=batch_size)
+        count_overdue(deltas)
+    return changed + len(stale)
+
+
+def overdue_by_office():
+    """{office_id: overdue files}, from the gauge rows."""
+    return dict(OverdueFileGauge.objects.values_list('office_id', 'overdue_files'))
+
+
+def breach_distribution(files, now=None):
+    """
+    Overdue files among `files`: counts by days past due (BREACH_BUCKETS),
+    and by interim status and desk with the oldest due date of each.
+    """
+    now = now or timezone.now()
+    overdue = files.filter(is_overdue=True)
+
+    def past_due(low, high):
+        query = Q(due_at__lte=now - datetime.timedelta(days=low))
+        if high is not None:
+            query &= Q(due_at__gt=now - datetime.timedelta(days=high + 1))
+        return query
+
+    counts = overdue.aggregate(total=Count('id'), **{
+        f'bucket{i}': Count('id', filter=past_due(low, high)) for i, (_, low, high) in enumerate(BREACH_BUCKETS)
+    })
+    return {
+        'total': counts['total'],
+        'buckets': [(label, counts[f'bucket{i}']) for i, (label, _, _) in enumerate(BREACH_BUCKETS)],
+        'by_status': list(overdue.values('interim_status').annotate(
+            count=Count('id'), oldest=Min('due_at')).order_by('-count', 'interim_status')),
+        'by_desk': list(overdue.values('desk_id').annotate(
+            count=Count('id'), oldest=Min('due_at')).order_by('-count', 'desk_id')),
+    }
@@ -1,3 +1,257 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+import time
+import unittest
+from io import StringIO
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from accounts.models import Office, Desk, User
+from routing.models import RoutingRule
+from visit_regn.models import Visit, Purpose
+from . import gauges, numbering, register_import, sla
+from .models import OfficeFile, FileNumberCounter, OpenFileGauge
+from .views import search_office_file
+
+
+def make_visits(count, code='FIL1'):
+    office = Office.objects.create(name='Filing Office', code=code)
+    desk = Desk.objects.create(name='Desk 1', office=office)
+    purpose = Purpose.objects.create(name='Income Certificate')
+    RoutingRule.objects.create(office=office, purpose=purpose, default_desk=desk)
+    visits = [Visit.create_from_kiosk({'name': f'V{i}', 'purpose': purpose}, office) for i in range(count)]
+    return office, visits
+
+
+class FileNumberingTest(TestCase):
+    def setUp(self):
+        self.office, self.visits = make_visits(4)
+        self.year = numbering.current_year()
+
+    def test_serials_follow_the_counter(self):
+        files = [OfficeFile.objects.create(visit=visit, office=self.office) for visit in self.visits[:2]]
+        self.assertEqual([f.file_number for f in files], [f"1/{self.year}", f"2/{self.year}"])
+        self.assertEqual(FileNumberCounter.objects.get(office=self.office, year=self.year).last_serial, 2)
+
+    def test_counter_starts_after_existing_files(self):
+        OfficeFile.objects.create(visit=self.visits[0], office=self.office,
+                                  file_number=f"7/{self.year}", year=self.year, serial_number=7)
+        self.assertEqual(OfficeFile.objects.create(visit=self.visits[1], office=self.office).serial_number, 8)
+
+    def test_block_reservation(self):
+        OfficeFile.objects.create(visit=self.visits[0], office=self.office)
+        self.assertEqual(list(numbering.reserve_block(self.office, 3)), [2, 3, 4])
+        self.assertEqual(OfficeFile.objects.create(visit=self.visits[1], office=self.office).serial_number, 5)
+
+    def test_skips_serials_numbered_outside_the_counter(self):
+        OfficeFile.objects.create(visit=self.visits[0], office=self.office)
+        # Imported with their own numbers, behind the counter's back
+        for visit, serial in ((self.visits[1], 2), (self.visits[2], 3)):
+            OfficeFile.objects.create(visit=visit, office=self.office,
+                                      file_number=f"{serial}/{self.year}", year=self.year, serial_number=serial)
+        office_file = OfficeFile.objects.create(visit=self.visits[3], office=self.office)
+        self.assertEqual(office_file.file_number, f"4/{self.year}")
+
+    def test_serials_not_yet_filed_are_not_handed_out_again(self):
+        # Two clerks take a serial before either file row is written
+        first = numbering.reserve(self.office, self.year)
+        second = numbering.reserve(self.office, self.year)
+        self.assertEqual((first, second), (1, 2))
+
+
+@unittest.skipIf(connection.vendor == 'sqlite',
+                 "SQLite runs one write transaction at a time (BEGIN IMMEDIATE), so clerks never overlap")
+class ConcurrentFileNumberingTest(TransactionTestCase):
+    """
+    Clerks opening files at the same moment, each holding its transaction open
+    for a while after taking a serial (as OfficeFile.save() does until the file
+    row is written). Calls numbering.reserve() directly, outside serialized_write,
+    so only the database orders them.
+    """
+    THREADS = 8
+
+    def test_concurrent_reservations_get_distinct_serials(self):
+        office = Office.objects.create(name='Filing Office', code='FIL2')
+        barrier = threading.Barrier(self.THREADS)
+        serials, errors = [], []
+
+        def open_file():
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    serials.append(numbering.reserve(office))
+                    time.sleep(0.05)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=open_file) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(serials), list(range(1, self.THREADS + 1)))
+
+
+def register_workbook(rows, header=None):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Register')
+    sheet.append(header or ['Sl No', 'File No', 'Date', 'Applicant', 'Subject', 'Desk', 'Status', 'Papers Submitted'])
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class RegisterImportTest(TestCase):
+    def setUp(self):
+        self.office, self.visits = make_visits(1, code='REG1')
+        self.year = numbering.current_year()
+        self.day = datetime.date(2019, 3, 4)
+
+    def test_import_keeps_numbers_and_reports_row_errors(self):
+        OfficeFile.objects.create(visit=self.visits[0], office=self.office)  # 1/<this year>
+        workbook = register_workbook([
+            [1, '12/2019', self.day, 'Ravi K', 'Mutation', 'Desk 1', 'Pending', 'Sale deed copy'],
+            [2, '13/2019', '05/03/2019', 'Sita', 'Income', '', 'Closed', None],
+            [3, '14 / 2019', None, 'Anil', None, None, None, None],
+            [4, 'twelve', self.day, 'Bad number', None, None, None, None],
+            [5, '12/2019', self.day, 'Twice', None, None, None, None],
+            [6, '15/2019', self.day, 'Unknown desk', None, 'Desk 9', None, None],
+            [7, f'1/{self.year}', None, 'Already on file', None, None, None, None],
+            [8, f'2/{self.year}', None, 'This year', None, None, None, None],
+            [None, None, None, None, None, None, None, None],
+        ])
+        result = register_import.import_register(workbook, self.office, batch_size=2)
+
+        self.assertEqual((result.rows, result.created), (8, 4))
+        self.assertEqual([row for row, _ in result.errors], [5, 6, 7, 8])
+        self.assertIn("appears twice", result.errors[1][1])
+        self.assertIn("already on file", result.errors[3][1])
+
+        ravi = search_office_file('12/2019', office=self.office)
+        self.assertEqual((ravi.serial_number, ravi.year, ravi.applicant, ravi.subject_name), (12, 2019, 'Ravi K', 'Mutation'))
+        self.assertEqual(timezone.localtime(ravi.created_at).date(), self.day)
+        self.assertEqual(ravi.desk.name, 'Desk 1')
+        self.assertIsNone(ravi.visit)
+        self.assertEqual(ravi.document_submissions.get().papers_submitted, 'Sale deed copy')
+        # Open files from the old register are long past due; closed ones have no due date
+        self.assertTrue(ravi.is_overdue)
+        self.assertEqual(OfficeFile.objects.get(file_number='13/2019').status, 'CLOSED')
+        self.assertIsNone(OfficeFile.objects.get(file_number='13/2019').due_at)
+        self.assertEqual(timezone.localtime(OfficeFile.objects.get(file_number='14/2019').created_at).date(),
+                         datetime.date(2019, 1, 1))
+        # Counters and gauges catch up with the imported files
+        self.assertEqual(numbering.reserve(self.office, self.year), 3)
+        self.assertEqual(sum(OpenFileGauge.objects.filter(office=self.office).values_list('open_files', flat=True)), 4)
+
+    def test_unnumbered_rows_take_the_next_serials(self):
+        workbook = register_workbook([
+            ['30/2019', self.day, 'A'],
+            [None, self.day, 'B'],
+            [None, self.day, 'C'],
+        ], header=['File Number', 'Date of receipt', 'Name'])
+        result = register_import.import_register(workbook, self.office)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(dict(OfficeFile.objects.filter(office=self.office).values_list('applicant_name', 'serial_number')),
+                         {'A': 30, 'B': 31, 'C': 32})
+
+    def test_dry_run_and_admin_upload(self):
+        self.client.force_login(User.objects.create_superuser('REGROOT', password='x'))
+        url = reverse('admin:filing_officefile_import')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        def upload(dry_run):
+            workbook = SimpleUploadedFile('register.xlsx', register_workbook([[1, '7/2018', self.day, 'X']]).read())
+            return self.client.post(url, {'office': self.office.pk, 'workbook': workbook, 'dry_run': dry_run})
+
+        response = upload(dry_run=True)
+        self.assertEqual(response.context['result'].created, 1)
+        self.assertFalse(OfficeFile.objects.exists())
+        upload(dry_run=False)
+        self.assertTrue(OfficeFile.objects.filter(file_number='7/2018').exists())
+
+        not_excel = SimpleUploadedFile('register.xlsx', b'not a workbook')
+        response = self.client.post(url, {'office': self.office.pk, 'workbook': not_excel})
+        self.assertFormError(response.context['form'], 'workbook', "This is not an Excel (.xlsx) workbook.")
+
+
+class FileSLATest(TestCase):
+    def setUp(self):
+        self.office, self.visits = make_visits(4, code='SLA1')
+        self.desk = Desk.objects.get(office=self.office)
+
+    def open_file(self, visit, days_ago, **fields):
+        office_file = OfficeFile.objects.create(visit=visit, office=self.office, desk=self.desk, **fields)
+        OfficeFile.objects.filter(pk=office_file.pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=days_ago))
+        return office_file
+
+    def test_due_date_follows_status_and_closing(self):
+        office_file = OfficeFile.objects.create(visit=self.visits[0], office=self.office)
+        self.assertEqual(office_file.due_at, office_file.created_at + datetime.timedelta(days=sla.DEFAULT_DAYS))
+        self.assertFalse(office_file.is_overdue)
+
+        office_file.interim_status = 'Sent for external verification report'
+        office_file.save(update_fields=['interim_status'])
+        office_file.refresh_from_db()
+        self.assertEqual(office_file.due_at, office_file.created_at + datetime.timedelta(days=90))
+
+        with self.settings(FILE_SLA_DAYS={(None, 'Certificate'): 5}):
+            office_file.interim_status, office_file.reply_type = 'Processing', 'Certificate'
+            office_file.save()
+        self.assertEqual(office_file.due_at, office_file.created_at + datetime.timedelta(days=5))
+
+        office_file.status = 'CLOSED'
+        office_file.save()
+        office_file.refresh_from_db()
+        self.assertEqual((office_file.due_at, office_file.is_overdue), (None, False))
+
+    def test_sweep_flags_files_that_fell_due(self):
+        old = self.open_file(self.visits[0], days_ago=40)
+        waiting = self.open_file(self.visits[1], days_ago=40, interim_status='Addl Documents Awaited')
+        self.open_file(self.visits[2], days_ago=5)
+        call_command('sweep_file_sla', '--recompute', stdout=StringIO())
+        self.assertEqual(list(OfficeFile.objects.filter(is_overdue=True)), [old])
+
+        # Nightly: only the flag changes, from the stored due dates
+        self.assertEqual(sla.sweep(now=timezone.now() + datetime.timedelta(days=21)), {'flagged': 1, 'cleared': 0})
+        self.assertTrue(OfficeFile.objects.get(pk=waiting.pk).is_overdue)
+        self.assertEqual(sla.overdue_by_office(), {self.office.pk: 2})
+
+        # The gauge row follows saves too, and matches a recount
+        old.status = 'CLOSED'
+        old.save()
+        self.assertEqual(sla.overdue_by_office(), {self.office.pk: 1})
+        gauges.rebuild()
+        self.assertEqual(sla.overdue_by_office(), {self.office.pk: 1})
+
+    def test_overdue_reports(self):
+        for visit, days_ago in zip(self.visits, (35, 45, 200, 10)):
+            self.open_file(visit, days_ago)
+        sla.recompute()
+
+        distribution = sla.breach_distribution(OfficeFile.objects.all())
+        self.assertEqual(distribution['total'], 3)
+        self.assertEqual([count for _, count in distribution['buckets']], [1, 1, 0, 1])
+        self.assertEqual(distribution['by_desk'][0]['count'], 3)
+
+        self.client.force_login(User.objects.create_user('SLACLERK', password='x', role='CLERK',
+                                                         office=self.office, desk=self.desk))
+        response = self.client.get(reverse('mis:aging_report'))
+        self.assertEqual([f.days_overdue for f in response.context['object_list']], [170, 15, 5])
+        response = self.client.get(reverse('filing:file_list'), {'overdue': '1'})
+        self.assertEqual(len(response.context['files']), 3)
+        self.assertContains(self.client.get(reverse('mis:sla_report')), 'Over 90 days')
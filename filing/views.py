@@ -4,12 +4,15 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.utils import timezone
 from django.views.generic import ListView
+from django.db import transaction
 from django.db.models import Q
 from django.http import JsonResponse
 from .models import OfficeFile, DocumentSubmission
 from .forms import OfficeFileForm, DocumentSubmissionForm
 from visit_regn.models import Visit
 from routing.models import DeskQueue
+from events.services import record_event, file_payload, Kind as EventKind
+from core.pagination import KeysetPaginationMixin
 
 def search_office_file(ref_number, office=None):
     """Helper to find file by File Number or Token, optionally scoped to office."""
@@ -66,26 +69,45 @@ class CheckFileStatusView(View):
             })
         return JsonResponse({'found': False})
 
-class FileListView(LoginRequiredMixin, ListView):
+class FileListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     template_name = 'filing/file_list.html'
     context_object_name = 'files'
+    paginate_by = 25
+
+    @property
+    def overdue_only(self):
+        return self.request.GET.get('overdue') == '1'
+
+    @property
+    def keyset_ordering(self):
+        # Overdue files most overdue first, on the (desk or office, is_overdue, due_at) index
+        return ('due_at', 'id') if self.overdue_only else ('-updated_at', '-id')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['overdue_only'] = self.overdue_only
+        return context
 
     def get_queryset(self):
         user = self.request.user
-        
+        # The list shows each file's applicant and purpose
+        files = OfficeFile.objects.select_related('visit__purpose')
+        if self.overdue_only:
+            files = files.filter(is_overdue=True)
+
         # 1. VO (Manager) sees ALL pending files in their office
         if user.role == 'VO':
-             return OfficeFile.objects.filter(
+             return files.filter(
                  office=user.office
-             ).exclude(status='CLOSED').order_by('-updated_at')
+             ).exclude(status='CLOSED')
 
         # 2. Other Staff see files assigned to their desk
         if not user.desk:
             return OfficeFile.objects.none()
             
-        return OfficeFile.objects.filter(
+        return files.filter(
             desk=user.desk
-        ).exclude(status='CLOSED').order_by('-updated_at')
+        ).exclude(status='CLOSED')
 
 
 class FileCreateView(LoginRequiredMixin, View):
@@ -118,7 +140,10 @@ class FileCreateView(LoginRequiredMixin, View):
                 else:
                     # OPEN -> Auto Link
                     visit.related_office_file = linked_file
-                    visit.save()
+                    with transaction.atomic():
+                        visit.save()
+                        record_event(EventKind.FILE_LINKED, visit=visit, office_file=linked_file,
+                                     by_user=request.user, **file_payload(linked_file))
                     messages.success(request, f"Automatically linked to existing File {linked_file.file_number}")
                     return redirect('filing:file_detail', file_id=linked_file.id)
 
@@ -128,7 +153,10 @@ class FileCreateView(LoginRequiredMixin, View):
             desk=request.user.desk,
             status='OPEN' # Default
         )
-        office_file.save()
+        with transaction.atomic():
+            office_file.save()
+            record_event(EventKind.FILE_OPENED, office_file=office_file, by_user=request.user,
+                         **file_payload(office_file))
         messages.success(request, f"File {office_file.file_number} created automatically.")
         return redirect('filing:file_detail', file_id=office_file.id)
 
@@ -153,9 +181,15 @@ class FileDetailView(LoginRequiredMixin, View):
         office_file = get_object_or_404(OfficeFile, pk=file_id)
         
         if 'update_file' in request.POST:
+            old_status = office_file.status
             file_form = OfficeFileForm(request.POST, instance=office_file)
             if file_form.is_valid():
-                file_form.save()
+                with transaction.atomic():
+                    file_form.save()
+                    closed = old_status != 'CLOSED' and office_file.status == 'CLOSED'
+                    record_event(EventKind.FILE_CLOSED if closed else EventKind.FILE_UPDATED,
+                                 office_file=office_file, by_user=request.user,
+                                 **file_payload(office_file, previous_status=old_status))
                 messages.success(request, "File details updated.")
                 
                 if request.POST.get('action') == 'close':
@@ -169,7 +203,10 @@ class FileDetailView(LoginRequiredMixin, View):
                 doc = doc_form.save(commit=False)
                 doc.office_file = office_file
                 doc.submitted_by = request.user
-                doc.save()
+                with transaction.atomic():
+                    doc.save()
+                    record_event(EventKind.FILE_DOCUMENT_ADDED, office_file=office_file, by_user=request.user,
+                                 **file_payload(office_file, document_id=doc.id))
                 messages.success(request, "Document added.")
                 return redirect('filing:file_detail', file_id=file_id)
 
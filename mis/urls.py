@@ -8,5 +8,6 @@ urlpatterns = [
     path('daily/', views.DailyReportView.as_view(), name='daily_report'),
     path('files/', views.FileStatusReportView.as_view(), name='file_report'),
     path('analysis/aging/', views.AgingAnalysisView.as_view(), name='aging_report'),
+    path('analysis/sla/', views.SLABreachView.as_view(), name='sla_report'),
     path('analysis/service/', views.ServiceAnalysisView.as_view(), name='service_report'),
 ]
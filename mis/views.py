@@ -6,12 +6,20 @@ from django.db.models import Count, Avg, F, Q
 from django.http import HttpResponse
 import csv
 import datetime
+from functools import cached_property
+from itertools import chain
 
 # Import models
-from visit_regn.models import Visit
+from visit_regn.models import Visit, Purpose
 from filing.models import OfficeFile
+from filing import sla
 from accounts.models import User, Desk
 from routing.models import DeskQueue
+from archive.models import ArchivedVisit
+from archive.services import visit_range_querysets
+from core.pagination import KeysetPaginationMixin
+from core.refdata import get_snapshot
+from routing import queue_depth
 
 class MISDashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'mis/dashboard.html'
@@ -40,6 +48,9 @@ class MISDashboardView(LoginRequiredMixin, TemplateView):
             status='OPEN'
         ).count()
 
+        # KPI 3.1: Files past their due date (filing.sla)
+        context['overdue_files'] = OfficeFile.objects.filter(is_overdue=True).count()
+
         # KPI 3.5: Closed Office Files
         context['closed_files'] = OfficeFile.objects.filter(
             status='CLOSED'
@@ -71,13 +82,52 @@ class MISDashboardView(LoginRequiredMixin, TemplateView):
         context['chart_labels'] = [item['purpose__name'] for item in purpose_data]
         context['chart_data'] = [item['count'] for item in purpose_data]
 
+        context.update(self.get_queue_depth(today))
         return context
 
-class BaseReportView(LoginRequiredMixin, ListView):
+    def get_queue_depth(self, today):
+        """Queue depth chart: waiting tokens per desk and the oldest wait, minute by minute."""
+        snapshot = get_snapshot()
+        user = self.request.user
+        office = snapshot.office(user.office_id) if user.office_id else None
+        if office is None:
+            office = snapshot.office_by_code(self.request.GET.get('office', '')) or snapshot.first_office()
+        try:
+            day = datetime.date.fromisoformat(self.request.GET.get('depth_date', ''))
+        except ValueError:
+            day = today
+
+        chart = None
+        first, desks = queue_depth.day_series(office, day) if office else (None, {})
+        if desks:
+            length = len(next(iter(desks.values()))['waiting'])
+            oldest = []
+            for minute in range(length):
+                waits = [series['oldest_wait'][minute] for series in desks.values()
+                         if series['oldest_wait'][minute] is not None]
+                oldest.append(round(max(waits) / 60, 1) if waits else None)
+            chart = {
+                'labels': [f"{m // 60:02d}:{m % 60:02d}" for m in range(first, first + length)],
+                'datasets': [
+                    {'label': getattr(snapshot.desk(desk_id), 'name', str(desk_id)), 'data': series['waiting']}
+                    for desk_id, series in desks.items()
+                    if any(series['waiting']) or any(series['in_progress'])
+                ],
+                'oldest': oldest,
+            }
+        return {
+            'depth_office': office,
+            'depth_offices': None if user.office_id else list(snapshot.offices_by_id.values()),
+            'depth_date': day,
+            'depth_chart': chart,
+        }
+
+class BaseReportView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     Base view for reports with date filtering and export.
     """
     paginate_by = 50
+    keyset_approximate_total = True
     
     def get_filter_dates(self):
         from_date = self.request.GET.get('from_date')
@@ -110,9 +160,12 @@ class BaseReportView(LoginRequiredMixin, ListView):
     def render_to_response(self, context, **response_kwargs):
         # Handle Export
         if 'export' in self.request.GET:
-            return self.export_csv(self.get_queryset())
+            return self.export_csv(self.get_export_queryset())
         return super().render_to_response(context, **response_kwargs)
 
+    def get_export_queryset(self):
+        return self.get_queryset()
+
     def export_csv(self, queryset):
         response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="{self.report_title}_{timezone.now().date()}.csv"'
@@ -130,30 +183,34 @@ class DailyReportView(BaseReportView):
     template_name = 'mis/report_list_final.html'
     report_title = "Daily Visit Report"
     export_headers = ['Token', 'Visitor Name', 'Purpose', 'Status', 'Issued At', 'Attended At']
-    
-    def get_queryset(self):
+    keyset_ordering = ('-token_issue_time', '-id')
+
+    @cached_property
+    def range_querysets(self):
         from_date, to_date = self.get_filter_dates()
         
         # Convert to timezone-aware datetime range to avoid __date lookup issues
         start_datetime = timezone.make_aware(datetime.datetime.combine(from_date, datetime.time.min))
         end_datetime = timezone.make_aware(datetime.datetime.combine(to_date, datetime.time.max))
         
-        qs = Visit.objects.filter(
-            token_issue_time__range=(start_datetime, end_datetime)
-        ).select_related('purpose', 'office').order_by('-token_issue_time')
+        # Reads through to the archive when the range reaches archived days
+        return visit_range_querysets(
+            start_datetime, end_datetime,
+            search=self.request.GET.get('search'),
+            status=self.request.GET.get('status')
+        )
 
-        
-        # Search
-        search = self.request.GET.get('search')
-        if search:
-            qs = qs.filter(Q(name__icontains=search) | Q(token__icontains=search))
-            
-        # Status Filter
-        status = self.request.GET.get('status')
-        if status:
-            qs = qs.filter(status=status)
-            
-        return qs
+    def get_queryset(self):
+        return self.range_querysets[0]
+
+    def get_keyset_querysets(self, queryset):
+        # Archived visits (same keys: archived rows keep their ids) are paged alongside
+        hot, cold = self.range_querysets
+        return [hot] if cold is None else [hot, cold]
+
+    def get_export_queryset(self):
+        hot, cold = self.range_querysets
+        return hot if cold is None else chain(hot, cold)
         
     def get_export_row(self, visit):
         return [
@@ -177,6 +234,7 @@ class FileStatusReportView(BaseReportView):
     template_name = 'mis/report_list_final.html'
     report_title = "File Status Report"
     export_headers = ['File Number', 'Applicant', 'Interim Status', 'Final Status', 'Desk']
+    keyset_ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         qs = OfficeFile.objects.all().select_related('visit', 'desk').order_by('-created_at')
@@ -186,7 +244,8 @@ class FileStatusReportView(BaseReportView):
         if search:
             qs = qs.filter(
                 Q(file_number__icontains=search) | 
-                Q(visit__name__icontains=search)
+                Q(visit__name__icontains=search) |
+                Q(applicant_name__icontains=search)
             )
             
         # Status Filter (Final Status)
@@ -199,7 +258,7 @@ class FileStatusReportView(BaseReportView):
     def get_export_row(self, file):
         return [
             file.file_number,
-            file.visit.name if file.visit else 'N/A',
+            file.applicant or 'N/A',
             file.get_interim_status_display(),
             file.get_status_display(),
             file.desk.name if file.desk else 'Unassigned'
@@ -216,48 +275,84 @@ class FileStatusReportView(BaseReportView):
 class AgingAnalysisView(BaseReportView):
     model = OfficeFile
     template_name = 'mis/report_list_final.html'
-    report_title = "Aging Analysis (> 30 Days)"
-    export_headers = ['File Number', 'Days Pending', 'Status', 'Desk']
+    report_title = "Aging Analysis (Overdue Files)"
+    export_headers = ['File Number', 'Due On', 'Days Overdue', 'Status', 'Desk']
+    # Most overdue first, straight off the (is_overdue, due_at) index
+    keyset_ordering = ('due_at', 'id')
 
     def get_queryset(self):
-        # Files older than 30 days and NOT closed
-        threshold_date = timezone.now() - datetime.timedelta(days=30)
-        
-        qs = OfficeFile.objects.filter(
-            created_at__lte=threshold_date
-        ).exclude(status='CLOSED').order_by('created_at')
-        
-        return qs
+        # Open files past their due date (filing.sla)
+        return OfficeFile.objects.filter(is_overdue=True).select_related('desk').order_by('due_at')
 
     def get_export_row(self, file):
-        days = (timezone.now().date() - file.created_at.date()).days
         return [
             file.file_number,
-            f"{days} days",
+            timezone.localtime(file.due_at).date(),
+            f"{file.days_overdue} days",
             file.interim_status,
             file.desk.name if file.desk else '-'
         ]
         
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['columns'] = ['File Number', 'Created At', 'Days Pending', 'Status', 'Desk']
+        context['columns'] = ['File Number', 'Created At', 'Due On', 'Days Overdue', 'Status', 'Desk']
         context['row_template'] = 'mis/partials/row_aging.html'
         # No date filter needed for this specific logic usually, but base class has it.
         # We can ignore it or use it to filter 'created_at' further.
         return context
 
+class SLABreachView(LoginRequiredMixin, TemplateView):
+    """How far past their due dates the overdue files are, by interim status and desk."""
+    template_name = 'mis/sla_breaches.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        distribution = sla.breach_distribution(OfficeFile.objects.all())
+        snapshot = get_snapshot()
+        for row in distribution['by_desk']:
+            desk = snapshot.desk(row['desk_id']) if row['desk_id'] else None
+            row['desk_name'] = desk.name if desk else None
+        context['distribution'] = distribution
+        context['chart_labels'] = [label for label, _ in distribution['buckets']]
+        context['chart_data'] = [count for _, count in distribution['buckets']]
+        return context
+
 class ServiceAnalysisView(LoginRequiredMixin, TemplateView):
     template_name = 'mis/service_analysis.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Aggregate visits by Purpose
-        analysis = Visit.objects.values('purpose__name').annotate(
-            total=Count('id'),
-            completed=Count('id', filter=Q(status='COMPLETED')),
-            avg_wait=Avg(F('token_attend_time') - F('token_issue_time'))
-        ).order_by('-total')
+        # Aggregate visits by Purpose, over hot and archived visits
+        def by_purpose(model):
+            return model.objects.values('purpose_id').annotate(
+                total=Count('id'),
+                completed=Count('id', filter=Q(status='COMPLETED')),
+                attended=Count('token_attend_time'),
+                avg_wait=Avg(F('token_attend_time') - F('token_issue_time'))
+            ).order_by()
+
+        merged = {}
+        for row in chain(by_purpose(Visit), by_purpose(ArchivedVisit)):
+            entry = merged.setdefault(row['purpose_id'], {'total': 0, 'completed': 0, 'attended': 0, 'wait_total': datetime.timedelta()})
+            entry['total'] += row['total']
+            entry['completed'] += row['completed']
+            if row['avg_wait']:
+                # Weighted so the merged average matches a single Avg() over both tables
+                entry['attended'] += row['attended']
+                entry['wait_total'] += row['avg_wait'] * row['attended']
+
+        names = dict(Purpose.objects.filter(id__in=merged).values_list('id', 'name'))
+        analysis = [
+            {
+                'purpose__name': names.get(purpose_id),
+                'total': entry['total'],
+                'completed': entry['completed'],
+                'avg_wait': entry['wait_total'] / entry['attended'] if entry['attended'] else None,
+            }
+            for purpose_id, entry in merged.items()
+        ]
+        analysis.sort(key=lambda row: row['total'], reverse=True)
         
         context['analysis_data'] = analysis
         return context
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import RoutingRule, DeskQueue
+
+from core.changelist import FastChangelistMixin
+from .models import RoutingRule, DeskQueue, DailyQueueSummary, QueueGauge, QueueDepthDay
 
 @admin.register(RoutingRule)
 class RoutingRuleAdmin(admin.ModelAdmin):
@@ -7,7 +9,30 @@ class RoutingRuleAdmin(admin.ModelAdmin):
     list_filter = ('office',)
 
 @admin.register(DeskQueue)
-class DeskQueueAdmin(admin.ModelAdmin):
+class DeskQueueAdmin(FastChangelistMixin, admin.ModelAdmin):
     list_display = ('visit', 'desk', 'assigned_at', 'is_active')
+    list_select_related = ('visit', 'desk')
     list_filter = ('desk__office', 'desk', 'is_active')
-    search_fields = ('visit__token',)
+    prefix_search_fields = ('visit__token',)
+    search_help_text = "Token, from the start."
+
+@admin.register(DailyQueueSummary)
+class DailyQueueSummaryAdmin(admin.ModelAdmin):
+    list_display = ('office', 'date', 'tokens_issued', 'completed', 'cancelled', 'auto_cancelled', 'avg_wait_seconds')
+    list_filter = ('office',)
+    date_hierarchy = 'date'
+
+@admin.register(QueueGauge)
+class QueueGaugeAdmin(admin.ModelAdmin):
+    list_display = ('office', 'desk', 'date', 'waiting', 'attended', 'wait_seconds')
+    list_filter = ('office',)
+    list_select_related = ('office', 'desk')
+    date_hierarchy = 'date'
+
+@admin.register(QueueDepthDay)
+class QueueDepthDayAdmin(admin.ModelAdmin):
+    list_display = ('office', 'date')
+    list_filter = ('office',)
+    date_hierarchy = 'date'
+    fields = ('office', 'date', 'desk_ids')
+    readonly_fields = fields
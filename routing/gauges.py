@@ -0,0 +1,116 @@
+"""
+Live queue gauges (QueueGauge), maintained as visits move instead of counted.
+
+One row per desk and token issue day:
+- waiting: tokens ROUTED to the desk and not attended yet
+- attended / wait_seconds: attends at the desk and their summed issue-to-attend wait
+
+Visit.save() passes every change of a visit's status or desk to visit_changed();
+the set-based paths (bulk moves, close-out) call apply() or rebuild() themselves.
+Rows are updated with F() in the caller's transaction, so they commit or roll
+back with the change. Paths that bypass both (raw SQL, imports) leave the day
+off until `manage.py rebuild_gauges`.
+"""
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from core.db import add_to_counters
+from visit_regn.models import Visit
+from .models import QueueGauge
+
+
+def issue_day(issued_at):
+    return timezone.localtime(issued_at).date()
+
+
+def visit_changed(visit, old_status, old_desk_id):
+    """Applies the gauge change of one visit going from (old_status, old_desk_id) to its current state."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    old_waiting = old_desk_id if old_status == Visit.Status.ROUTED else None
+    new_waiting = visit.current_desk_id if visit.status == Visit.Status.ROUTED else None
+    if old_waiting != new_waiting:
+        if old_waiting:
+            deltas[old_waiting]['waiting'] -= 1
+        if new_waiting:
+            deltas[new_waiting]['waiting'] += 1
+
+    if (visit.status == Visit.Status.IN_PROGRESS and old_status != Visit.Status.IN_PROGRESS
+            and visit.current_desk_id and visit.token_attend_time):
+        wait = (visit.token_attend_time - visit.token_issue_time).total_seconds()
+        deltas[visit.current_desk_id]['attended'] += 1
+        deltas[visit.current_desk_id]['wait_seconds'] += max(0, int(wait))
+
+    if deltas:
+        apply(visit.office_id, issue_day(visit.token_issue_time), deltas)
+
+
+def apply(office_id, day, deltas):
+    """deltas: {desk_id: {'waiting': n, 'attended': n, 'wait_seconds': n}}"""
+    for desk_id, changes in sorted(deltas.items()):
+        add_to_counters(QueueGauge, {'desk_id': desk_id, 'date': day}, defaults={'office_id': office_id}, **changes)
+
+
+def waiting_moves(rows, to_desk_id):
+    """
+    Gauge deltas ({desk_id: {'waiting': n}}) for a set-based move to to_desk_id.
+    rows: (old_status, old_desk_id) of the moved visits, which all end up ROUTED.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for old_status, old_desk_id in rows:
+        if old_status == Visit.Status.ROUTED and old_desk_id == to_desk_id:
+            continue
+        if old_status == Visit.Status.ROUTED and old_desk_id:
+            deltas[old_desk_id]['waiting'] -= 1
+        deltas[to_desk_id]['waiting'] += 1
+    return deltas
+
+
+@transaction.atomic
+def rebuild(day, office=None):
+    """Recomputes the day's rows from the visits. Returns the number of rows written."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day, time.max))
+    visits = Visit.objects.filter(token_issue_time__range=(start, end), current_desk__isnull=False)
+    rows = QueueGauge.objects.filter(date=day)
+    if office is not None:
+        visits = visits.filter(office=office)
+        rows = rows.filter(office=office)
+
+    totals = {}
+    for desk_id, office_id, status, issued, attended in visits.values_list(
+            'current_desk_id', 'office_id', 'status', 'token_issue_time', 'token_attend_time').iterator():
+        gauge = totals.setdefault(desk_id, QueueGauge(desk_id=desk_id, office_id=office_id, date=day))
+        if status == Visit.Status.ROUTED:
+            gauge.waiting += 1
+        if attended is not None:
+            gauge.attended += 1
+            gauge.wait_seconds += max(0, int((attended - issued).total_seconds()))
+
+    rows.delete()
+    QueueGauge.objects.bulk_create(totals.values())
+    return len(totals)
+
+
+def today_gauges():
+    """Today's QueueGauge rows with desk and office."""
+    return list(QueueGauge.objects.filter(date=timezone.localdate()).select_related('desk', 'office'))
+
+
+def oldest_waiting(office_ids):
+    """
+    {desk_id: issue time of the oldest token waiting there} for today, over the
+    given offices (those with waiting tokens). One indexed MIN per scrape: an
+    oldest-first order cannot be kept up to date with counters.
+    """
+    if not office_ids:
+        return {}
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today, time.min))
+    return dict(
+        Visit.objects.filter(office_id__in=office_ids, token_issue_time__gte=start, status=Visit.Status.ROUTED)
+        .values('current_desk_id').annotate(oldest=Min('token_issue_time')).values_list('current_desk_id', 'oldest')
+    )
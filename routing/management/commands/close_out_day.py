@@ -0,0 +1,69 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.models import Office
+from routing.services import close_out_day
+
+
+class Command(BaseCommand):
+    help = (
+        "End-of-day queue close-out: cancels tokens left WAITING/ROUTED/IN_PROGRESS, "
+        "records the daily summary and purges finished DeskQueue rows. "
+        "Schedule nightly (cron / PythonAnywhere scheduled task)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cutoff',
+            help="Local HH:MM. Tokens issued today before this time are closed out if the command "
+                 "runs after it. Defaults to settings.QUEUE_CLOSE_OUT_TIME; without either, only "
+                 "tokens from previous days are closed out.",
+        )
+        parser.add_argument('--office', help="Office code to limit the close-out to.")
+        parser.add_argument(
+            '--date', action='append', default=[],
+            help="YYYY-MM-DD. (Re)compute the summary for this day as well. Repeatable.",
+        )
+
+    def get_cutoff(self, value):
+        now = timezone.localtime()
+        start_of_today = timezone.make_aware(datetime.combine(now.date(), time.min))
+
+        if not value:
+            return start_of_today
+        try:
+            close_time = datetime.strptime(value, '%H:%M').time()
+        except ValueError:
+            raise CommandError(f"Invalid cutoff '{value}', expected HH:MM")
+
+        if now.time() < close_time:
+            return start_of_today
+        return timezone.make_aware(datetime.combine(now.date(), close_time))
+
+    def handle(self, *args, **options):
+        office = None
+        if options['office']:
+            office = Office.objects.filter(code=options['office']).first()
+            if not office:
+                raise CommandError(f"Office '{options['office']}' not found")
+
+        cutoff = self.get_cutoff(options['cutoff'] or getattr(settings, 'QUEUE_CLOSE_OUT_TIME', None))
+
+        try:
+            summary_days = [datetime.strptime(d, '%Y-%m-%d').date() for d in options['date']]
+        except ValueError as e:
+            raise CommandError(str(e))
+        # Always summarise the day that just closed
+        summary_days.append(timezone.localtime(cutoff - timedelta(microseconds=1)).date())
+
+        result = close_out_day(cutoff, office=office, summary_days=summary_days)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed out before {timezone.localtime(cutoff):%Y-%m-%d %H:%M}: "
+            f"{result['cancelled']} token(s) cancelled, "
+            f"{result['queue_rows_purged']} queue row(s) purged, "
+            f"{len(result['summaries'])} summary row(s) written."
+        ))
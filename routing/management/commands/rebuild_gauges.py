@@ -0,0 +1,36 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.models import Office
+from filing import gauges as file_gauges
+from routing import gauges as queue_gauges
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts the /metrics gauges (queue gauges for the given days, open office files) "
+        "from the visits and files. Run after imports or manual data fixes; normal use keeps "
+        "them up to date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date', action='append', default=[], type=datetime.date.fromisoformat,
+            help="YYYY-MM-DD. Day of queue gauges to recount (default today). Repeatable.",
+        )
+        parser.add_argument('--office', help="Office code to limit the recount to.")
+
+    def handle(self, *args, **options):
+        office = None
+        if options['office']:
+            office = Office.objects.filter(code=options['office']).first()
+            if not office:
+                raise CommandError(f"Office '{options['office']}' not found")
+
+        for day in options['date'] or [timezone.localdate()]:
+            rows = queue_gauges.rebuild(day, office=office)
+            self.stdout.write(f"Queue gauges {day}: {rows} desks")
+        rows = file_gauges.rebuild(office=office)
+        self.stdout.write(self.style.SUCCESS(f"Open file gauges: {rows} office-days"))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from accounts.models import Office
+from routing import queue_depth
+
+
+class Command(BaseCommand):
+    help = (
+        "Records this minute's queue depth per desk (waiting, in progress, oldest wait) for the "
+        "MIS queue depth chart. Schedule every minute (cron), or run once with --loop as an "
+        "always-on task."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--office', help="Office code to limit the sample to.")
+        parser.add_argument('--loop', action='store_true', help="Keep sampling at the start of every minute.")
+
+    def handle(self, *args, **options):
+        office = None
+        if options['office']:
+            office = Office.objects.filter(code=options['office']).first()
+            if not office:
+                raise CommandError(f"Office '{options['office']}' not found")
+
+        while True:
+            desks = queue_depth.sample(office=office)
+            if not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f"Sampled {desks} desk(s)."))
+                return
+            close_old_connections()
+            time.sleep(60 - time.time() % 60)
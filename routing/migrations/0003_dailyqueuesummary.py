@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_district_office_is_headquarters_alter_office_code_and_more'),
+        ('routing', '0002_visitlock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyQueueSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('tokens_issued', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+                ('auto_cancelled', models.PositiveIntegerField(default=0, help_text='Tokens cancelled by the close-out job')),
+                ('avg_wait_seconds', models.PositiveIntegerField(blank=True, null=True)),
+                ('closed_at', models.DateTimeField(auto_now=True)),
+                ('office', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_summaries', to='accounts.office')),
+            ],
+            options={
+                'verbose_name': 'Daily Queue Summary',
+                'verbose_name_plural': 'Daily Queue Summaries',
+                'ordering': ['-date'],
+                'unique_together': {('office', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:03
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def count_todays_queue(apps, schema_editor):
+    Visit = apps.get_model('visit_regn', 'Visit')
+    QueueGauge = apps.get_model('routing', 'QueueGauge')
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.datetime.combine(today, datetime.time.min))
+    totals = {}
+    visits = Visit.objects.filter(token_issue_time__gte=start, current_desk__isnull=False)
+    for desk_id, office_id, status, issued, attended in visits.values_list(
+            'current_desk_id', 'office_id', 'status', 'token_issue_time', 'token_attend_time'):
+        gauge = totals.setdefault(desk_id, QueueGauge(desk_id=desk_id, office_id=office_id, date=today))
+        if status == 'ROUTED':
+            gauge.waiting += 1
+        if attended is not None:
+            gauge.attended += 1
+            gauge.wait_seconds += max(0, int((attended - issued).total_seconds()))
+    QueueGauge.objects.bulk_create(totals.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_district_office_is_headquarters_alter_office_code_and_more'),
+        ('routing', '0003_dailyqueuesummary'),
+        ('visit_regn', '0003_alter_visit_registration_mode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueGauge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('waiting', models.IntegerField(default=0, help_text='Tokens routed to the desk and not yet attended')),
+                ('attended', models.IntegerField(default=0)),
+                ('wait_seconds', models.BigIntegerField(default=0, help_text='Summed issue-to-attend wait of the attends')),
+                ('desk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_gauges', to='accounts.desk')),
+                ('office', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_gauges', to='accounts.office')),
+            ],
+            options={
+                'verbose_name': 'Queue Gauge',
+                'verbose_name_plural': 'Queue Gauges',
+                'indexes': [models.Index(fields=['date', 'office'], name='routing_que_date_29c5c7_idx')],
+                'unique_together': {('desk', 'date')},
+            },
+        ),
+        migrations.RunPython(count_todays_queue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_district_office_is_headquarters_alter_office_code_and_more'),
+        ('routing', '0004_queuegauge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueDepthDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('desk_ids', models.JSONField(default=list, help_text='Desk of each block of samples, in order')),
+                ('samples', models.BinaryField(default=bytes)),
+                ('office', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_depth_days', to='accounts.office')),
+            ],
+            options={
+                'verbose_name': 'Queue Depth Day',
+                'verbose_name_plural': 'Queue Depth Days',
+                'unique_together': {('office', 'date')},
+            },
+        ),
+    ]
@@ -56,3 +56,69 @@ class DeskQueue(models.Model):
 
     def __str__(self):
         return f"{self.visit.token} @ {self.desk.name}"
+
+class DailyQueueSummary(models.Model):
+    """
+    One row per office per day, written by the end-of-day close-out.
+    Keeps day totals around after the live queue tables are compacted.
+    """
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name='queue_summaries')
+    date = models.DateField()
+
+    tokens_issued = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    auto_cancelled = models.PositiveIntegerField(default=0, help_text="Tokens cancelled by the close-out job")
+    avg_wait_seconds = models.PositiveIntegerField(null=True, blank=True)
+
+    closed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('office', 'date')
+        ordering = ['-date']
+        verbose_name = "Daily Queue Summary"
+        verbose_name_plural = "Daily Queue Summaries"
+
+    def __str__(self):
+        return f"{self.office.name} - {self.date}"
+
+class QueueGauge(models.Model):
+    """
+    Running totals per desk and token issue day, kept up to date as visits move
+    (routing.gauges) so /metrics reads them instead of counting visits.
+    """
+    desk = models.ForeignKey(Desk, on_delete=models.CASCADE, related_name='queue_gauges')
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name='queue_gauges')
+    date = models.DateField()
+
+    waiting = models.IntegerField(default=0, help_text="Tokens routed to the desk and not yet attended")
+    attended = models.IntegerField(default=0)
+    wait_seconds = models.BigIntegerField(default=0, help_text="Summed issue-to-attend wait of the attends")
+
+    class Meta:
+        unique_together = ('desk', 'date')
+        indexes = [models.Index(fields=['date', 'office'])]
+        verbose_name = "Queue Gauge"
+        verbose_name_plural = "Queue Gauges"
+
+    def __str__(self):
+        return f"{self.desk_id} - {self.date}"
+
+class QueueDepthDay(models.Model):
+    """
+    One office's per-minute queue samples for a day (routing.queue_depth): every
+    desk in desk_ids owns a fixed block of the packed samples array, so a day's
+    row is the same size however many tokens were issued.
+    """
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, related_name='queue_depth_days')
+    date = models.DateField()
+    desk_ids = models.JSONField(default=list, help_text="Desk of each block of samples, in order")
+    samples = models.BinaryField(default=bytes)
+
+    class Meta:
+        unique_together = ('office', 'date')
+        verbose_name = "Queue Depth Day"
+        verbose_name_plural = "Queue Depth Days"
+
+    def __str__(self):
+        return f"{self.office_id} - {self.date}"
@@ -0,0 +1,136 @@
+"""
+Per-minute queue depth history (QueueDepthDay), so a past day's queues can be
+looked at minute by minute after the visits have moved on.
+
+`manage.py sample_queue_depth` records, every minute, for each desk of each
+office: tokens waiting there (ROUTED), tokens in progress there and how long its
+oldest waiting token has waited. Samples go into the office's row for the day:
+an array of unsigned 16-bit values (little-endian) holding, for each desk in
+desk_ids, a block of SLOTS minutes per series in SERIES order. A minute that was
+not sampled holds MISSING; values are capped at CEILING (18 hours of wait).
+A desk adds one fixed-size block, so a day's row does not grow with the visits.
+"""
+import sys
+from array import array
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from core.refdata import get_snapshot
+from visit_regn.models import Visit
+from .models import QueueDepthDay
+
+SLOTS = 24 * 60
+SERIES = ('waiting', 'in_progress', 'oldest_wait')
+BLOCK = SLOTS * len(SERIES)
+MISSING = 0xFFFF
+CEILING = 0xFFFE
+
+
+def _unpack(data):
+    values = array('H')
+    values.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _pack(values):
+    if sys.byteorder == 'big':
+        values = array('H', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def current_depths(office_ids, now):
+    """{(office_id, desk_id): (waiting, in progress, oldest wait in seconds)} for today's open tokens."""
+    start = timezone.make_aware(datetime.combine(timezone.localtime(now).date(), time.min))
+    rows = (
+        Visit.objects.filter(office_id__in=office_ids, token_issue_time__gte=start, current_desk__isnull=False,
+                             status__in=[Visit.Status.ROUTED, Visit.Status.IN_PROGRESS])
+        .values('office_id', 'current_desk_id', 'status')
+        .annotate(n=Count('id'), oldest=Min('token_issue_time'))
+        .order_by()
+    )
+    depths = {}
+    for row in rows:
+        waiting, in_progress, oldest_wait = depths.get((row['office_id'], row['current_desk_id']), (0, 0, 0))
+        if row['status'] == Visit.Status.ROUTED:
+            waiting = row['n']
+            oldest_wait = max(0, int((now - row['oldest']).total_seconds()))
+        else:
+            in_progress = row['n']
+        depths[(row['office_id'], row['current_desk_id'])] = (waiting, in_progress, oldest_wait)
+    return depths
+
+
+def sample(now=None, office=None):
+    """
+    Records the minute `now` (default: the current time) falls in, for every
+    office or just the given one. Returns the number of desks sampled.
+    """
+    now = now or timezone.now()
+    local = timezone.localtime(now)
+    snapshot = get_snapshot()
+    office_ids = [office.pk] if office is not None else list(snapshot.offices_by_id)
+    depths = current_depths(office_ids, now)
+
+    sampled = 0
+    for office_id in office_ids:
+        desk_ids = set(snapshot.desks_for(office_id))
+        desk_ids.update(desk_id for depth_office_id, desk_id in depths if depth_office_id == office_id)
+        if not desk_ids:
+            continue
+        record(office_id, local.date(), local.hour * 60 + local.minute,
+               {desk_id: depths.get((office_id, desk_id), (0, 0, 0)) for desk_id in desk_ids})
+        sampled += len(desk_ids)
+    return sampled
+
+
+@transaction.atomic
+def record(office_id, day, slot, values):
+    """Writes {desk_id: (waiting, in_progress, oldest_wait)} into minute `slot` of the office's day."""
+    row, _ = QueueDepthDay.objects.select_for_update().get_or_create(office_id=office_id, date=day)
+    samples = _unpack(row.samples)
+    desk_ids = list(row.desk_ids)
+    for desk_id, sample_values in sorted(values.items()):
+        if desk_id not in desk_ids:
+            desk_ids.append(desk_id)
+            samples.extend(array('H', [MISSING]) * BLOCK)
+        base = desk_ids.index(desk_id) * BLOCK
+        for series, value in enumerate(sample_values):
+            samples[base + series * SLOTS + slot] = min(max(value, 0), CEILING)
+    row.desk_ids = desk_ids
+    row.samples = _pack(samples)
+    row.save(update_fields=['desk_ids', 'samples'])
+
+
+def day_series(office, day):
+    """
+    The office's samples for the day, trimmed to the first..last sampled minute:
+    (first minute of the day, {desk_id: {series: [value or None per minute]}}).
+    (None, {}) when nothing was sampled.
+    """
+    row = QueueDepthDay.objects.filter(office=office, date=day).first()
+    if row is None:
+        return None, {}
+    samples = _unpack(row.samples)
+    sampled = [
+        slot for slot in range(SLOTS)
+        if any(samples[n * BLOCK + slot] != MISSING for n in range(len(row.desk_ids)))
+    ]
+    if not sampled:
+        return None, {}
+    first, last = sampled[0], sampled[-1]
+
+    desks = {}
+    for n, desk_id in enumerate(row.desk_ids):
+        desks[desk_id] = {}
+        for series_index, series in enumerate(SERIES):
+            start = n * BLOCK + series_index * SLOTS
+            desks[desk_id][series] = [
+                None if value == MISSING else value for value in samples[start + first:start + last + 1]
+            ]
+    return first, desks
@@ -1,10 +1,14 @@
 from django.utils import timezone
 from django.db import transaction
 from django.core.exceptions import ValidationError
+from core.db import serialized_write
+from core.cache import cached
+from events.services import record_event, record_events, visit_payload, Kind as EventKind
 from visit_regn.models import Visit, VisitLog
-from visit_regn.services import log_visit_action
+from visit_regn.services import log_visit_action, get_staff_for_user
 from accounts.models import UserAssignment, Desk, User
-from .models import DeskQueue, RoutingRule
+from .models import DeskQueue, RoutingRule, VisitLock, DailyQueueSummary
+from . import gauges
 
 def route_visit(visit):
     """
@@ -39,14 +43,31 @@ def auto_route_visit(visit):
     purpose = visit.purpose
     
     # Find rule
-    rule = RoutingRule.objects.filter(office=office, purpose=purpose).first()
+    desk = get_routing_table(office).get(purpose.id) if purpose else None
     
-    if rule:
-        assign_visit_to_desk(visit, rule.default_desk, by_user=None, remarks="Auto-routed based on purpose")
-        return rule.default_desk
+    if desk:
+        assign_visit_to_desk(visit, desk, by_user=None, remarks="Auto-routed based on purpose")
+        return desk
     
     return None
 
+def get_routing_table(office):
+    """
+    {purpose_id: default Desk} for the office, from the shared cache.
+    Invalidated by RoutingRule/Desk saves (core.cache.INVALIDATION_RULES).
+    """
+    def build():
+        rules = RoutingRule.objects.filter(office=office).select_related('default_desk').order_by('id')
+        table = {}
+        for rule in rules:
+            table.setdefault(rule.purpose_id, rule.default_desk)
+        return table
+    return cached('routing', 'rules', build, office=office)
+
+def get_vo_desk(office):
+    """The office's VO desk (find_vo_desk), from the shared cache."""
+    return cached('desk', 'vo_desk', lambda: find_vo_desk(office), office=office)
+
 def send_to_vo_queue(visit):
     """
     Assigns to VO desk.
@@ -58,8 +79,21 @@ def send_to_vo_queue(visit):
     # 2. Or check if there is a VO user and get their desk?
     # Let's try to find a desk with user having role 'VO'
     
-    vo_desk = None
+    vo_desk = get_vo_desk(office)
     
+    if not vo_desk:
+        # Fallback: Find any desk? No, that's dangerous.
+        # Log failure
+        log_visit_action(visit, VisitLog.Action.COMMENT, remarks="Could not find VO Desk to route non-routine visit.")
+        return False
+
+    assign_visit_to_desk(visit, vo_desk, by_user=None, remarks="Sent to VO Queue for manual routing")
+    return True
+
+def find_vo_desk(office):
+    """
+    The office's VO desk, matched by name. Returns None if there is none.
+    """
     # Try finding desk by name first (convention)
     # Priority 1: Exact Request for 'Village Officer'
     vo_desk = Desk.objects.filter(office=office, name__iexact='Village Officer').first()
@@ -75,21 +109,15 @@ def send_to_vo_queue(visit):
     # Priority 3: Contains 'Village Officer' (safer than just 'VO' which matches SVO)
     if not vo_desk:
         vo_desk = Desk.objects.filter(office=office, name__icontains='Village Officer').first()
-    
-    if not vo_desk:
-        # Fallback: Find any desk? No, that's dangerous.
-        # Log failure
-        log_visit_action(visit, VisitLog.Action.COMMENT, remarks="Could not find VO Desk to route non-routine visit.")
-        return False
 
-    assign_visit_to_desk(visit, vo_desk, by_user=None, remarks="Sent to VO Queue for manual routing")
-    return True
+    return vo_desk
 
+@serialized_write
 @transaction.atomic
-def assign_visit_to_desk(visit, desk, by_user=None, remarks=None):
+def assign_visit_to_desk(visit, desk, by_user=None, remarks=None, event_kind=EventKind.VISIT_ROUTED):
     """
     Assigns visit to a desk.
-    Updates Visit, creates DeskQueue, logs action.
+    Updates Visit, creates DeskQueue, logs action, records event_kind in the outbox.
     """
     old_desk = visit.current_desk
     
@@ -128,7 +156,10 @@ def assign_visit_to_desk(visit, desk, by_user=None, remarks=None):
         remarks = f"Assigned to {desk.name}"
         
     log_visit_action(visit, action, by_user=by_user, from_desk=old_desk, to_desk=desk, remarks=remarks)
+    record_event(event_kind, visit=visit, by_user=by_user,
+                 **visit_payload(visit, from_desk_id=getattr(old_desk, 'id', None)))
 
+@serialized_write
 @transaction.atomic
 def attend_visit(visit, by_user):
     """
@@ -142,14 +173,16 @@ def attend_visit(visit, by_user):
     visit.save()
     
     log_visit_action(visit, VisitLog.Action.ATTENDED, by_user=by_user)
+    record_event(EventKind.VISIT_ATTENDED, visit=visit, by_user=by_user, **visit_payload(visit))
     
+@serialized_write
 @transaction.atomic
 def transfer_visit(visit, from_desk, to_desk, by_user, remarks):
     """
     Transfer visit from one desk to another.
     """
     # Re-use assignment logic
-    assign_visit_to_desk(visit, to_desk, by_user=by_user, remarks=remarks)
+    assign_visit_to_desk(visit, to_desk, by_user=by_user, remarks=remarks, event_kind=EventKind.VISIT_TRANSFERRED)
     
     # We want to log TRANSFERRED, but assign_visit_to_desk logs ASSIGNED.
     # Maybe we should explicitly log TRANSFERRED here?
@@ -159,6 +192,7 @@ def transfer_visit(visit, from_desk, to_desk, by_user, remarks):
     # Let's just log TRANSFERRED additionally to be safe and explicit.
     log_visit_action(visit, VisitLog.Action.TRANSFERRED, by_user=by_user, from_desk=from_desk, to_desk=to_desk, remarks=remarks)
 
+@serialized_write
 @transaction.atomic
 def complete_visit(visit, by_user, remarks):
     """
@@ -171,6 +205,168 @@ def complete_visit(visit, by_user, remarks):
     DeskQueue.objects.filter(visit=visit).update(is_active=False)
     
     log_visit_action(visit, VisitLog.Action.COMPLETED, by_user=by_user, remarks=remarks)
+    record_event(EventKind.VISIT_COMPLETED, visit=visit, by_user=by_user, **visit_payload(visit))
+
+# Bulk Routing (VO)
+# ------------------------------------------------------------------------------
+# Closing a desk or covering for a clerk on leave means moving many tokens at once.
+# These helpers do that with set-based UPDATEs and a single bulk_create of logs,
+# instead of looping over assign_visit_to_desk (save + delete/insert + 2 queries per token).
+
+BULK_MOVABLE_STATUSES = [Visit.Status.WAITING, Visit.Status.ROUTED, Visit.Status.IN_PROGRESS]
+
+def _move_visits(rows, desk, by_user, now):
+    """
+    Points the given visits (and their DeskQueue rows) at desk using UPDATEs.
+    rows: (visit_id, old_desk_id, old_status) from _lock_movable_visits.
+    Caller must hold the row locks and be inside a transaction.
+    """
+    visit_ids = [visit_id for visit_id, _, _ in rows]
+
+    # In-progress tokens go back to waiting at the new desk (same as assign_visit_to_desk)
+    Visit.objects.filter(id__in=visit_ids, status=Visit.Status.IN_PROGRESS).update(token_attend_time=None)
+    Visit.objects.filter(id__in=visit_ids).update(
+        current_desk=desk,
+        status=Visit.Status.ROUTED,
+        updated_at=now
+    )
+
+    moved = DeskQueue.objects.filter(visit_id__in=visit_ids).update(
+        desk=desk,
+        assigned_by=by_user,
+        assigned_at=now,
+        is_active=True
+    )
+
+    # Visits that never had a DeskQueue row (e.g. still WAITING) need one
+    if moved < len(visit_ids):
+        existing = set(DeskQueue.objects.filter(visit_id__in=visit_ids).values_list('visit_id', flat=True))
+        DeskQueue.objects.bulk_create([
+            DeskQueue(visit_id=visit_id, desk=desk, assigned_by=by_user, is_active=True)
+            for visit_id in visit_ids if visit_id not in existing
+        ])
+
+    # Only today's visits are movable, so all of them count on today's gauges
+    gauges.apply(desk.office_id, timezone.localdate(),
+                 gauges.waiting_moves([(status, old_desk_id) for _, old_desk_id, status in rows], desk.id))
+
+def _lock_movable_visits(office, visit_ids=None, from_desk=None):
+    """
+    Returns [(visit_id, current_desk_id, status)] for today's open visits, locked for update.
+    """
+    today = timezone.localdate()
+    from datetime import datetime, time
+    start_of_day = timezone.make_aware(datetime.combine(today, time.min))
+    end_of_day = timezone.make_aware(datetime.combine(today, time.max))
+
+    qs = Visit.objects.select_for_update().filter(
+        office=office,
+        status__in=BULK_MOVABLE_STATUSES,
+        token_issue_time__range=(start_of_day, end_of_day)
+    )
+    if from_desk is not None:
+        qs = qs.filter(current_desk=from_desk)
+    if visit_ids is not None:
+        qs = qs.filter(id__in=visit_ids)
+
+    return list(qs.order_by('token').values_list('id', 'current_desk_id', 'status'))
+
+@serialized_write
+@transaction.atomic
+def bulk_reassign_visits(to_desk, by_user, from_desk=None, visit_ids=None, remarks=None):
+    """
+    Moves today's open tokens to to_desk: everything at from_desk, the selected
+    visit_ids, or the selected visit_ids that are at from_desk.
+    Returns the number of visits moved.
+    """
+    if from_desk is None and visit_ids is None:
+        raise ValidationError("Select a source desk or the tokens to move.")
+    if from_desk is not None and from_desk.office_id != to_desk.office_id:
+        raise ValidationError("Desks belong to different offices.")
+
+    rows = _lock_movable_visits(to_desk.office, visit_ids=visit_ids, from_desk=from_desk)
+    # Tokens already at the target desk stay where they are
+    rows = [row for row in rows if row[1] != to_desk.id]
+    if not rows:
+        return 0
+
+    now = timezone.now()
+    _move_visits(rows, to_desk, by_user, now)
+
+    if not remarks:
+        source = from_desk.name if from_desk is not None else "queue"
+        remarks = f"Bulk transfer from {source} to {to_desk.name}"
+
+    staff_member = get_staff_for_user(by_user)
+    VisitLog.objects.bulk_create([
+        VisitLog(
+            visit_id=visit_id,
+            action=VisitLog.Action.TRANSFERRED,
+            by_user=by_user,
+            by_staff=staff_member,
+            from_desk_id=old_desk_id,
+            to_desk=to_desk,
+            remarks=remarks
+        )
+        for visit_id, old_desk_id, _ in rows
+    ])
+    record_events(
+        dict(kind=EventKind.VISIT_TRANSFERRED, visit=visit_id, office=to_desk.office_id, by_user=by_user,
+             occurred_at=now, status=Visit.Status.ROUTED, desk_id=to_desk.id, from_desk_id=old_desk_id)
+        for visit_id, old_desk_id, _ in rows
+    )
+    return len(rows)
+
+@serialized_write
+@transaction.atomic
+def distribute_visits(office, target_desks, by_user, from_desk=None, visit_ids=None, remarks=None):
+    """
+    Spreads today's open tokens (optionally only those at from_desk / in visit_ids)
+    round-robin across target_desks, in token order.
+    Returns a dict of {desk_id: count}.
+    """
+    target_desks = [d for d in target_desks if d.office_id == office.id]
+    if from_desk is not None:
+        target_desks = [d for d in target_desks if d.id != from_desk.id]
+    if not target_desks:
+        raise ValidationError("Select at least one target desk in this office.")
+
+    rows = _lock_movable_visits(office, visit_ids=visit_ids, from_desk=from_desk)
+    if not rows:
+        return {}
+
+    buckets = {desk.id: [] for desk in target_desks}
+    for index, row in enumerate(rows):
+        desk = target_desks[index % len(target_desks)]
+        buckets[desk.id].append(row)
+
+    now = timezone.now()
+    staff_member = get_staff_for_user(by_user)
+    logs = []
+    events = []
+    for desk in target_desks:
+        bucket = buckets[desk.id]
+        if not bucket:
+            continue
+        _move_visits(bucket, desk, by_user, now)
+        for visit_id, old_desk_id, _ in bucket:
+            logs.append(VisitLog(
+                visit_id=visit_id,
+                action=VisitLog.Action.ASSIGNED,
+                by_user=by_user,
+                by_staff=staff_member,
+                from_desk_id=old_desk_id,
+                to_desk=desk,
+                remarks=remarks or f"Distributed to {desk.name}"
+            ))
+            events.append(dict(
+                kind=EventKind.VISIT_ROUTED, visit=visit_id, office=office.id, by_user=by_user,
+                occurred_at=now, status=Visit.Status.ROUTED, desk_id=desk.id, from_desk_id=old_desk_id
+            ))
+
+    VisitLog.objects.bulk_create(logs)
+    record_events(events)
+    return {desk_id: len(bucket) for desk_id, bucket in buckets.items() if bucket}
 
 from datetime import timedelta
 from django.db.models import Q
@@ -242,3 +438,143 @@ def get_desk_queue(desk):
     
     return queryset
 
+
+# End-of-day Close-out
+# ------------------------------------------------------------------------------
+
+OPEN_STATUSES = [Visit.Status.WAITING, Visit.Status.ROUTED, Visit.Status.IN_PROGRESS]
+
+def _day_range(day):
+    from datetime import datetime, time
+    start_of_day = timezone.make_aware(datetime.combine(day, time.min))
+    end_of_day = timezone.make_aware(datetime.combine(day, time.max))
+    return start_of_day, end_of_day
+
+def record_daily_summary(day, office=None, auto_cancelled=None):
+    """
+    Writes (or refreshes) DailyQueueSummary rows for the given local date.
+    One aggregate query per day, grouped by office.
+    auto_cancelled: optional {office_id: count} to add to the stored counter.
+    """
+    from django.db.models import Count, Avg, F
+
+    start_of_day, end_of_day = _day_range(day)
+    qs = Visit.objects.filter(token_issue_time__range=(start_of_day, end_of_day))
+    if office is not None:
+        qs = qs.filter(office=office)
+
+    rows = qs.values('office_id').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status=Visit.Status.COMPLETED)),
+        cancelled=Count('id', filter=Q(status=Visit.Status.CANCELLED)),
+        avg_wait=Avg(F('token_attend_time') - F('token_issue_time'), filter=Q(token_attend_time__isnull=False)),
+    ).order_by()
+
+    auto_cancelled = auto_cancelled or {}
+    summaries = []
+    for row in rows:
+        summary, created = DailyQueueSummary.objects.update_or_create(
+            office_id=row['office_id'],
+            date=day,
+            defaults={
+                'tokens_issued': row['total'],
+                'completed': row['completed'],
+                'cancelled': row['cancelled'],
+                'avg_wait_seconds': int(row['avg_wait'].total_seconds()) if row['avg_wait'] else None,
+            }
+        )
+        if auto_cancelled.get(row['office_id']):
+            DailyQueueSummary.objects.filter(pk=summary.pk).update(
+                auto_cancelled=F('auto_cancelled') + auto_cancelled[row['office_id']]
+            )
+        summaries.append(summary)
+    return summaries
+
+@serialized_write
+@transaction.atomic
+def close_out_stale_visits(cutoff, office=None, remarks="Auto-cancelled at end of day"):
+    """
+    Cancels every open token issued before cutoff (one UPDATE, one bulk_create of logs)
+    and drops their DeskQueue rows.
+    Returns {'cancelled': n, 'by_office_day': {(office_id, date): n}}.
+    """
+    qs = Visit.objects.select_for_update().filter(
+        status__in=OPEN_STATUSES,
+        token_issue_time__lt=cutoff
+    )
+    if office is not None:
+        qs = qs.filter(office=office)
+
+    rows = list(qs.values_list('id', 'office_id', 'current_desk_id', 'token_issue_time'))
+    if not rows:
+        return {'cancelled': 0, 'by_office_day': {}}
+
+    ids = [row[0] for row in rows]
+    Visit.objects.filter(id__in=ids).update(status=Visit.Status.CANCELLED, updated_at=timezone.now())
+    DeskQueue.objects.filter(visit_id__in=ids).delete()
+    VisitLock.objects.filter(visit_id__in=ids).delete()
+
+    VisitLog.objects.bulk_create([
+        VisitLog(visit_id=visit_id, action=VisitLog.Action.CANCELLED, from_desk_id=desk_id, remarks=remarks)
+        for visit_id, _, desk_id, _ in rows
+    ])
+    now = timezone.now()
+    record_events(
+        dict(kind=EventKind.VISIT_CANCELLED, visit=visit_id, office=office_id, occurred_at=now,
+             status=Visit.Status.CANCELLED, desk_id=None, from_desk_id=desk_id, remarks=remarks)
+        for visit_id, office_id, desk_id, _ in rows
+    )
+
+    by_office_day = {}
+    for _, office_id, _, issued in rows:
+        key = (office_id, timezone.localtime(issued).date())
+        by_office_day[key] = by_office_day.get(key, 0) + 1
+
+    # Set-based cancel: recount the affected days' queue gauges
+    for office_id, day in by_office_day:
+        gauges.rebuild(day, office=office_id)
+
+    return {'cancelled': len(ids), 'by_office_day': by_office_day}
+
+def compact_desk_queue(before, office=None):
+    """
+    Purges DeskQueue rows that are no longer part of the live working set:
+    inactive rows, rows of finished visits, and anything for visits issued before `before`.
+    Also clears expired VisitLocks. Returns the number of DeskQueue rows deleted.
+    """
+    stale = Q(is_active=False) | \
+            Q(visit__status__in=[Visit.Status.COMPLETED, Visit.Status.CANCELLED]) | \
+            Q(visit__token_issue_time__lt=before)
+
+    qs = DeskQueue.objects.filter(stale)
+    locks = VisitLock.objects.filter(expires_at__lt=timezone.now())
+    if office is not None:
+        qs = qs.filter(visit__office=office)
+        locks = locks.filter(visit__office=office)
+
+    deleted, _ = qs.delete()
+    locks.delete()
+    return deleted
+
+def close_out_day(cutoff, office=None, summary_days=None):
+    """
+    End-of-day job: cancel stale tokens, summarise the affected days,
+    then compact DeskQueue down to today's working set.
+    """
+    result = close_out_stale_visits(cutoff, office=office)
+
+    # Summarise every day that had stale tokens, plus the days explicitly asked for
+    days = set(summary_days or [])
+    auto_cancelled_by_day = {}
+    for (office_id, day), count in result['by_office_day'].items():
+        days.add(day)
+        auto_cancelled_by_day.setdefault(day, {})[office_id] = count
+
+    summaries = []
+    for day in sorted(days):
+        summaries += record_daily_summary(day, office=office, auto_cancelled=auto_cancelled_by_day.get(day))
+
+    start_of_today, _ = _day_range(timezone.localdate())
+    result['queue_rows_purged'] = compact_desk_queue(min(cutoff, start_of_today), office=office)
+    result['summaries'] = summaries
+    return result
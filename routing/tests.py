@@ -1,8 +1,16 @@
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from datetime import datetime, time, timedelta
 from django.utils import timezone
-from .models import DeskQueue, RoutingRule
-from .services import route_visit, assign_visit_to_desk, transfer_visit, attend_visit
+from django.urls import reverse
+from . import gauges, queue_depth
+from .models import DeskQueue, RoutingRule, DailyQueueSummary, QueueDepthDay, QueueGauge
+from .services import (
+    route_visit, assign_visit_to_desk, transfer_visit, attend_visit,
+    bulk_reassign_visits, distribute_visits, complete_visit, close_out_day
+)
 from visit_regn.models import Visit, Purpose, VisitLog
 from accounts.models import Office, Desk, User
 
@@ -84,4 +92,250 @@ class RoutingServiceTest(TestCase):
         self.assertFalse(DeskQueue.objects.filter(visit=self.visit, desk=self.desk1, is_active=True).exists())
         # Should be active at Desk 2
         self.assertTrue(DeskQueue.objects.filter(visit=self.visit, desk=self.desk2, is_active=True).exists())
-        
+
+
+class BulkRoutingTest(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name="Test Office", code="TOFF")
+        self.desk1 = Desk.objects.create(name="Desk 1", office=self.office)
+        self.desk2 = Desk.objects.create(name="Desk 2", office=self.office)
+        self.desk3 = Desk.objects.create(name="Desk 3", office=self.office)
+        self.purpose = Purpose.objects.create(name="General Enquiry")
+        self.vo = User.objects.create_user(username="vo", password="password", role="VO", office=self.office)
+
+        self.visits = self.add_visits(6)
+
+    def add_visits(self, count):
+        visits = []
+        for i in range(Visit.objects.count(), Visit.objects.count() + count):
+            visit = Visit.objects.create(
+                office=self.office,
+                token=f"TOFF-20231214-{i + 1:03d}",
+                purpose=self.purpose,
+                registration_mode="QUICK"
+            )
+            assign_visit_to_desk(visit, self.desk1)
+            visits.append(visit)
+        return visits
+
+    def test_bulk_reassign_moves_whole_desk(self):
+        moved = bulk_reassign_visits(self.desk2, self.vo, from_desk=self.desk1)
+
+        self.assertEqual(moved, 6)
+        self.assertEqual(Visit.objects.filter(current_desk=self.desk2, status=Visit.Status.ROUTED).count(), 6)
+        self.assertEqual(DeskQueue.objects.filter(desk=self.desk2, is_active=True).count(), 6)
+        self.assertFalse(DeskQueue.objects.filter(desk=self.desk1).exists())
+        self.assertEqual(VisitLog.objects.filter(action=VisitLog.Action.TRANSFERRED, from_desk=self.desk1, to_desk=self.desk2).count(), 6)
+
+    def test_bulk_reassign_selected_only(self):
+        attend_visit(self.visits[0], self.vo)
+        ids = [self.visits[0].id, self.visits[1].id]
+
+        moved = bulk_reassign_visits(self.desk2, self.vo, from_desk=self.desk1, visit_ids=ids)
+
+        self.assertEqual(moved, 2)
+        self.assertEqual(Visit.objects.filter(current_desk=self.desk1).count(), 4)
+        self.visits[0].refresh_from_db()
+        self.assertEqual(self.visits[0].status, Visit.Status.ROUTED)
+        self.assertIsNone(self.visits[0].token_attend_time)
+
+    def reassign_desk1(self, to_desk):
+        """(visits moved, queries run)"""
+        with CaptureQueriesContext(connection) as queries:
+            moved = bulk_reassign_visits(to_desk, self.vo, from_desk=self.desk1)
+        return moved, len(queries)
+
+    def test_bulk_reassign_query_count_is_constant(self):
+        # 6 visits or 60, the number of statements must not grow with the batch
+        small = self.reassign_desk1(self.desk2)
+        self.add_visits(60)
+        large = self.reassign_desk1(self.desk3)
+        self.assertEqual((small[0], large[0]), (6, 60))
+        self.assertEqual(small[1], large[1])
+
+    def test_distribute_round_robin(self):
+        counts = distribute_visits(self.office, [self.desk2, self.desk3], self.vo, from_desk=self.desk1)
+
+        self.assertEqual(counts, {self.desk2.id: 3, self.desk3.id: 3})
+        self.assertEqual(DeskQueue.objects.filter(desk=self.desk2, is_active=True).count(), 3)
+        self.assertEqual(DeskQueue.objects.filter(desk=self.desk3, is_active=True).count(), 3)
+
+    def test_bulk_reassign_view_requires_vo(self):
+        clerk = User.objects.create_user(username="clerk", password="password", role="CLERK", office=self.office)
+        self.client.force_login(clerk)
+        self.client.post(reverse('routing:vo_bulk_reassign'), {'from_desk': self.desk1.id, 'to_desk': self.desk2.id})
+        self.assertEqual(Visit.objects.filter(current_desk=self.desk1).count(), 6)
+
+        self.client.force_login(self.vo)
+        self.client.post(reverse('routing:vo_bulk_reassign'), {'from_desk': self.desk1.id, 'to_desk': self.desk2.id})
+        self.assertEqual(Visit.objects.filter(current_desk=self.desk2).count(), 6)
+
+
+class CloseOutDayTest(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name="Test Office", code="TOFF")
+        self.desk = Desk.objects.create(name="Desk 1", office=self.office)
+        self.purpose = Purpose.objects.create(name="General Enquiry")
+        self.user = User.objects.create_user(username="teststaff", password="password", office=self.office, desk=self.desk)
+
+    def make_visit(self, token, days_ago=0):
+        visit = Visit.objects.create(office=self.office, token=token, purpose=self.purpose, registration_mode="QUICK")
+        if days_ago:
+            # token_issue_time is auto_now_add, so backdate with update()
+            Visit.objects.filter(pk=visit.pk).update(token_issue_time=timezone.now() - timedelta(days=days_ago))
+            visit.refresh_from_db()
+        assign_visit_to_desk(visit, self.desk)
+        return visit
+
+    def test_close_out_cancels_stale_and_compacts_queue(self):
+        stale = self.make_visit("TOFF-OLD-001", days_ago=1)
+        done = self.make_visit("TOFF-OLD-002", days_ago=1)
+        complete_visit(done, self.user, "done")
+        live = self.make_visit("TOFF-NEW-001")
+
+        start_of_today = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        result = close_out_day(start_of_today)
+
+        stale.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual(result['cancelled'], 1)
+        self.assertEqual(stale.status, Visit.Status.CANCELLED)
+        self.assertEqual(live.status, Visit.Status.ROUTED)
+        self.assertTrue(VisitLog.objects.filter(visit=stale, action=VisitLog.Action.CANCELLED).exists())
+
+        # Only today's working set remains in the live queue
+        self.assertEqual(list(DeskQueue.objects.values_list('visit_id', flat=True)), [live.id])
+
+        summary = DailyQueueSummary.objects.get(office=self.office, date=timezone.localtime(stale.token_issue_time).date())
+        self.assertEqual(summary.tokens_issued, 2)
+        self.assertEqual(summary.completed, 1)
+        self.assertEqual(summary.cancelled, 1)
+        self.assertEqual(summary.auto_cancelled, 1)
+
+class OfficeQueuePageTest(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name="Test Office", code="TOFF")
+        self.desk = Desk.objects.create(name="Desk 1", office=self.office)
+        Desk.objects.create(name="Visitor Desk", office=self.office)
+        self.vo_desk = Desk.objects.create(name="Village Officer", office=self.office)
+        self.purposes = [Purpose.objects.create(name=f"Purpose {i}") for i in range(30)]
+        self.vo = User.objects.create_user(username='vo', password='password', role='VO', office=self.office, desk=self.desk)
+        for i in range(20):
+            data = {'name': f'Visitor {i}', 'mobile': '9876543210', 'purpose': self.purposes[i]}
+            Visit.create_from_kiosk(data, self.office, user=self.vo, mode='KIOSK')
+        self.client.force_login(self.vo)
+
+    def test_queue_renders_one_modal_without_option_lists(self):
+        response = self.client.get(reverse('routing:visit_queue'))
+        html = response.content.decode()
+        self.assertEqual(html.count('class="modal fade"'), 1)
+        self.assertEqual(html.count('data-visit-id='), 20)
+        self.assertNotIn('<option value="%d">' % self.purposes[0].id, html)
+
+    def test_options_are_cacheable_per_version(self):
+        page = self.client.get(reverse('routing:visit_queue'))
+        options_url = page.context['options_url']
+
+        response = self.client.get(options_url)
+        data = response.json()
+        self.assertEqual(len(data['purposes']), 30)
+        self.assertEqual([d[1] for d in data['desks']], ["Desk 1", "Village Officer"])
+        self.assertIn('immutable', response['Cache-Control'])
+
+        stale = self.client.get(reverse('routing:reference_options') + '?v=stale')
+        self.assertIn('no-cache', stale['Cache-Control'])
+
+class QueueGaugeTest(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name="Test Office", code="TOFF")
+        self.desk1 = Desk.objects.create(name="Desk 1", office=self.office)
+        self.desk2 = Desk.objects.create(name="Desk 2", office=self.office)
+        self.purpose = Purpose.objects.create(name="General Enquiry")
+        RoutingRule.objects.create(office=self.office, purpose=self.purpose, default_desk=self.desk1)
+        self.user = User.objects.create_user(username='gaugevo', password='password', role='VO',
+                                             office=self.office, desk=self.desk1)
+        self.visits = [
+            Visit.create_from_kiosk({'name': f'Visitor {i}', 'mobile': '9876543210', 'purpose': self.purpose},
+                                    self.office, user=self.user)
+            for i in range(4)
+        ]
+
+    def gauges(self):
+        return {
+            desk_id: (waiting, attended)
+            for desk_id, waiting, attended in QueueGauge.objects.filter(date=timezone.localdate())
+            .values_list('desk_id', 'waiting', 'attended')
+        }
+
+    def test_gauges_follow_the_visits(self):
+        self.assertEqual(self.gauges(), {self.desk1.id: (4, 0)})
+
+        first, second, third, fourth = self.visits
+        attend_visit(first, self.user)
+        complete_visit(first, self.user, "Done")
+        transfer_visit(second, self.desk1, self.desk2, self.user, "Moved")
+        self.assertEqual(self.gauges(), {self.desk1.id: (2, 1), self.desk2.id: (1, 0)})
+
+        bulk_reassign_visits(self.desk2, self.user, from_desk=self.desk1)
+        self.assertEqual(self.gauges(), {self.desk1.id: (0, 1), self.desk2.id: (3, 0)})
+
+        # A rebuild from the visits agrees with the running totals
+        incremental = self.gauges()
+        gauges.rebuild(timezone.localdate())
+        self.assertEqual(self.gauges(), incremental)
+
+class QueueDepthTest(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name="Test Office", code="TOFF")
+        self.desk1 = Desk.objects.create(name="Desk 1", office=self.office)
+        self.desk2 = Desk.objects.create(name="Desk 2", office=self.office)
+        self.purpose = Purpose.objects.create(name="General Enquiry")
+        RoutingRule.objects.create(office=self.office, purpose=self.purpose, default_desk=self.desk1)
+        self.vo = User.objects.create_user(username='depthvo', password='password', role='VO',
+                                           office=self.office, desk=self.desk1)
+
+    def register(self, count):
+        return [
+            Visit.create_from_kiosk({'name': f'Visitor {i}', 'mobile': '9876543210', 'purpose': self.purpose},
+                                    self.office, user=self.vo)
+            for i in range(count)
+        ]
+
+    def test_samples_per_desk_and_minute(self):
+        now = timezone.localtime().replace(hour=11, minute=30, second=0, microsecond=0)
+        visits = self.register(3)
+        attend_visit(visits[0], self.vo)
+        Visit.objects.update(token_issue_time=now - timedelta(minutes=5))
+        queue_depth.sample(now=now)
+        size = len(QueueDepthDay.objects.get(office=self.office).samples)
+
+        # Two minutes later, with many more tokens: same storage
+        self.register(20)
+        Visit.objects.update(token_issue_time=now - timedelta(minutes=5))
+        queue_depth.sample(now=now + timedelta(minutes=2))
+        row = QueueDepthDay.objects.get(office=self.office)
+        self.assertEqual(len(row.samples), size)
+        self.assertEqual(size, 2 * queue_depth.BLOCK * 2)
+
+        first, desks = queue_depth.day_series(self.office, now.date())
+        self.assertEqual(first, 11 * 60 + 30)
+        self.assertEqual(desks[self.desk1.id]['waiting'], [2, None, 22])
+        self.assertEqual(desks[self.desk1.id]['in_progress'], [1, None, 1])
+        self.assertEqual(desks[self.desk1.id]['oldest_wait'], [300, None, 420])
+        self.assertEqual(desks[self.desk2.id]['waiting'], [0, None, 0])
+        self.assertEqual(desks[self.desk2.id]['oldest_wait'], [0, None, 0])
+
+    def test_mis_dashboard_chart(self):
+        self.register(2)
+        queue_depth.sample()
+        self.client.force_login(self.vo)
+
+        response = self.client.get(reverse('mis:dashboard'))
+        chart = response.context['depth_chart']
+        self.assertEqual([d['label'] for d in chart['datasets']], ["Desk 1"])
+        self.assertEqual(chart['datasets'][0]['data'], [2])
+        self.assertContains(response, 'id="queueDepthChart"')
+
+        response = self.client.get(reverse('mis:dashboard') + '?depth_date=2020-01-01')
+        self.assertIsNone(response.context['depth_chart'])
+        self.assertContains(response, 'No queue samples for 01 Jan 2020')
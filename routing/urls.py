@@ -11,7 +11,10 @@ urlpatterns = [
     path('transfer/<int:visit_id>/', views.VisitTransferView.as_view(), name='transfer_visit'),
     path('complete/<int:visit_id>/', views.VisitCompleteView.as_view(), name='complete_visit'),
     path('vo/', views.VORoutingView.as_view(), name='vo_routing'),
+    path('vo/bulk-reassign/', views.VOBulkReassignView.as_view(), name='vo_bulk_reassign'),
+    path('vo/distribute/', views.VODistributeView.as_view(), name='vo_distribute'),
     path('api/lock/<int:visit_id>/', views.LockVisitView.as_view(), name='lock_visit'),
     path('api/unlock/<int:visit_id>/', views.UnlockVisitView.as_view(), name='unlock_visit'),
     path('api/check-lock/<int:visit_id>/', views.CheckLockView.as_view(), name='check_lock'),
+    path('api/options/', views.ReferenceOptionsView.as_view(), name='reference_options'),
 ]
@@ -3,17 +3,21 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.db import transaction
-from django.urls import reverse_lazy
+from django.urls import reverse_lazy, reverse
+from django.utils.cache import patch_cache_control
 from django.http import JsonResponse
 from django.utils import timezone
+from django.core.exceptions import ValidationError
 from .models import DeskQueue, VisitLock
 from datetime import timedelta
 from .services import (
     attend_visit, transfer_visit, complete_visit,
-    get_visit_queue, get_desk_queue, assign_visit_to_desk
+    get_visit_queue, get_desk_queue, assign_visit_to_desk,
+    bulk_reassign_visits, distribute_visits
 )
 from visit_regn.models import Visit, Purpose
 from accounts.models import Desk
+from core.refdata import get_snapshot
 from visit_regn.forms import VisitRegistrationForm
 
 class VisitQueueView(LoginRequiredMixin, ListView):
@@ -30,14 +34,12 @@ class VisitQueueView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         # Add user's desk to context to highlight or enable actions
         context['user_desk'] = self.request.user.desk
-        context['all_purposes'] = Purpose.objects.all()
-        if self.request.user.office:
-            # Filter desks: Exclude current user's desk and 'Visitor' desk
-            desks = Desk.objects.filter(office=self.request.user.office)
-            if self.request.user.desk:
-                desks = desks.exclude(id=self.request.user.desk.id)
-            desks = desks.exclude(name__icontains='Visitor')
-            context['all_desks'] = desks
+        # Purpose/desk options for the shared edit modal are fetched once per
+        # reference-data version and cached by the browser (ReferenceOptionsView)
+        version = get_snapshot().version
+        context['options_url'] = (
+            f"{reverse('routing:reference_options')}?office={self.request.user.office_id or ''}&v={version}"
+        )
         return context
 
 class DeskQueueView(LoginRequiredMixin, ListView):
@@ -52,11 +54,9 @@ class DeskQueueView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Provide all desks for the transfer dropdown
-        if self.request.user.office:
-             context['all_desks'] = Desk.objects.filter(office=self.request.user.office)
-        else:
-             context['all_desks'] = Desk.objects.none()
-        context['all_purposes'] = Purpose.objects.all()
+        snapshot = get_snapshot()
+        context['all_desks'] = snapshot.desks_for(self.request.user.office_id).values()
+        context['all_purposes'] = snapshot.purposes_by_id.values()
         return context
 
 class VisitAttendView(LoginRequiredMixin, View):
@@ -150,12 +150,12 @@ class VORoutingView(LoginRequiredMixin, ListView):
             office=self.request.user.office,
             status__in=[Visit.Status.WAITING, Visit.Status.ROUTED, Visit.Status.IN_PROGRESS],
             token_issue_time__range=(start_of_day, end_of_day)
-        ).order_by('token_issue_time')
+        ).select_related('current_desk').order_by('token_issue_time')
 
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['desks'] = Desk.objects.filter(office=self.request.user.office)
+        context['desks'] = get_snapshot().desks_for(self.request.user.office_id).values()
         return context
 
     def post(self, request):
@@ -169,6 +169,71 @@ class VORoutingView(LoginRequiredMixin, ListView):
         messages.success(request, f"Assigned {visit.token} to {desk.name}")
         return redirect('routing:vo_routing')
 
+class VOBulkReassignView(LoginRequiredMixin, View):
+    """
+    Moves all (or the ticked) tokens from one desk to another in one go.
+    Used when a desk closes or a clerk goes on leave.
+    """
+    def post(self, request):
+        if request.user.role != 'VO' or not request.user.office:
+            messages.error(request, "Permission denied.")
+            return redirect('routing:vo_routing')
+
+        if not request.POST.get('to_desk'):
+            messages.error(request, "Please select a target desk.")
+            return redirect('routing:vo_routing')
+
+        office = request.user.office
+        to_desk = get_object_or_404(Desk, id=request.POST.get('to_desk'), office=office)
+
+        from_desk = None
+        if request.POST.get('from_desk'):
+            from_desk = get_object_or_404(Desk, id=request.POST.get('from_desk'), office=office)
+
+        # No ticked tokens means "everything at from_desk"
+        visit_ids = request.POST.getlist('visit_ids') or None
+
+        try:
+            moved = bulk_reassign_visits(to_desk, request.user, from_desk=from_desk, visit_ids=visit_ids,
+                                         remarks=request.POST.get('remarks'))
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+            return redirect('routing:vo_routing')
+
+        messages.success(request, f"Moved {moved} token(s) to {to_desk.name}")
+        return redirect('routing:vo_routing')
+
+class VODistributeView(LoginRequiredMixin, View):
+    """
+    Spreads a backlog (a desk's queue, or the ticked tokens) across several desks.
+    """
+    def post(self, request):
+        if request.user.role != 'VO' or not request.user.office:
+            messages.error(request, "Permission denied.")
+            return redirect('routing:vo_routing')
+
+        office = request.user.office
+        target_desks = list(Desk.objects.filter(office=office, id__in=request.POST.getlist('target_desks')).order_by('name'))
+
+        from_desk = None
+        if request.POST.get('from_desk'):
+            from_desk = get_object_or_404(Desk, id=request.POST.get('from_desk'), office=office)
+
+        visit_ids = request.POST.getlist('visit_ids') or None
+        if from_desk is None and visit_ids is None:
+            messages.error(request, "Select a source desk or tick the tokens to distribute.")
+            return redirect('routing:vo_routing')
+
+        try:
+            counts = distribute_visits(office, target_desks, request.user, from_desk=from_desk,
+                                       visit_ids=visit_ids, remarks=request.POST.get('remarks'))
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+            return redirect('routing:vo_routing')
+
+        messages.success(request, f"Distributed {sum(counts.values())} token(s) across {len(counts)} desk(s)")
+        return redirect('routing:vo_routing')
+
 
 
 
@@ -243,15 +308,15 @@ class LockVisitView(LoginRequiredMixin, View):
     Expects POST with visit_id.
     """
     def post(self, request, visit_id):
-        visit = get_object_or_404(Visit, id=visit_id)
+        visit = get_object_or_404(Visit.objects.only('id'), id=visit_id)
         
         # 1. Clean up expired locks first
         VisitLock.objects.filter(expires_at__lt=timezone.now()).delete()
         
         # 2. Check if already locked by SOMEONE ELSE
-        existing_lock = VisitLock.objects.filter(visit=visit).first()
+        existing_lock = VisitLock.objects.filter(visit=visit).select_related('locked_by').first()
         if existing_lock:
-            if existing_lock.locked_by != request.user:
+            if existing_lock.locked_by_id != request.user.pk:
                 # Locked by someone else
                 return JsonResponse({
                     'success': False, 
@@ -261,7 +326,7 @@ class LockVisitView(LoginRequiredMixin, View):
             else:
                 # Locked by me, extend it
                 existing_lock.expires_at = timezone.now() + timedelta(minutes=2)
-                existing_lock.save()
+                existing_lock.save(update_fields=['expires_at'])
                 return JsonResponse({'success': True, 'message': 'Lock extended'})
         
         # 3. Create new lock
@@ -283,6 +348,32 @@ class UnlockVisitView(LoginRequiredMixin, View):
         VisitLock.objects.filter(visit=visit, locked_by=request.user).delete()
         return JsonResponse({'success': True})
 
+class ReferenceOptionsView(LoginRequiredMixin, View):
+    """
+    Purpose and desk option lists for the shared visit-edit modal in office_queue.html.
+    The page asks for ?v=<reference snapshot version>, so a matching request can be
+    cached by the browser indefinitely: new data means a new URL.
+    """
+    max_age = 60 * 60 * 24 * 365
+
+    def get(self, request):
+        snapshot = get_snapshot()
+        # Own desk is filtered out client-side so the response is the same for the whole office
+        desks = [
+            [desk.id, desk.name] for desk in snapshot.desks_for(request.user.office_id).values()
+            if 'visitor' not in desk.name.lower()
+        ]
+        response = JsonResponse({
+            'version': str(snapshot.version),
+            'purposes': [[purpose.id, purpose.name] for purpose in snapshot.purposes_by_id.values()],
+            'desks': desks,
+        })
+        if request.GET.get('v') == str(snapshot.version) and request.GET.get('office') == str(request.user.office_id or ''):
+            patch_cache_control(response, private=True, max_age=self.max_age, immutable=True)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 class CheckLockView(LoginRequiredMixin, View):
     """
     API to check lock status of a visit.
@@ -296,7 +387,7 @@ class CheckLockView(LoginRequiredMixin, View):
              return JsonResponse({
                  'is_locked': True,
                  'locked_by': lock.locked_by.username,
-                 'is_me': (lock.locked_by == request.user)
+                 'is_me': (lock.locked_by_id == request.user.pk)
              })
         return JsonResponse({'is_locked': False})
 
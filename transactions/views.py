@@ -4,12 +4,17 @@ from django.views import View
 from django.urls import reverse
 from django.http import JsonResponse, HttpResponseRedirect
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import PermissionDenied
 from django.utils import timezone
+from django.db import transaction as db_transaction
 from .models import Transaction
 from .forms import TransactionForm
 from visit_regn.models import Visit
 from visit_regn.forms import VisitStaffUpdateForm
 from routing.models import DeskQueue
+from events.services import record_event, visit_payload, Kind as EventKind
+from accounts import devices
+from accounts.devices import get_device
 
 class TransactionCreateView(LoginRequiredMixin, View):
     template_name = 'transactions/transaction_process.html'
@@ -44,7 +49,7 @@ class TransactionCreateView(LoginRequiredMixin, View):
                 Q(file_number__iexact=ref) | 
                 Q(visit__token__iexact=ref),
                 status='OPEN'
-            )
+            ).select_related('visit__purpose')
             
             for file in ref_matches:
                 if file.id in found_file_ids:
@@ -70,7 +75,7 @@ class TransactionCreateView(LoginRequiredMixin, View):
             mobile_matches = OfficeFile.objects.filter(
                 visit__mobile=visit.mobile,
                 status='OPEN'
-            ).order_by('-created_at')
+            ).select_related('visit__purpose').order_by('-created_at')
             
             for file in mobile_matches:
                 if file.id in found_file_ids:
@@ -115,9 +120,12 @@ class TransactionCreateView(LoginRequiredMixin, View):
                 transaction.status = 'CLOSED'
                 visit.status = 'COMPLETED'
                 visit.completed_at = timezone.now()
-                visit.save()
-                DeskQueue.objects.filter(visit=visit).delete()
-                transaction.save()
+                with db_transaction.atomic():
+                    visit.save()
+                    DeskQueue.objects.filter(visit=visit).delete()
+                    transaction.save()
+                    record_event(EventKind.VISIT_COMPLETED, visit=visit, by_user=request.user,
+                                 **visit_payload(visit, outcome='closed'))
                 return redirect('dashboard') 
                 
             elif action == 'open_file':
@@ -132,9 +140,12 @@ class TransactionCreateView(LoginRequiredMixin, View):
                 transaction.status = 'OPEN_FILE'
                 visit.status = 'COMPLETED'
                 visit.completed_at = timezone.now()
-                visit.save()
-                DeskQueue.objects.filter(visit=visit).delete()
-                transaction.save()
+                with db_transaction.atomic():
+                    visit.save()
+                    DeskQueue.objects.filter(visit=visit).delete()
+                    transaction.save()
+                    record_event(EventKind.VISIT_COMPLETED, visit=visit, by_user=request.user,
+                                 **visit_payload(visit, outcome='open_file'))
                 
                 if target_file_id:
                      return redirect('filing:file_detail', file_id=target_file_id)
@@ -190,13 +201,21 @@ class TransactionCreateView(LoginRequiredMixin, View):
 class VisitorDisplayView(View):
     template_name = 'transactions/visitor_display.html'
     def get(self, request):
+        device = get_device(request)
+        if device is not None and not device.can(devices.DISPLAY):
+            raise PermissionDenied("This device may not do that.")
         return render(request, self.template_name)
 
 class GetLatestCallsView(View):
     def get(self, request):
         # Get active calls (DeskQueue items sorted by assigned_at desc)
         # Limit to 5
-        calls = DeskQueue.objects.select_related('visit', 'desk').order_by('-assigned_at')[:5]
+        calls = DeskQueue.objects.select_related('visit', 'desk').order_by('-assigned_at')
+        # A display enrolled with a device token shows its own office only
+        device = get_device(request)
+        if device is not None and device.can(devices.DISPLAY):
+            calls = calls.filter(desk__office_id=device.office.pk)
+        calls = calls[:5]
         data = []
         for call in calls:
             data.append({
@@ -1,18 +1,26 @@
 from django.contrib import admin
+
+from core.changelist import FastChangelistMixin
 from .models import Visit, VisitLog, DailyTokenCounter, Purpose
 
 @admin.register(Visit)
-class VisitAdmin(admin.ModelAdmin):
+class VisitAdmin(FastChangelistMixin, admin.ModelAdmin):
     list_display = ('token', 'office', 'name', 'mobile', 'purpose', 'status', 'token_issue_time', 'current_desk')
-    list_filter = ('office', 'status', 'registration_mode', 'token_issue_time')
-    search_fields = ('token', 'mobile', 'name', 'reference_number')
+    list_select_related = ('office', 'purpose', 'current_desk')
+    list_filter = ('office', 'status', 'registration_mode')
+    # Pick the office first: the drill-down then stays on the (office, token_issue_time) index
+    date_hierarchy = 'token_issue_time'
+    prefix_search_fields = ('token', 'mobile')
+    search_help_text = "Token or mobile number, from the start (e.g. an office code or the first digits)."
     readonly_fields = ('token', 'token_issue_time', 'created_by')
 
 @admin.register(VisitLog)
-class VisitLogAdmin(admin.ModelAdmin):
+class VisitLogAdmin(FastChangelistMixin, admin.ModelAdmin):
     list_display = ('visit', 'action', 'by_user', 'timestamp')
+    list_select_related = ('visit', 'by_user')
     list_filter = ('action', 'timestamp')
-    search_fields = ('visit__token', 'remarks')
+    prefix_search_fields = ('visit__token',)
+    search_help_text = "Token, from the start."
 
 @admin.register(DailyTokenCounter)
 class DailyTokenCounterAdmin(admin.ModelAdmin):
@@ -1,7 +1,16 @@
 from django import forms
 from django.utils.translation import gettext_lazy as _
+from accounts.models import Desk
+from core.refdata import SnapshotChoiceField, get_snapshot
 from .models import Visit
 
+
+class PurposeChoiceField(SnapshotChoiceField):
+    """Purpose dropdown served from the reference snapshot."""
+    def source(self):
+        return get_snapshot().purposes_by_id
+
+
 class VisitRegistrationForm(forms.ModelForm):
     class Meta:
         model = Visit
@@ -18,6 +27,7 @@ class VisitRegistrationForm(forms.ModelForm):
             'purpose': _('Purpose / ആവശ്യം'),
             'reference_number': _('Reference Number / റഫറൻസ് നമ്പർ'),
         }
+        field_classes = {'purpose': PurposeChoiceField}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -47,13 +57,14 @@ class VisitActionForm(forms.Form):
     
     action = forms.ChoiceField(choices=action_choices, widget=forms.RadioSelect)
     remarks = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 3, 'class': 'form-control'}))
-    target_desk = forms.ModelChoiceField(queryset=None, required=False, label=_('To Desk (for Transfer/Routing)'))
+    target_desk = SnapshotChoiceField(Desk.objects.none(), required=False, label=_('To Desk (for Transfer/Routing)'))
 
     def __init__(self, *args, **kwargs):
+        # {desk_id: Desk}, e.g. get_snapshot().desks_for(office)
         desks = kwargs.pop('desks', None)
         super().__init__(*args, **kwargs)
         if desks is not None:
-             self.fields['target_desk'].queryset = desks
+             self.fields['target_desk'].source = lambda: desks
 
 class VisitStaffUpdateForm(forms.ModelForm):
     class Meta:
@@ -71,6 +82,7 @@ class VisitStaffUpdateForm(forms.ModelForm):
             'purpose': 'Purpose',
             'reference_number': 'Reference Number',
         }
+        field_classes = {'purpose': PurposeChoiceField}
 
     def clean_mobile(self):
         mobile = self.cleaned_data.get('mobile')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visit_regn', '0002_visit_related_office_file'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='visit',
+            name='registration_mode',
+            field=models.CharField(choices=[('QR', 'QR Code'), ('KIOSK', 'Kiosk'), ('QUICK', 'Quick'), ('MOBILE', 'Mobile')], max_length=10),
+        ),
+    ]
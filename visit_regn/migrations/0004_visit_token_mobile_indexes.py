@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visit_regn', '0003_alter_visit_registration_mode'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['token'], name='visit_token_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['mobile'], name='visit_mobile_idx'),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
 from django.utils.translation import gettext_lazy as _
+from core.db import serialized_write
 
 
 # Using accounts.Office/Desk as discovered in codebase
@@ -64,6 +65,9 @@ class Visit(models.Model):
         indexes = [
             models.Index(fields=['office', 'token']),
             models.Index(fields=['office', 'token_issue_time']),
+            # Admin prefix search across offices (core.changelist)
+            models.Index(fields=['token'], name='visit_token_idx'),
+            models.Index(fields=['mobile'], name='visit_mobile_idx'),
         ]
         unique_together = ('office', 'token') # Token unique per office (and effectively day due to format)
 
@@ -76,6 +80,36 @@ class Visit(models.Model):
     def __str__(self):
         return f"{self.token} - {self.name or 'Visitor'}"
 
+    # Queue gauges (routing.gauges): remember the (status, desk) loaded from the
+    # database so save() can report how the visit moved
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_queue_state()
+        return instance
+
+    def _remember_queue_state(self):
+        if 'status' in self.__dict__ and 'current_desk_id' in self.__dict__:
+            self._queue_state = (self.status, self.current_desk_id)
+        else:
+            self._queue_state = None  # deferred: unknown
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_queue_state()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        tracked = update_fields is None or {'status', 'current_desk', 'current_desk_id'} & set(update_fields)
+        old_state = getattr(self, '_queue_state', (None, None))
+        super().save(*args, **kwargs)
+        if not tracked or old_state is None:
+            return
+        self._remember_queue_state()
+        if old_state != self._queue_state:
+            from routing import gauges
+            gauges.visit_changed(self, *old_state)
+
     @classmethod
     def generate_token(cls, office):
         today = timezone.localtime().date()
@@ -98,7 +132,10 @@ class Visit(models.Model):
             return token
 
     @classmethod
+    @serialized_write
+    @transaction.atomic
     def create_from_kiosk(cls, data, office, user=None, mode='KIOSK'):
+        # Atomic so that serialized_write can safely retry the whole registration
         from . import services
         
         # 'user' should be passed, typically the 'VISITOR' user
@@ -123,10 +160,15 @@ class Visit(models.Model):
 
         # Log CREATED
         services.log_visit_action(visit, 'CREATED', by_user=user, remarks=f"Registered via {mode}")
+        from events.services import record_event, visit_payload, Kind
+        record_event(Kind.VISIT_CREATED, visit=visit, by_user=user,
+                     **visit_payload(visit, purpose_id=visit.purpose_id, mode=mode))
 
         # Attempt Routing
         try:
-             services.route_visit_stub(visit) # Using our stub/wrapper which handles import 
+             # Savepoint: a routing failure must not break the registration transaction
+             with transaction.atomic():
+                 services.route_visit_stub(visit) # Using our stub/wrapper which handles import 
         except Exception as e:
              services.log_visit_action(visit, 'COMMENT', by_user=user, remarks=f"Routing failed: {str(e)}")
 
@@ -2,28 +2,36 @@ from django.utils import timezone
 from .models import VisitLog, Visit
 from accounts.models import UserAssignment
 
+def get_staff_for_user(by_user):
+    """
+    Resolves the StaffMember currently assigned to by_user (or None).
+    """
+    if not by_user:
+        return None
+
+    # Try to find active assignment for this user
+    # UserAssignment has to_field='username' for user? No, UserAssignment user FK is to User object. 
+    # But 'to_field' was set in models.
+    # UserAssignment model: user = FK(User, to_field='username').
+    # So we can query easily.
+    today = timezone.localdate()
+    assignment = UserAssignment.objects.filter(
+        user=by_user,
+        from_date__lte=today
+    ).filter(
+        models.Q(to_date__gte=today) | models.Q(to_date__isnull=True)
+    ).first()
+
+    if assignment:
+        return assignment.staff_member
+    return None
+
 def log_visit_action(visit, action, by_user=None, remarks=None, from_desk=None, to_desk=None):
     """
     Creates a VisitLog entry.
     Tries to resolve by_staff from by_user using UserAssignment.
     """
-    staff_member = None
-    if by_user:
-        # Try to find active assignment for this user
-        # UserAssignment has to_field='username' for user? No, UserAssignment user FK is to User object. 
-        # But 'to_field' was set in models.
-        # UserAssignment model: user = FK(User, to_field='username').
-        # So we can query easily.
-        today = timezone.localdate()
-        assignment = UserAssignment.objects.filter(
-            user=by_user,
-            from_date__lte=today
-        ).filter(
-            models.Q(to_date__gte=today) | models.Q(to_date__isnull=True)
-        ).first()
-
-        if assignment:
-            staff_member = assignment.staff_member
+    staff_member = get_staff_for_user(by_user)
 
     VisitLog.objects.create(
         visit=visit,
@@ -1,5 +1,7 @@
 from django.test import TestCase, Client
 from django.utils import timezone
+from core.refdata import get_snapshot
+from .forms import VisitRegistrationForm
 from .models import Visit, VisitLog, DailyTokenCounter, Purpose
 from accounts.models import Office, User
 from django.contrib.auth import get_user_model
@@ -67,3 +69,29 @@ class VisitViewTests(TestCase):
         
         visit = Visit.objects.last()
         self.assertEqual(visit.registration_mode, 'QUICK')
+
+class ReferenceSnapshotTests(TestCase):
+    def setUp(self):
+        self.office = Office.objects.create(name="Test Office", code="050317")
+        self.purpose = Purpose.objects.create(name="Land Tax")
+
+    def test_registration_form_renders_without_queries(self):
+        str(VisitRegistrationForm())  # builds the snapshot
+        with self.assertNumQueries(0):
+            html = str(VisitRegistrationForm())
+            form = VisitRegistrationForm({'name': 'A', 'mobile': '9876543210', 'purpose': str(self.purpose.id)})
+            form.fields['purpose'].clean(str(self.purpose.id))
+        self.assertIn('Land Tax', html)
+        self.assertFalse(VisitRegistrationForm({'name': 'A', 'mobile': '9876543210', 'purpose': '999'}).is_valid())
+
+    def test_snapshot_refreshes_on_change(self):
+        snapshot = get_snapshot()
+        self.assertEqual(snapshot.office_by_code('050317'), self.office)
+        with self.assertNumQueries(0):
+            self.assertIs(get_snapshot(), snapshot)
+
+        self.purpose.name = "Land Tax Receipt"
+        self.purpose.save()
+        self.assertEqual(get_snapshot().purpose(self.purpose.id).name, "Land Tax Receipt")
+        with self.assertRaises(AttributeError):
+            get_snapshot().version = 0
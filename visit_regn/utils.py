@@ -1,12 +1,35 @@
+import base64
 import io
-from PIL import Image, ImageDraw, ImageFont
 from django.conf import settings
 import os
 
+# Pillow and qrcode are imported on first use: only the kiosk home and the
+# token download need them, and every worker would pay for them at boot.
+
+def qr_code_base64(data):
+    """PNG QR code for data, base64-encoded for an <img src="data:..."> tag."""
+    import qrcode
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
 def generate_token_image(visit):
     """
     Generates a JPEG image of the token for the visitor to download.
     """
+    from PIL import Image, ImageDraw, ImageFont
+
     # Create a blank white image
     width = 600
     height = 800 # Portrait aspect ratio for mobile
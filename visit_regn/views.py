@@ -5,6 +5,7 @@ from django.urls import reverse_lazy, reverse
 from django.utils import timezone
 from django.contrib import messages
 from django.utils.translation import gettext as _
+from django.db import transaction
 from django.db.models import Q
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -12,12 +13,15 @@ from django.utils.decorators import method_decorator
 from .models import Visit, VisitLog, DailyTokenCounter, Purpose
 from .forms import VisitRegistrationForm, VisitActionForm
 from .services import log_visit_action
+from events.services import record_event, visit_payload, Kind as EventKind
+from accounts import devices
+from accounts.devices import get_device
 from accounts.models import User, Office, Desk
-from .utils import generate_token_image
-import qrcode
-import io
-import base64
-from django.http import HttpResponse, FileResponse
+from core.pagination import KeysetPaginationMixin
+from core.refdata import get_snapshot
+from .utils import generate_token_image, qr_code_base64
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, FileResponse, Http404
 
 # Helper to get the default VISITOR user
 def get_visitor_user():
@@ -32,29 +36,46 @@ def get_visitor_user():
 # We'll assume a default office (e.g. first one) or from URL query param for now, 
 # or set via a middleware. For MVP, I will pick the first Office or specific code '050317'.
 def get_current_office(request):
+    # 0. Kiosk/display device token (accounts.devices): no session or DB lookup
+    device = get_device(request)
+    if device is not None:
+        return device.office
+
     # 1. Staff Login Priority
-    if request.user.is_authenticated and hasattr(request.user, 'office') and request.user.office:
-        return request.user.office
+    if request.user.is_authenticated and getattr(request.user, 'office_id', None):
+        return get_snapshot().office(request.user.office_id) or request.user.office
 
     # 2. Check if user is a specific Kiosk Login (e.g. VS050317)
     if request.user.is_authenticated and request.user.username.startswith('VS') and len(request.user.username) > 2:
         code = request.user.username[2:]
-        office = Office.objects.filter(code=code).first()
+        office = get_snapshot().office_by_code(code)
         if office:
             return office
 
     # Fallback: Try query param
     office_code = request.GET.get('office')
     if office_code:
-        return get_object_or_404(Office, code=office_code)
+        office = get_snapshot().office_by_code(office_code)
+        if not office:
+            raise Http404("No Office matches the given code.")
+        return office
     
     # Fallback to first office
-    office = Office.objects.first()
+    office = get_snapshot().first_office()
     return office
 
 # --- KIOSK VIEWS ---
 
 class KioskBaseMixin:
+    # Device token capability the view needs, if the request comes from a device
+    device_capability = None
+
+    def dispatch(self, request, *args, **kwargs):
+        device = get_device(request)
+        if device is not None and self.device_capability and not device.can(self.device_capability):
+            raise PermissionDenied("This device may not do that.")
+        return super().dispatch(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['office'] = get_current_office(self.request)
@@ -75,29 +96,14 @@ class KioskHomeView(KioskBaseMixin, TemplateView):
             # Assuming request.build_absolute_uri handles domain/ip
             url = self.request.build_absolute_uri(f"{path}?office={office.code}")
             
-            # Generate QR
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(url)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Convert to Base64 to embed in template
-            buffer = io.BytesIO()
-            img.save(buffer, format="PNG")
-            img_str = base64.b64encode(buffer.getvalue()).decode()
-            
-            context['qr_code_image'] = img_str
+            # Embedded in the template as base64
+            context['qr_code_image'] = qr_code_base64(url)
             context['qr_url'] = url # For debugging/fallback
             
         return context
 
 class BaseRegisterView(KioskBaseMixin, CreateView):
+    device_capability = devices.REGISTER
     model = Visit
     form_class = VisitRegistrationForm
     template_name = 'visit_regn/register_form.html'
@@ -165,6 +171,8 @@ class QrRegisterView(BaseRegisterView):
         return super().form_valid(form)
 
 class QuickRegisterView(KioskBaseMixin, View):
+    device_capability = devices.REGISTER
+
     def post(self, request, *args, **kwargs):
         office = get_current_office(request)
         if not office:
@@ -176,9 +184,9 @@ class QuickRegisterView(KioskBaseMixin, View):
         # Try to find a generic purpose like "General Enquiry" or just "Enquiry"
         # Since the user complained about "Land Tax" being default, we must avoid random picking.
         
-        purpose = Purpose.objects.filter(name__icontains='Enquiry').first()
+        purpose = get_snapshot().find_purpose('Enquiry')
         if not purpose:
-             purpose = Purpose.objects.filter(name__icontains='General').first()
+             purpose = get_snapshot().find_purpose('General')
              
         if not purpose:
             # Create a safe default
@@ -237,15 +245,15 @@ class MobileEntryView(TemplateView):
         context = super().get_context_data(**kwargs)
         office_code = self.request.GET.get('office')
         if office_code:
-            context['office'] = Office.objects.filter(code=office_code).first()
+            context['office'] = get_snapshot().office_by_code(office_code)
         
         # Pass all purposes for dropdown
-        context['purposes'] = Purpose.objects.all().order_by('name')
+        context['purposes'] = get_snapshot().purposes_by_name
         return context
         
     def post(self, request, *args, **kwargs):
         office_code = request.GET.get('office')
-        office = Office.objects.filter(code=office_code).first()
+        office = get_snapshot().office_by_code(office_code)
         
         if not office:
             messages.error(request, "Invalid Office Link")
@@ -260,7 +268,7 @@ class MobileEntryView(TemplateView):
         
         # Purpose handling
         if purpose_id:
-            purpose = Purpose.objects.filter(id=purpose_id).first()
+            purpose = get_snapshot().purpose(purpose_id)
         else:
              purpose, _ = Purpose.objects.get_or_create(name='General Enquiry')
              
@@ -299,17 +307,18 @@ class StaffRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
         # Check if user is staff (User.office is set or has logic)
         return self.request.user.is_authenticated and (self.request.user.office is not None or self.request.user.is_superuser)
 
-class VisitQueueView(StaffRequiredMixin, ListView):
+class VisitQueueView(StaffRequiredMixin, KeysetPaginationMixin, ListView):
     model = Visit
     template_name = 'visit_regn/staff/visit_queue.html'
     context_object_name = 'visits'
     paginate_by = 20
+    keyset_ordering = ('-token_issue_time', '-id')
     
     def get_queryset(self):
         # Filter by staff's office
         qs = Visit.objects.filter(
             office=self.request.user.office
-        ).exclude(status__in=[Visit.Status.COMPLETED, Visit.Status.CANCELLED])
+        ).exclude(status__in=[Visit.Status.COMPLETED, Visit.Status.CANCELLED]).select_related('purpose', 'current_desk')
         
         # Filter by status if needed
         status = self.request.GET.get('status')
@@ -324,7 +333,7 @@ class VisitQueueView(StaffRequiredMixin, ListView):
                 Q(current_desk=self.request.user.desk)
              )
         
-        return qs.order_by('-token_issue_time')
+        return qs
 
 class VisitDetailView(StaffRequiredMixin, DetailView):
     model = Visit
@@ -333,18 +342,13 @@ class VisitDetailView(StaffRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Pass desks for transfer/routing
-        if self.request.user.office:
-            desks = self.request.user.office.desks.all()
-        else:
-            desks = Desk.objects.none()
-            
+        desks = get_snapshot().desks_for(self.request.user.office_id)
         context['action_form'] = VisitActionForm(desks=desks)
         return context
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
-        office = request.user.office
-        desks = office.desks.all() if office else Desk.objects.none()
+        desks = get_snapshot().desks_for(request.user.office_id)
         
         form = VisitActionForm(request.POST, desks=desks)
         
@@ -353,36 +357,9 @@ class VisitDetailView(StaffRequiredMixin, DetailView):
             remarks = form.cleaned_data['remarks']
             target_desk = form.cleaned_data['target_desk']
             
-            # Logic
-            if action == 'ATTENDED':
-                self.object.status = Visit.Status.IN_PROGRESS
-                self.object.token_attend_time = timezone.now()
-                self.object.current_desk = request.user.desk # Attend at my desk
-                self.object.save()
-                log_visit_action(self.object, 'ATTENDED', by_user=request.user, remarks=remarks)
-                
-            elif action == 'COMPLETED':
-                self.object.status = Visit.Status.COMPLETED
-                self.object.save()
-                log_visit_action(self.object, 'COMPLETED', by_user=request.user, remarks=remarks)
-                
-            elif action == 'TRANSFERRED':
-                if target_desk:
-                     old_desk = self.object.current_desk
-                     self.object.current_desk = target_desk
-                     self.object.status = Visit.Status.ROUTED
-                     self.object.save()
-                     log_visit_action(self.object, 'TRANSFERRED', by_user=request.user, remarks=remarks, from_desk=old_desk, to_desk=target_desk)
-            
-            elif action == 'ROUTED':
-                if target_desk:
-                     self.object.current_desk = target_desk
-                     self.object.status = Visit.Status.ROUTED
-                     self.object.save()
-                     log_visit_action(self.object, 'ASSIGNED', by_user=request.user, remarks=remarks, to_desk=target_desk)
-
-            elif action == 'COMMENT':
-                log_visit_action(self.object, 'COMMENT', by_user=request.user, remarks=remarks)
+            # Logic (state change, log and outbox event commit together)
+            with transaction.atomic():
+                self.apply_action(action, remarks, target_desk)
                 
             return redirect('visit_regn:visit_detail', pk=self.object.pk)
             
@@ -390,3 +367,43 @@ class VisitDetailView(StaffRequiredMixin, DetailView):
         context = self.get_context_data()
         context['action_form'] = form
         return self.render_to_response(context)
+
+    def apply_action(self, action, remarks, target_desk):
+        user = self.request.user
+        old_desk_id = self.object.current_desk_id
+
+        if action == 'ATTENDED':
+            self.object.status = Visit.Status.IN_PROGRESS
+            self.object.token_attend_time = timezone.now()
+            self.object.current_desk = user.desk # Attend at my desk
+            self.object.save()
+            log_visit_action(self.object, 'ATTENDED', by_user=user, remarks=remarks)
+            record_event(EventKind.VISIT_ATTENDED, visit=self.object, by_user=user, **visit_payload(self.object))
+
+        elif action == 'COMPLETED':
+            self.object.status = Visit.Status.COMPLETED
+            self.object.save()
+            log_visit_action(self.object, 'COMPLETED', by_user=user, remarks=remarks)
+            record_event(EventKind.VISIT_COMPLETED, visit=self.object, by_user=user, **visit_payload(self.object))
+
+        elif action == 'TRANSFERRED':
+            if target_desk:
+                 old_desk = self.object.current_desk
+                 self.object.current_desk = target_desk
+                 self.object.status = Visit.Status.ROUTED
+                 self.object.save()
+                 log_visit_action(self.object, 'TRANSFERRED', by_user=user, remarks=remarks, from_desk=old_desk, to_desk=target_desk)
+                 record_event(EventKind.VISIT_TRANSFERRED, visit=self.object, by_user=user,
+                              **visit_payload(self.object, from_desk_id=old_desk_id))
+
+        elif action == 'ROUTED':
+            if target_desk:
+                 self.object.current_desk = target_desk
+                 self.object.status = Visit.Status.ROUTED
+                 self.object.save()
+                 log_visit_action(self.object, 'ASSIGNED', by_user=user, remarks=remarks, to_desk=target_desk)
+                 record_event(EventKind.VISIT_ROUTED, visit=self.object, by_user=user,
+                              **visit_payload(self.object, from_desk_id=old_desk_id))
+
+        elif action == 'COMMENT':
+            log_visit_action(self.object, 'COMMENT', by_user=user, remarks=remarks)
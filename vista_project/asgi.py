@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vista_project.settings')
 
 application = get_asgi_application()
+
+# Compile templates and fill caches before taking traffic (core/warmup.py)
+if settings.WARM_UP_WORKERS:
+    from core.warmup import warm_up
+    warm_up()
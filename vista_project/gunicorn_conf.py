@@ -0,0 +1,7 @@
+"""
+gunicorn settings: `gunicorn -c python:vista_project.gunicorn_conf --preload vista_project.wsgi`.
+
+The master warms the application up once (wsgi.py, core/warmup.py) and closes
+its database connections; each forked worker then opens its own.
+"""
+from core.warmup import post_fork  # noqa: F401
@@ -47,17 +47,23 @@ INSTALLED_APPS = [
     'transactions',
     'filing',
     'mis',
+    'archive',
+    'events',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.DeviceTokenMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaMiddleware',
+    'core.middleware.RequestProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'vista_project.urls'
@@ -95,9 +101,27 @@ if 'PYTHONANYWHERE_DOMAIN' in os.environ:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            # Override for scratch copies (benchmarks, replica file copies)
+            'NAME': os.environ.get('VISTA_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds to wait for a lock before "database is locked"
+                'timeout': 20,
+                # Take the write lock at BEGIN, so read-then-write transactions
+                # (token counter, routing) wait instead of failing on upgrade
+                'transaction_mode': 'IMMEDIATE',
+            },
         }
     }
+    # Applied on every new connection by core.db.apply_sqlite_pragmas
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',          # readers no longer block the writer
+        'busy_timeout': 20000,          # ms
+        'synchronous': 'NORMAL',        # safe with WAL, far fewer fsyncs
+        'mmap_size': 134217728,         # 128 MB
+    }
+    # core.db.serialized_write retry policy for registration/routing writes
+    SQLITE_WRITE_RETRIES = 5
+    SQLITE_WRITE_BACKOFF = 0.05         # seconds, doubled per retry
     ALLOWED_HOSTS = ['vistanattakam.pythonanywhere.com']
     DEBUG = False
 else:
@@ -115,6 +139,71 @@ else:
     ALLOWED_HOSTS = ['*']
     DEBUG = True
 
+# Archive tier (manage.py archive_visits)
+# ------------------------------------------------------------------------------
+# Finished visits older than ARCHIVE_AFTER_DAYS move to the archive tables.
+# Point ARCHIVE_DATABASE at a second alias (e.g. a separate SQLite file) to keep
+# them out of the main database; 'default' keeps them in the same database.
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_DATABASE = 'default'
+
+# Domain event outbox (events.services)
+# ------------------------------------------------------------------------------
+# Consumers look for a missing event id (its transaction may still be open and
+# commit later) for this long after first seeing the gap, then take it as rolled back.
+OUTBOX_GAP_SECONDS = 60 * 60
+
+# Read replica for reporting (MIS, track_status, admin changelists)
+# ------------------------------------------------------------------------------
+# Set VISTA_REPLICA_NAME to the replica's database name (a second MySQL schema
+# fed by replication, or a periodically copied SQLite file) to enable.
+# Token issue and routing always stay on 'default'.
+REPLICA_DATABASE = None
+if os.environ.get('VISTA_REPLICA_NAME'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=os.environ['VISTA_REPLICA_NAME'],
+        HOST=os.environ.get('VISTA_REPLICA_HOST', DATABASES['default'].get('HOST', '')),
+        TEST={'MIRROR': 'default'},
+    )
+    REPLICA_DATABASE = 'replica'
+REPLICA_READ_NAMESPACES = ('mis',)
+REPLICA_READ_URL_NAMES = ('track_status',)
+# After a user's own write, keep their reads on the primary for this long
+REPLICA_READ_YOUR_WRITES_SECONDS = 5
+
+DATABASE_ROUTERS = [
+    'archive.routers.ArchiveRouter',
+    'core.routers.ReplicaRouter',
+]
+
+
+# Cache (shared by all workers; see core/cache.py)
+# ------------------------------------------------------------------------------
+# File-based by default so every gunicorn/uWSGI worker on the host sees the same
+# entries. Set VISTA_REDIS_URL (e.g. redis://127.0.0.1:6379/1, needs `redis`
+# installed) to use Redis or any Redis-compatible server instead.
+if os.environ.get('VISTA_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['VISTA_REDIS_URL'],
+            'KEY_PREFIX': 'vista',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('VISTA_CACHE_DIR', str(BASE_DIR / 'cache')),
+            'TIMEOUT': 3600,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+# manage.py test swaps this for a per-process LocMemCache, emptied before every
+# test (core/testing.py)
+TEST_RUNNER = 'core.testing.TestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -182,8 +271,85 @@ SESSION_COOKIE_AGE = 1800
 # 3. Reset the 30-minute timer every time the user requests a page
 SESSION_SAVE_EVERY_REQUEST = True
 
+# 4. ...but don't UPDATE django_session on every request (display polls, lock API).
+# accounts.sessions only persists when data changes or the stored expiry has
+# drifted by more than SESSION_REFRESH_FRACTION of SESSION_COOKIE_AGE (3 min here).
+SESSION_ENGINE = 'accounts.sessions'
+SESSION_REFRESH_FRACTION = 0.1
+
+
+# Kiosk / display device tokens (accounts/devices.py)
+# ------------------------------------------------------------------------------
+# Signing keys as "id:secret,id:secret" in VISTA_DEVICE_KEYS. New tokens use the
+# first; all are accepted, so rotate by prepending a key, re-enrolling devices
+# and then removing the old one. Without it tokens are signed with SECRET_KEY.
+DEVICE_TOKEN_KEYS = dict(
+    item.split(':', 1) for item in os.environ.get('VISTA_DEVICE_KEYS', '').split(',') if ':' in item
+)
+# Seconds a token stays valid (None: until its key is rotated out)
+DEVICE_TOKEN_MAX_AGE = None
+# Device ids (shown by issue_device_token) no longer accepted
+DEVICE_TOKEN_REVOKED = ()
+
+
+# Login CAPTCHA (accounts/captcha.py)
+# ------------------------------------------------------------------------------
+# Seconds a landing-page challenge stays valid; each is accepted once
+CAPTCHA_MAX_AGE = 10 * 60
+# Browser-only (private) caching of the anonymous landing page; below CAPTCHA_MAX_AGE
+LANDING_PAGE_MAX_AGE = 60
+
 
 # Authentication Redirects
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'landing'
-LOGIN_URL = 'landing'
\ No newline at end of file
+LOGIN_URL = 'landing'
+
+# Queue Close-out (manage.py close_out_day)
+# ------------------------------------------------------------------------------
+# Local time after which today's unfinished tokens are cancelled by the nightly job.
+# None = only tokens from previous days are closed out.
+QUEUE_CLOSE_OUT_TIME = None
+
+# Office file target times (filing/sla.py, manage.py sweep_file_sla nightly)
+# ------------------------------------------------------------------------------
+# Days from opening, keyed (interim status, reply type) with None for "any"; added
+# to / overriding filing.sla.TARGETS. Run sweep_file_sla --recompute after a change.
+FILE_SLA_DAYS = {}
+
+# Request profiler (core/profiling.py)
+# ------------------------------------------------------------------------------
+# Share of requests profiled (SQL count/time, repeated statements), e.g. 0.01.
+# 0 disables the middleware at startup. Totals per URL name: /profiler/ (Super Admin).
+PROFILER_SAMPLE_RATE = float(os.environ.get('VISTA_PROFILER_SAMPLE_RATE', '0'))
+# Sampled requests at least this slow go to the rotating slow-request log
+PROFILER_SLOW_MS = 1000
+PROFILER_SLOW_LOG = os.environ.get('VISTA_SLOW_LOG', str(BASE_DIR / 'logs' / 'slow_requests.log'))
+PROFILER_SLOW_LOG_BYTES = 5 * 1024 * 1024
+PROFILER_SLOW_LOG_BACKUPS = 5
+# How often each worker copies its totals to the shared cache
+PROFILER_FLUSH_SECONDS = 30
+
+# Metrics (/metrics, core/metrics.py)
+# ------------------------------------------------------------------------------
+# Prometheus text format: latency histograms per URL name, SQL counts and queue /
+# office file gauges. Scrapers send "Authorization: Bearer <VISTA_METRICS_TOKEN>";
+# without a token the endpoint is closed (open to all with DEBUG).
+METRICS_ENABLED = True
+# Addresses let in without the token (e.g. a scraper on a private network).
+# Opt-in: behind a reverse proxy on the same host (nginx, PythonAnywhere) every
+# request arrives from 127.0.0.1, so never list the loopback addresses there.
+METRICS_ALLOWED_IPS = ()
+METRICS_TOKEN = os.environ.get('VISTA_METRICS_TOKEN', '')
+# How often each worker publishes its request totals to the shared cache
+METRICS_FLUSH_SECONDS = 10
+
+# Worker warm-up (core/warmup.py)
+# ------------------------------------------------------------------------------
+# Compile templates and load reference data / routing caches when wsgi.py / asgi.py
+# is loaded, before the worker takes traffic. `manage.py bench_startup` measures the cost.
+WARM_UP_WORKERS = os.environ.get('VISTA_WARM_UP', '1') != '0'
+# Also leave the database connections open. Only where every worker imports the
+# application itself: a preloading master would hand its connections to the forked
+# workers (use `gunicorn -c python:vista_project.gunicorn_conf` there instead).
+WARM_UP_CONNECTIONS = os.environ.get('VISTA_WARM_UP_CONNECTIONS') == '1'
@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vista_project.settings')
 
 application = get_wsgi_application()
+
+# Compile templates and fill caches before taking traffic (core/warmup.py)
+if settings.WARM_UP_WORKERS:
+    from core.warmup import warm_up
+    warm_up()